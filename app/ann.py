@@ -0,0 +1,123 @@
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import numpy as np
+from app.config import settings
+from app.content_model import ContentModel
+from app.utils import logger, timed
+
+if TYPE_CHECKING:  # scikit-learn is imported when the first index is built
+    from sklearn.decomposition import TruncatedSVD
+
+# Approximate nearest neighbours over the content model.
+# TF-IDF rows are reduced to dense unit vectors with truncated SVD and
+# bucketed by a spherical k-means coarse quantizer (IVF). A query only scans
+# the `nprobe` buckets whose centroids are closest; the returned candidates
+# are then re-scored exactly against the TF-IDF matrix by the caller.
+
+def _normalize(A: np.ndarray) -> np.ndarray:
+    return A / (np.linalg.norm(A, axis=1, keepdims=True) + 1e-9)
+
+def _kmeans(E: np.ndarray, nlist: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    sample = E if len(E) <= nlist * 256 else E[rng.choice(len(E), nlist * 256, replace=False)]
+    C = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(sample @ C.T, axis=1)
+        sums = np.zeros_like(C)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        sums[empty] = C[empty]  # keep the old centroid for empty clusters
+        C = _normalize(sums)
+    return C
+
+class IVFIndex:
+    def __init__(self, svd: "TruncatedSVD", centroids: np.ndarray, model: ContentModel):
+        self.svd = svd
+        self.centroids = centroids
+        self.version = model.version
+        self.assign(model)
+
+    @classmethod
+    @timed("ann_index_build")
+    def build(cls, model: ContentModel, dim: int = 0, nlist: int = 0) -> Optional["IVFIndex"]:
+        n, f = model.X.shape
+        dim = min(dim or settings.ANN_DIM, f - 1, n - 1)
+        if dim < 2:
+            return None
+        from sklearn.decomposition import TruncatedSVD
+        svd = TruncatedSVD(n_components=dim, random_state=0).fit(model.X)
+        E = _normalize(svd.transform(model.X).astype(np.float32))
+        nlist = min(nlist or settings.ANN_NLIST or int(4 * np.sqrt(n)), n)
+        return cls(svd, _kmeans(E, nlist), model)
+
+    def assign(self, model: ContentModel) -> None:
+        """(Re)embed every row with the fitted SVD and bucket it; used after movies are folded in."""
+        E = _normalize(self.svd.transform(model.X).astype(np.float32))
+        lists = np.argmax(E @ self.centroids.T, axis=1)
+        order = np.argsort(lists, kind="stable")  # rows grouped by list
+        offsets = np.searchsorted(lists[order], np.arange(len(self.centroids) + 1))
+        self.lists = (E, order, offsets)  # swapped as one reference for concurrent searches
+        self.key = (model.version, model.folded, model.X.shape[0])
+
+    def search(self, query, n: int, nprobe: int = 0, rerank: int = 10) -> np.ndarray:
+        """Candidate rows for the `n` most similar rows to `query` (1 x #features).
+
+        Returns at most `n * rerank` rows from the probed lists, shortlisted by
+        embedding similarity; callers re-score them exactly.
+        """
+        E, order, offsets = self.lists
+        q = _normalize(self.svd.transform(query).astype(np.float32))[0]
+        nprobe = min(nprobe or settings.ANN_NPROBE, len(self.centroids))
+        probe = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+        cand = np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probe])
+        limit = n * rerank
+        if len(cand) <= limit:
+            return cand
+        scores = E[cand] @ q
+        return cand[np.argpartition(-scores, limit - 1)[:limit]]
+
+_indexes: Dict[str, IVFIndex] = {}
+_lock = threading.Lock()
+
+def get_ann_index(model: ContentModel) -> Optional[IVFIndex]:
+    """Index for `model`; refit on a new model version, re-assigned when movies were folded in."""
+    with _lock:
+        index = _indexes.get(model.source)
+        if index is None or index.version != model.version:
+            index = IVFIndex.build(model)
+            if index is None:
+                return None
+            _indexes[model.source] = index
+            logger.info(f"[ANN] built IVF index: {len(index.centroids)} lists, {index.centroids.shape[1]} dims")
+        elif index.key != (model.version, model.folded, model.X.shape[0]):
+            index.assign(model)
+        return index
+
+def recall_report(model: ContentModel, queries, n: int = 20, nprobes: List[int] = (1, 2, 4, 8, 16, 32),
+                  index: Optional[IVFIndex] = None) -> List[dict]:
+    """recall@n and mean latency of the ANN path against the exact cosine scan, per nprobe."""
+    from sklearn.metrics.pairwise import cosine_similarity as sk_cosine
+    index = index or IVFIndex.build(model)
+    if index is None:
+        return []
+    n = min(n, model.X.shape[0] - 1)
+    t0 = time.perf_counter()
+    exact = [set(np.argpartition(-sk_cosine(q, model.X).ravel(), n - 1)[:n]) for q in queries]
+    exact_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+    out = []
+    for nprobe in nprobes:
+        if nprobe > len(index.centroids):
+            break
+        hits = 0
+        t0 = time.perf_counter()
+        for q, truth in zip(queries, exact):
+            cand = index.search(q, n, nprobe=nprobe)
+            sims = sk_cosine(q, model.X[cand]).ravel()
+            top = cand[np.argsort(-sims)[:n]]
+            hits += len(truth.intersection(top))
+        ann_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        out.append({"nprobe": nprobe, "recall": hits / (n * len(queries)),
+                    "ann_ms": round(ann_ms, 3), "exact_ms": round(exact_ms, 3)})
+    return out
@@ -1,44 +1,149 @@
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Iterable, Optional, Tuple
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.hash import bcrypt
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.config import settings
-from app.database import get_db
+from app.database import get_async_db, get_db
+from app.loaders import load_user
 from app.models import User
 
+# Tokens carry the user id ("uid") next to the email ("sub"); authenticated
+# requests resolve it through a small TTL cache, so they don't query users.
+# ORM updates/deletes of a user drop their entry. bcrypt runs on the bounded
+# pool in app.executor (run_hash / run_hash_sync), never on the event loop.
+
 security = HTTPBearer()
+_hasher = bcrypt.using(rounds=settings.BCRYPT_ROUNDS)
+
+@dataclass(frozen=True)
+class AuthUser:
+    id: int
+    email: str
 
 def hash_password(pw: str) -> str:
-    return bcrypt.hash(pw)
+    return _hasher.hash(pw)
 
 def verify_password(pw: str, pw_hash: str) -> bool:
     return bcrypt.verify(pw, pw_hash)
 
-def create_access_token(sub: str, expires_minutes: int = settings.ACCESS_TOKEN_EXPIRE_MINUTES) -> str:
+def create_access_token(sub: str, expires_minutes: int = settings.ACCESS_TOKEN_EXPIRE_MINUTES,
+                        uid: Optional[int] = None) -> str:
     to_encode = {
         "sub": sub,
         "exp": datetime.utcnow() + timedelta(minutes=expires_minutes),
         "iat": datetime.utcnow(),
     }
+    if uid is not None:
+        to_encode["uid"] = uid
     return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALG)
 
-def decode_token(token: str) -> Optional[str]:
+def decode_identity(token: str) -> Tuple[Optional[str], Optional[int]]:
+    """(email, user id) of a valid token; the id is None in tokens issued before it was added."""
     try:
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=[settings.JWT_ALG])
-        return payload.get("sub")
     except jwt.PyJWTError:
-        return None
+        return None, None
+    uid = payload.get("uid")
+    return payload.get("sub"), int(uid) if isinstance(uid, int) else None
 
-def get_current_user(creds: HTTPAuthorizationCredentials = Depends(security),
-                     db: Session = Depends(get_db)) -> User:
-    token = creds.credentials
-    email = decode_token(token)
+def decode_token(token: str) -> Optional[str]:
+    return decode_identity(token)[0]
+
+class UserCache:
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[int, Tuple[float, AuthUser]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, user_id: int, email: str) -> Optional[AuthUser]:
+        with self._lock:
+            hit = self._data.get(user_id)
+            # the email must still match: a token for a changed/deleted account must not resolve
+            if hit is None or hit[0] < time.monotonic() or hit[1].email != email:
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return hit[1]
+
+    def put(self, user: AuthUser) -> AuthUser:
+        with self._lock:
+            self._data[user.id] = (time.monotonic() + self.ttl, user)
+            self._data.move_to_end(user.id)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._data), "max_entries": self.max_entries, "ttl_seconds": self.ttl,
+                    "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+user_cache = UserCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_CACHE_TTL_SECONDS)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target) -> None:
+    user_cache.invalidate(target.id)
+
+def _identity(creds: HTTPAuthorizationCredentials) -> Tuple[str, Optional[int]]:
+    email, uid = decode_identity(creds.credentials)
     if not email:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
+    return email, uid
+
+def _resolved(user: Optional[User], email: str) -> AuthUser:
+    if not user or user.email != email:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+    return user_cache.put(AuthUser(id=user.id, email=user.email))
+
+def get_current_user(creds: HTTPAuthorizationCredentials = Depends(security),
+                     db: Session = Depends(get_db)) -> AuthUser:
+    email, uid = _identity(creds)
+    cached = user_cache.get(uid, email) if uid is not None else None
+    if cached is not None:
+        return cached
+    user = db.get(User, uid) if uid is not None else db.query(User).filter(User.email == email).first()
+    return _resolved(user, email)
+
+def batch_service(x_api_key: Optional[str] = Header(None)) -> bool:
+    """True for service callers presenting BATCH_API_KEY."""
+    key = settings.BATCH_API_KEY
+    return bool(key) and x_api_key is not None and hmac.compare_digest(x_api_key, key)
+
+def authorize_batch(user: AuthUser, user_ids: Iterable[int], service: bool) -> None:
+    # other users' recommendations expose their rating history: service callers only
+    if not service and any(uid != user.id for uid in user_ids):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail="Recommendations for other users require the batch API key")
+
+async def get_current_user_async(creds: HTTPAuthorizationCredentials = Depends(security),
+                                 db: AsyncSession = Depends(get_async_db)) -> AuthUser:
+    email, uid = _identity(creds)
+    cached = user_cache.get(uid, email) if uid is not None else None
+    if cached is not None:
+        return cached
+    user = await db.get(User, uid) if uid is not None else await load_user(db, email)
+    return _resolved(user, email)
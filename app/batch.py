@@ -0,0 +1,195 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+from app.catalog import movie_titles
+from app.config import settings
+from app.content_model import get_content_model
+from app.content_profile import profile_cache
+from app.mf import get_mf_model
+from app.models import PrecomputedRecommendation, User
+from app.ratings_store import get_ratings_store
+from app.recommenders import _popular_unrated
+from app.utils import logger, timed
+
+# Recommendations for many users at once. Users are scored in blocks with
+# one matrix product per block (instead of one model pass per user); users
+# the models know nothing about fall back to popularity, like the
+# single-user recommenders.
+
+METHODS = ("content", "cf", "mf")
+Recs = Dict[int, List[Tuple[int, str, float]]]
+
+def _block_size(n_cols: int) -> int:
+    # keep each dense (block x n_cols) score matrix around settings.BATCH_MAX_CELLS floats
+    return max(1, min(settings.BATCH_BLOCK_SIZE, settings.BATCH_MAX_CELLS // max(n_cols, 1)))
+
+def _top_rows(scores: np.ndarray, n: int) -> np.ndarray:
+    """Column indices of the n best scores of every row, best first."""
+    n = min(n, scores.shape[1])
+    part = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+def _cf_block(M, rows: np.ndarray, k: int) -> np.ndarray:
+    # user-user similarities for the whole block: one sparse product
+    S = (M.Rc[rows] @ M.Rc_T).toarray() / (M.norms[rows, None] * M.norms[None, :])
+    S[np.arange(len(rows)), rows] = 0.0  # exclude self
+    kk = min(k, S.shape[1])
+    nn = np.argpartition(-S, kk - 1, axis=1)[:, :kk]
+    W = sparse.csr_matrix((np.take_along_axis(S, nn, axis=1).ravel(),
+                           (np.repeat(np.arange(len(rows)), kk), nn.ravel())), shape=S.shape)
+    denom = np.asarray(abs(W).sum(axis=1)).ravel() + 1e-9
+    preds = M.means[rows, None] + (W @ M.Rc).toarray() / denom[:, None]
+    seen = M.R[rows]
+    preds[seen.nonzero()] = -1  # already seen
+    return preds
+
+def _content_block(model, profiles: List[sparse.csr_matrix], rated: List[Dict[int, int]]) -> np.ndarray:
+    # cached user profiles (see app.content_profile) stacked for the whole block, then one product
+    P = sparse.vstack(profiles).toarray()
+    P /= np.linalg.norm(P, axis=1, keepdims=True) + 1e-12
+    sims = np.asarray(model.X @ P.T).T
+    for i, ratings in enumerate(rated):
+        seen = [model.id_to_idx[m] for m in ratings if m in model.id_to_idx]
+        sims[i, seen] = -np.inf
+    return sims
+
+@timed("batch_recommend")
+def batch_recommend(db: Session, user_ids: Sequence[int], method: str = "cf",
+                    top_n: int = 20, k: int = 20) -> Recs:
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}")
+    users = {u.id: u for u in db.query(User).filter(User.id.in_(list(user_ids)))}
+    store = get_ratings_store(db)
+    out: Recs = {}
+    fallback = []
+
+    if method == "cf":
+        M = store.matrix()
+        known = [uid for uid in users if uid in M.u_index]
+        fallback = [uid for uid in users if uid not in M.u_index]
+        bs = _block_size(max(len(M.users), len(M.movies)))
+        for b in range(0, len(known), bs):
+            block = known[b:b + bs]
+            preds = _cf_block(M, np.array([M.u_index[uid] for uid in block]), k)
+            for uid, row, top in zip(block, preds, _top_rows(preds, top_n)):
+                out[uid] = [(int(M.movies[j]), "", float(row[j])) for j in top if row[j] > 0]
+    elif method == "content":
+        model = get_content_model(db)
+        profiles = {}
+        for uid in users if model else ():
+            vec = profile_cache.get(db, model, uid, store.user_ratings(uid))
+            if vec is not None:
+                profiles[uid] = vec
+        known = list(profiles)
+        fallback = [uid for uid in users if uid not in profiles]
+        bs = _block_size(model.X.shape[0]) if model else 1
+        for b in range(0, len(known), bs):
+            block = known[b:b + bs]
+            sims = _content_block(model, [profiles[uid] for uid in block],
+                                  [store.user_ratings(uid) for uid in block])
+            for uid, row, top in zip(block, sims, _top_rows(sims, top_n)):
+                out[uid] = [(int(model.ids[j]), "", float(row[j])) for j in top if np.isfinite(row[j])]
+    else:
+        model = get_mf_model()
+        vecs = {}
+        for uid in users:
+            ratings = store.user_ratings(uid)
+            vec = model.user_vector(uid, ratings) if model is not None and ratings else None
+            if vec is None:
+                fallback.append(uid)
+            else:
+                vecs[uid] = vec
+        known = list(vecs)
+        bs = _block_size(len(model.item_ids)) if model else 1
+        for b in range(0, len(known), bs):
+            block = known[b:b + bs]
+            scores = np.stack([vecs[uid] for uid in block]) @ np.asarray(model.V).T + model.mean
+            for i, uid in enumerate(block):
+                seen = [model.i_index[m] for m in store.user_ratings(uid) if m in model.i_index]
+                scores[i, seen] = -np.inf
+            for uid, row, top in zip(block, scores, _top_rows(scores, top_n)):
+                out[uid] = [(int(model.item_ids[j]), "", float(row[j])) for j in top if np.isfinite(row[j])]
+
+    # titles from the in-memory catalog (see app.catalog)
+    titles = movie_titles(db, {mid for recs in out.values() for mid, _, _ in recs})
+    for uid in list(out):
+        out[uid] = [(mid, titles[mid], s) for mid, _, s in out[uid] if mid in titles]
+        if not out[uid]:
+            fallback.append(uid)
+    for uid in fallback:
+        out[uid] = _popular_unrated(db, users[uid], top_n)
+    return out
+
+# -------- Precomputed results --------
+
+def save_precomputed(db: Session, recs: Recs, method: str, top_n: int, k: Optional[int]) -> None:
+    if not recs:
+        return
+    db.query(PrecomputedRecommendation).filter(
+        PrecomputedRecommendation.method == method, PrecomputedRecommendation.user_id.in_(list(recs))
+    ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(PrecomputedRecommendation, [
+        {"user_id": uid, "method": method, "k": k, "top_n": top_n, "payload": json.dumps(rows)}
+        for uid, rows in recs.items()
+    ])
+    db.commit()
+
+def load_precomputed(db: Session, user_id: int, method: str, top_n: int,
+                     k: Optional[int] = None) -> Optional[List[Tuple[int, str, float]]]:
+    """Stored results if fresh and compatible with the request; None means compute online."""
+    row = (
+        db.query(PrecomputedRecommendation)
+        .filter(PrecomputedRecommendation.user_id == user_id, PrecomputedRecommendation.method == method)
+        .first()
+    )
+    return precomputed_rows(row, top_n, k)
+
+def precomputed_rows(row: Optional[PrecomputedRecommendation], top_n: int,
+                     k: Optional[int] = None) -> Optional[List[Tuple[int, str, float]]]:
+    if row is None or row.top_n < top_n or (k is not None and row.k != k):
+        return None
+    if row.computed_at is None or datetime.utcnow() - row.computed_at > timedelta(seconds=settings.PRECOMPUTED_MAX_AGE_SECONDS):
+        return None
+    return [tuple(r) for r in json.loads(row.payload)][:top_n]
+
+def invalidate_precomputed(db: Session, user_id: int) -> None:
+    """Drop a user's stored results; called in the same transaction as their rating writes."""
+    db.query(PrecomputedRecommendation).filter(PrecomputedRecommendation.user_id == user_id).delete(
+        synchronize_session=False)
+
+def _precompute_chunk(args) -> int:
+    user_ids, method, top_n, k = args
+    from app.database import SessionLocal  # fresh connection per worker process
+    db = SessionLocal()
+    try:
+        recs = batch_recommend(db, user_ids, method=method, top_n=top_n, k=k)
+        save_precomputed(db, recs, method, top_n, k if method == "cf" else None)
+        return len(recs)
+    finally:
+        db.close()
+
+def precompute_all(db: Session, method: str = "cf", top_n: int = 20, k: int = 20,
+                   workers: int = 1, chunk_size: int = 2000) -> int:
+    """Recommendations for every user written to precomputed_recommendations."""
+    user_ids = [uid for (uid,) in db.query(User.id).order_by(User.id)]
+    # warm models in the parent so forked workers inherit them instead of reloading
+    get_ratings_store(db)
+    if method == "content":
+        get_content_model(db)
+    chunks = [(user_ids[i:i + chunk_size], method, top_n, k) for i in range(0, len(user_ids), chunk_size)]
+    done = 0
+    if workers <= 1:
+        for chunk in chunks:
+            done += _precompute_chunk(chunk)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for n in pool.map(_precompute_chunk, chunks):
+                done += n
+                logger.info(f"[BATCH] {method}: {done}/{len(user_ids)} users")
+    return done
@@ -0,0 +1,94 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import db_source
+from app.models import Movie
+from app.utils import logger, timed
+
+# Compact in-memory catalog for hydrating recommendation results: movie
+# titles in one object array indexed through a dense movie id -> row array,
+# so a page of results costs top_n lookups instead of a query building ORM
+# rows. Refreshed like the genre index (new or deleted movies); ids the
+# catalog doesn't know yet are looked up in the database.
+
+class CatalogIndex:
+    def __init__(self, ids: np.ndarray, titles: List[str], source: str = ""):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.titles = np.array(titles, dtype=object)
+        self.source = source
+        self.max_movie_id = int(self.ids.max()) if len(self.ids) else 0
+        self.checked_at = time.time()
+        self.row_of = np.full(self.max_movie_id + 1, -1, dtype=np.int64)
+        self.row_of[self.ids] = np.arange(len(self.ids))
+
+    @classmethod
+    def from_db(cls, db: Session) -> "CatalogIndex":
+        rows = db.query(Movie.id, Movie.title).order_by(Movie.id).all()
+        return cls(np.array([r[0] for r in rows], dtype=np.int64), [r[1] for r in rows], source=db_source(db))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def titles_of(self, movie_ids: Iterable[int]) -> Dict[int, str]:
+        ids = np.fromiter(movie_ids, dtype=np.int64)
+        rows = np.full(len(ids), -1, dtype=np.int64)
+        ok = (ids >= 0) & (ids <= self.max_movie_id)
+        rows[ok] = self.row_of[ids[ok]]
+        return {int(i): self.titles[r] for i, r in zip(ids, rows) if r >= 0}
+
+_catalog: Optional[CatalogIndex] = None
+_lock = threading.Lock()
+
+@timed("catalog_build")
+def _build(db: Session) -> CatalogIndex:
+    catalog = CatalogIndex.from_db(db)
+    logger.info(f"[CATALOG] indexed {len(catalog)} titles up to movie id {catalog.max_movie_id}")
+    return catalog
+
+def get_catalog(db: Session) -> CatalogIndex:
+    """Current catalog; re-checked every CATALOG_REFRESH_SECONDS (callers keep the old one meanwhile)."""
+    global _catalog
+    source = db_source(db)
+    catalog = _catalog
+    if catalog is not None and catalog.source == source:
+        # never wait for a refresh (see app.genres.get_genre_index)
+        if time.time() - catalog.checked_at <= settings.CATALOG_REFRESH_SECONDS \
+                or not _lock.acquire(blocking=False):
+            return catalog
+        try:
+            max_id, count = db.query(func.max(Movie.id), func.count(Movie.id)).one()
+            if (max_id or 0) != catalog.max_movie_id or count != len(catalog):
+                _catalog = _build(db)
+            else:
+                catalog.checked_at = time.time()
+        finally:
+            _lock.release()
+        return _catalog
+    with _lock:
+        if _catalog is None or _catalog.source != source:
+            _catalog = _build(db)
+        return _catalog
+
+def invalidate_catalog() -> None:
+    """Force a rebuild on next use (after bulk imports or title edits)."""
+    global _catalog
+    _catalog = None
+
+def movie_titles(db: Session, movie_ids: Iterable[int]) -> Dict[int, str]:
+    """Titles of the existing movies among `movie_ids`."""
+    movie_ids = list(movie_ids)
+    titles = get_catalog(db).titles_of(movie_ids)
+    missing = [m for m in movie_ids if m not in titles]
+    if missing:  # added since the last refresh
+        titles.update(db.query(Movie.id, Movie.title).filter(Movie.id.in_(missing)))
+    return titles
+
+def hydrate(db: Session, movie_ids: List[int], scores: Iterable[float]) -> List[Tuple[int, str, float]]:
+    """(movie id, title, score) rows in the given order; movies that no longer exist are dropped."""
+    titles = movie_titles(db, movie_ids)
+    return [(mid, titles[mid], float(s)) for mid, s in zip(movie_ids, scores) if mid in titles]
@@ -0,0 +1,69 @@
+from typing import Dict, Sequence
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+from app.models import Rating
+
+# Sparse user-user KNN. Only the target user's similarity row is computed
+# (one sparse mat-vec) and all items are scored with a second one, so memory
+# stays O(#ratings) instead of O(#users x #movies).
+
+class RatingsMatrix:
+    def __init__(self, user_ids: Sequence[int], movie_ids: Sequence[int], scores: Sequence[float]):
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        scores = np.asarray(scores, dtype=np.float64)
+        self.users, u_rows = np.unique(user_ids, return_inverse=True)
+        self.movies, m_cols = np.unique(movie_ids, return_inverse=True)
+        self.u_index: Dict[int, int] = {int(u): i for i, u in enumerate(self.users)}
+        self.m_index: Dict[int, int] = {int(m): i for i, m in enumerate(self.movies)}
+        shape = (len(self.users), len(self.movies))
+        self.R = sparse.csr_matrix((scores, (u_rows, m_cols)), shape=shape)
+        self.R.sort_indices()
+
+        # Mean-center per-user to mitigate user bias (only over rated entries)
+        counts = np.diff(self.R.indptr)
+        self.means = np.asarray(self.R.sum(axis=1)).ravel() / np.maximum(counts, 1)
+        self.Rc = self.R.copy()
+        self.Rc.data = self.Rc.data - np.repeat(self.means, counts)
+        self.norms = np.sqrt(np.asarray(self.Rc.multiply(self.Rc).sum(axis=1)).ravel()) + 1e-9
+        self.Rc_T = self.Rc.T.tocsr()
+
+    def __len__(self) -> int:
+        return self.R.nnz
+
+    @classmethod
+    def from_db(cls, db: Session) -> "RatingsMatrix":
+        rows = db.query(Rating.user_id, Rating.movie_id, Rating.score).all()
+        if not rows:
+            return cls([], [], [])
+        u, m, s = zip(*rows)
+        return cls(u, m, s)
+
+    def user_similarities(self, ui: int) -> np.ndarray:
+        """Cosine similarity of user row `ui` to every user (self set to 0)."""
+        dots = self.Rc @ self.Rc[ui].toarray().ravel()
+        sims = dots / (self.norms * self.norms[ui])
+        sims[ui] = 0.0  # exclude self
+        return sims
+
+    def predict_user(self, ui: int, k: int = 20) -> np.ndarray:
+        """Predicted score for every movie column; already rated movies get -1."""
+        sims = self.user_similarities(ui)
+
+        # K nearest neighbors (by similarity) without sorting all users
+        if k < len(sims):
+            nn_idx = np.argpartition(-sims, k - 1)[:k]
+        else:
+            nn_idx = np.arange(len(sims))
+        weights = np.zeros(len(sims))
+        weights[nn_idx] = sims[nn_idx]
+        denom = float(np.sum(np.abs(weights))) + 1e-9
+
+        # one sparse product scores all items: sum_v w_v * Rc[v, :]
+        num = self.Rc_T @ weights
+        preds = self.means[ui] + num / denom  # de-center
+        start, end = self.R.indptr[ui], self.R.indptr[ui + 1]
+        preds[self.R.indices[start:end]] = -1  # already seen
+        return preds
@@ -3,9 +3,105 @@ import os
 class Settings:
     APP_NAME: str = "Movie Recommender"
     SQLALCHEMY_DATABASE_URI: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    # replica for the recommender reads (get_read_db); empty = use DATABASE_URL
+    DATABASE_READ_URL: str = os.getenv("DATABASE_READ_URL", "")
+    # serve the API from AsyncEngines (aiosqlite / asyncpg, see app.routers.aio)
+    ASYNC_DB: bool = os.getenv("ASYNC_DB", "0") == "1"
+    # connection pool (server databases, see app.database.make_engine)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; below the server's idle timeout
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+    # SQLite connection pragmas
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # NORMAL is durable enough under WAL
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 << 20)))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
     JWT_SECRET: str = os.getenv("JWT_SECRET", "change-me-in-prod")
     JWT_ALG: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "120"))
+    # authenticated users resolved from the token's uid through a TTL cache (see app.auth)
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+    # bcrypt cost and the bounded pool it runs on (see app.executor.run_hash)
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    HASH_WORKERS: int = int(os.getenv("HASH_WORKERS", "2"))
+    HASH_MAX_QUEUE: int = int(os.getenv("HASH_MAX_QUEUE", "64"))  # waiting logins/signups before 503
     ENABLE_TFIDF: bool = os.getenv("ENABLE_TFIDF", "1") == "1"  # allow disabling TF-IDF for speed
+    TFIDF_MAX_FEATURES: int = int(os.getenv("TFIDF_MAX_FEATURES", "8000"))
+    CONTENT_MODEL_DIR: str = os.getenv("CONTENT_MODEL_DIR", "./models/content")
+    # refit once folded-in (not fitted) movies exceed this share of the catalog
+    CONTENT_MODEL_MAX_DRIFT: float = float(os.getenv("CONTENT_MODEL_MAX_DRIFT", "0.2"))
+    CONTENT_MODEL_SYNC_SECONDS: int = int(os.getenv("CONTENT_MODEL_SYNC_SECONDS", "60"))  # new-movie check interval
+    # content user profiles (see app.content_profile)
+    CONTENT_DISLIKE_WEIGHT: float = float(os.getenv("CONTENT_DISLIKE_WEIGHT", "0"))  # 0 = likes only, e.g. 0.5 to push away from dislikes
+    CONTENT_DECAY_HALF_LIFE_DAYS: float = float(os.getenv("CONTENT_DECAY_HALF_LIFE_DAYS", "0"))  # 0 = no decay
+    CONTENT_PROFILE_CACHE_MAX_ENTRIES: int = int(os.getenv("CONTENT_PROFILE_CACHE_MAX_ENTRIES", "10000"))
+    # approximate nearest-neighbour search for content-based recommendations (see app.ann)
+    CONTENT_ANN: bool = os.getenv("CONTENT_ANN", "0") == "1"
+    ANN_MIN_MOVIES: int = int(os.getenv("ANN_MIN_MOVIES", "20000"))  # exact scan below this catalog size
+    ANN_DIM: int = int(os.getenv("ANN_DIM", "128"))
+    ANN_NLIST: int = int(os.getenv("ANN_NLIST", "0"))  # 0 = 4 * sqrt(#movies)
+    ANN_NPROBE: int = int(os.getenv("ANN_NPROBE", "8"))
+    # ALS matrix factorization (scripts/train_mf.py, see app.mf)
+    MF_MODEL_DIR: str = os.getenv("MF_MODEL_DIR", "./models/mf")
+    MF_FACTORS: int = int(os.getenv("MF_FACTORS", "64"))
+    MF_REG: float = float(os.getenv("MF_REG", "0.1"))
+    MF_ITERATIONS: int = int(os.getenv("MF_ITERATIONS", "15"))
+    MF_IMPLICIT: bool = os.getenv("MF_IMPLICIT", "0") == "1"
+    MF_ALPHA: float = float(os.getenv("MF_ALPHA", "40"))
+    # hybrid content + CF blend (see app.recommenders.hybrid)
+    HYBRID_WEIGHT_CONTENT: float = float(os.getenv("HYBRID_WEIGHT_CONTENT", "0.5"))
+    HYBRID_WEIGHT_CF: float = float(os.getenv("HYBRID_WEIGHT_CF", "0.5"))
+    HYBRID_MMR_LAMBDA: float = float(os.getenv("HYBRID_MMR_LAMBDA", "0.7"))  # 1 = no diversity re-ranking
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "200"))  # blended pool re-ranked by MMR
+    # item-item neighbour lists (scripts/build_item_cf.py, see app.item_cf)
+    ITEM_CF_DIR: str = os.getenv("ITEM_CF_DIR", "./models/item_cf")
+    ITEM_CF_NEIGHBORS: int = int(os.getenv("ITEM_CF_NEIGHBORS", "50"))
+    ITEM_CF_WORKERS: int = int(os.getenv("ITEM_CF_WORKERS", str(os.cpu_count() or 1)))
+    ITEM_CF_REFRESH_SECONDS: int = int(os.getenv("ITEM_CF_REFRESH_SECONDS", "30"))
+    ITEM_CF_REFRESH_MAX_MOVIES: int = int(os.getenv("ITEM_CF_REFRESH_MAX_MOVIES", "64"))  # per refresh round
+    # batch scoring / precomputed recommendations (see app.batch)
+    BATCH_BLOCK_SIZE: int = int(os.getenv("BATCH_BLOCK_SIZE", "256"))
+    BATCH_MAX_CELLS: int = int(os.getenv("BATCH_MAX_CELLS", str(1 << 24)))  # dense scores per block
+    BATCH_MAX_USERS: int = int(os.getenv("BATCH_MAX_USERS", "1000"))  # per API call
+    BATCH_API_KEY: str = os.getenv("BATCH_API_KEY", "")  # X-API-Key for other users' ids; empty = own id only
+    PRECOMPUTED_MAX_AGE_SECONDS: int = int(os.getenv("PRECOMPUTED_MAX_AGE_SECONDS", "86400"))
+    # per-user recommendation result cache (see app.reco_cache)
+    RECO_CACHE_ENABLED: bool = os.getenv("RECO_CACHE_ENABLED", "1") == "1"
+    RECO_CACHE_MAX_ENTRIES: int = int(os.getenv("RECO_CACHE_MAX_ENTRIES", "10000"))
+    RECO_CACHE_TTL_SECONDS: int = int(os.getenv("RECO_CACHE_TTL_SECONDS", "300"))
+    RECO_CACHE_URL: str = os.getenv("RECO_CACHE_URL", "")  # redis://host:6379/0 to share across workers
+    # execution layer for recommender work (see app.executor)
+    SCORING_WORKERS: int = int(os.getenv("SCORING_WORKERS", "4"))
+    BUILD_WORKERS: int = int(os.getenv("BUILD_WORKERS", "1"))  # 0 = build models in-process
+    REC_MAX_CONCURRENT: int = int(os.getenv("REC_MAX_CONCURRENT", "4"))  # per endpoint
+    REC_MAX_QUEUE: int = int(os.getenv("REC_MAX_QUEUE", "16"))  # waiting requests before 503
+    REC_LIMITS: str = os.getenv("REC_LIMITS", "")  # per-endpoint overrides, e.g. "content=2:8,batch=1:2"
+    # startup (see app.warmup): create missing tables in the lifespan (0 = run scripts/init_db.py instead)
+    DB_CREATE_SCHEMA: bool = os.getenv("DB_CREATE_SCHEMA", "1") == "1"
+    STARTUP_WARMUP: str = os.getenv("STARTUP_WARMUP", "background")  # blocking | background | off
+    # versioned model snapshots rebuilt and swapped in by a background worker (see app.model_registry)
+    MODEL_WORKER: bool = os.getenv("MODEL_WORKER", "1") == "1"
+    MODEL_KINDS: str = os.getenv("MODEL_KINDS", "content,popularity,item")  # rebuilt on schedule; add mf
+    MODEL_WATCH_SECONDS: float = float(os.getenv("MODEL_WATCH_SECONDS", "5"))  # new snapshot / trigger checks
+    MODEL_REBUILD_SECONDS: int = int(os.getenv("MODEL_REBUILD_SECONDS", "3600"))  # 0 = no scheduled rebuilds
+    MODEL_REBUILD_AFTER_RATINGS: int = int(os.getenv("MODEL_REBUILD_AFTER_RATINGS", "1000"))  # 0 = off
+    MODEL_KEEP_SNAPSHOTS: int = int(os.getenv("MODEL_KEEP_SNAPSHOTS", "3"))
+    # how often the in-memory ratings store is checked against the database
+    RATINGS_STORE_RESYNC_SECONDS: int = int(os.getenv("RATINGS_STORE_RESYNC_SECONDS", "60"))
+    # Bayesian popularity score in movie_stats: (w * mean + sum) / (w + count)
+    POPULARITY_PRIOR_MEAN: float = float(os.getenv("POPULARITY_PRIOR_MEAN", "3.0"))
+    POPULARITY_PRIOR_WEIGHT: float = float(os.getenv("POPULARITY_PRIOR_WEIGHT", "10"))
+    # in-memory cold-start ranking (see app.popularity)
+    POPULARITY_REFRESH_SECONDS: int = int(os.getenv("POPULARITY_REFRESH_SECONDS", "60"))
+    POPULARITY_YEAR_BUCKET: int = int(os.getenv("POPULARITY_YEAR_BUCKET", "10"))  # years per bucket
+    POPULARITY_DIR: str = os.getenv("POPULARITY_DIR", "./models/popularity")
+    # how often the in-memory genre index looks for new movies (see app.genres)
+    GENRE_INDEX_REFRESH_SECONDS: int = int(os.getenv("GENRE_INDEX_REFRESH_SECONDS", "60"))
+    # in-memory id -> title catalog for result hydration (see app.catalog)
+    CATALOG_REFRESH_SECONDS: int = int(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
 
 settings = Settings()
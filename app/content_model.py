@@ -0,0 +1,240 @@
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import db_source
+from app import model_registry
+from app.models import Movie
+from app.executor import run_build
+from app.utils import logger, timed
+
+if TYPE_CHECKING:  # scikit-learn (~1s to import) is loaded with the first model
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+# Persisted TF-IDF model for content-based recommendations.
+# Layout of a settings.CONTENT_MODEL_DIR snapshot (see app.model_registry):
+#   data.npy, indices.npy, indptr.npy - CSR matrix (#movies, #features), rows
+#                 L2-normalised, memory-mapped by every serving process
+#   ids.npy     - movie id for each matrix row
+#   meta.json   - vocabulary, idf weights, version and drift counters
+# Movies added since the snapshot are folded into the served model in
+# memory; a refit (drift over CONTENT_MODEL_MAX_DRIFT) is a new snapshot.
+# Movies are only edited in place by bulk ingestion (upserts of existing
+# ids), which refits afterwards (app.ingest.rebuild_after_ingest).
+
+def _genres_to_str(genres: str) -> str:
+    return "" if not genres else " ".join([g.strip().replace("-", "").replace("|", " ") for g in genres.split("|")])
+
+def movie_doc(m: Movie) -> str:
+    # Corpus document: genres + optional overview
+    text = _genres_to_str(m.genres)
+    if settings.ENABLE_TFIDF and m.overview:
+        text = f"{text} {m.overview}"
+    return text
+
+def _vectorizer(**kwargs) -> "TfidfVectorizer":
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(max_features=settings.TFIDF_MAX_FEATURES, ngram_range=(1, 2), stop_words="english", **kwargs)
+
+def _restore_vectorizer(vocabulary: dict, idf) -> "TfidfVectorizer":
+    vectorizer = _vectorizer(vocabulary=vocabulary)
+    vectorizer.idf_ = np.asarray(idf, dtype=np.float64)
+    return vectorizer
+
+def _fit_docs(docs: List[str]):
+    # module-level so it can run in the build process pool
+    vectorizer = _vectorizer()
+    X = vectorizer.fit_transform(docs).tocsr()
+    return X, {t: int(i) for t, i in vectorizer.vocabulary_.items()}, vectorizer.idf_
+
+class ContentModel:
+    def __init__(self, vectorizer: "TfidfVectorizer", X: sparse.csr_matrix, ids: np.ndarray,
+                 version: int = 1, fitted_rows: Optional[int] = None, folded: int = 0, source: str = ""):
+        self.vectorizer = vectorizer
+        self.X = X
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.version = version
+        self.fitted_rows = len(self.ids) if fitted_rows is None else fitted_rows
+        self.folded = folded
+        self.source = source  # database the model was built from
+        self.id_to_idx = {int(mid): i for i, mid in enumerate(self.ids)}
+
+    @property
+    def max_id(self) -> int:
+        return int(self.ids.max()) if len(self.ids) else 0
+
+    @property
+    def drift(self) -> float:
+        # share of rows transformed with a vocabulary/idf fitted on another corpus
+        return self.folded / max(self.fitted_rows, 1)
+
+    @classmethod
+    def fit(cls, movies: List[Movie], version: int = 1, source: str = "") -> "ContentModel":
+        vectorizer = _vectorizer()
+        X = vectorizer.fit_transform([movie_doc(m) for m in movies]).tocsr()
+        return cls(vectorizer, X, [m.id for m in movies], version=version, source=source)
+
+    def fold_in(self, movies: Iterable[Movie]) -> "ContentModel":
+        """New movies (ids above max_id) transformed with the fitted vocabulary and appended (no refit).
+
+        Returns a new model so readers holding the old one are never affected.
+        """
+        movies = list(movies)
+        if not movies:
+            return self
+        rows = self.vectorizer.transform([movie_doc(m) for m in movies]).tocsr()
+        X = sparse.vstack([self.X, rows], format="csr")
+        ids = np.concatenate([self.ids, np.array([m.id for m in movies], dtype=np.int64)])
+        return ContentModel(self.vectorizer, X, ids, version=self.version, fitted_rows=self.fitted_rows,
+                            folded=self.folded + len(movies), source=self.source)
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name in ("data", "indices", "indptr"):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self.X, name))
+        np.save(os.path.join(path, "ids.npy"), self.ids)
+        meta = {
+            "version": self.version,
+            "fitted_rows": self.fitted_rows,
+            "folded": self.folded,
+            "source": self.source,
+            "shape": list(self.X.shape),
+            "vocabulary": {t: int(i) for t, i in self.vectorizer.vocabulary_.items()},
+            "idf": self.vectorizer.idf_.tolist(),
+        }
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))
+
+    @classmethod
+    def load(cls, path: str) -> "ContentModel":
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        vectorizer = _restore_vectorizer(meta["vocabulary"], meta["idf"])
+        if "shape" in meta:
+            data, indices, indptr = (np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                                     for name in ("data", "indices", "indptr"))
+            X = sparse.csr_matrix((data, indices, indptr), shape=tuple(meta["shape"]), copy=False)
+        else:  # written before snapshots
+            X = sparse.load_npz(os.path.join(path, "matrix.npz")).tocsr()
+        ids = np.load(os.path.join(path, "ids.npy"))
+        return cls(vectorizer, X, ids, version=meta["version"],
+                   fitted_rows=meta["fitted_rows"], folded=meta["folded"], source=meta.get("source", ""))
+
+_model: Optional[ContentModel] = None
+_path: Optional[str] = None
+_lock = threading.Lock()
+_synced_at = 0.0  # last check for movies added since the served model
+
+@timed("content_model_build")
+def build_content_model(db: Session, version: Optional[int] = None) -> Optional[ContentModel]:
+    """Refit on the whole catalog and publish it as the next snapshot (`version` by default)."""
+    global _path
+    started = time.time()
+    movies = db.query(Movie).order_by(Movie.id).all()
+    if not movies:
+        return None
+    # refit in the build process pool, off the serving threads
+    X, vocabulary, idf = run_build(_fit_docs, [movie_doc(m) for m in movies])
+    model = ContentModel(_restore_vectorizer(vocabulary, idf), X, [m.id for m in movies],
+                         version=version or model_registry.next_version(settings.CONTENT_MODEL_DIR),
+                         source=_source(db))
+    _path = model_registry.publish(settings.CONTENT_MODEL_DIR, model.version, model.save, started,
+                                   movies=X.shape[0], features=X.shape[1])
+    model_registry.loaded("content", model.version)
+    logger.info(f"[CONTENT] built model v{model.version}: {model.X.shape[0]} movies x {model.X.shape[1]} features")
+    return model
+
+def _source(db: Session) -> str:
+    return db_source(db)
+
+def _load(db: Session, path: str) -> Optional[ContentModel]:
+    try:
+        model = ContentModel.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    # a snapshot built against another database (or with deleted movies) is useless
+    cnt, max_id = db.query(func.count(Movie.id), func.max(Movie.id)).one()
+    if model.source != _source(db) or model.max_id > (max_id or 0) or len(model.ids) > (cnt or 0):
+        logger.info("[CONTENT] stored model does not match the catalog, rebuilding")
+        return None
+    return model
+
+def _refit(db: Session, model: ContentModel) -> ContentModel:
+    logger.info(f"[CONTENT] drift {model.drift:.2f} over threshold, refitting")
+    if model_registry.worker.request("content"):
+        return model  # served folded until the worker publishes the refit
+    return build_content_model(db) or model
+
+def _sync(db: Session, model: ContentModel) -> ContentModel:
+    global _synced_at
+    _synced_at = time.time()
+    new = db.query(Movie).filter(Movie.id > model.max_id).order_by(Movie.id).all()
+    if not new:
+        return model
+    model = model.fold_in(new)
+    return _refit(db, model) if model.drift > settings.CONTENT_MODEL_MAX_DRIFT else model
+
+def build_snapshot(db: Session) -> Optional[int]:
+    """Model worker entry point: refit and serve the new snapshot; returns its version."""
+    global _model
+    model = build_content_model(db)
+    if model is None:
+        return None
+    with _lock:
+        _model = _sync(db, model)
+    return model.version
+
+def load_current(db: Session, wait: bool = True) -> Optional[ContentModel]:
+    """Swap in the current CONTENT_MODEL_DIR snapshot if it isn't the one served (`wait`: for the lock)."""
+    global _model, _path
+    path = model_registry.current_path(settings.CONTENT_MODEL_DIR)
+    if path is None or path == _path or not _lock.acquire(blocking=wait):
+        return _model
+    try:
+        if path != _path:
+            model = _load(db, path)
+            _path = path  # a mismatching snapshot is not retried; get_content_model builds a new one
+            if model is not None:
+                _model = _sync(db, model)
+                model_registry.loaded("content", model.version)
+    finally:
+        _lock.release()
+    return _model
+
+def get_content_model(db: Session) -> Optional[ContentModel]:
+    """Current model: the served snapshot (swapped like app.mf.get_mf_model, or built on first use)
+    with movies added since folded in."""
+    global _model
+    if _model is None or not model_registry.watching():
+        load_current(db, wait=_model is None)
+    model = _model
+    if model is not None:
+        # never wait for a sync (see app.catalog.get_catalog)
+        if time.time() - _synced_at <= settings.CONTENT_MODEL_SYNC_SECONDS or not _lock.acquire(blocking=False):
+            return model
+        try:
+            _model = _sync(db, _model)
+        finally:
+            _lock.release()
+        return _model
+    with _lock:
+        if _model is None:
+            _model = build_content_model(db)
+            return _model
+        _model = _sync(db, _model)
+        return _model
+
+def rebuild_content_model(db: Session) -> Optional[ContentModel]:
+    global _model
+    with _lock:
+        _model = build_content_model(db)
+        return _model
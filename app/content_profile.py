@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Rating
+
+# Content-based user profiles: one sparse product of centered rating
+# weights with the TF-IDF rows of the rated movies. Likes weigh score - 3;
+# dislikes the same scaled by CONTENT_DISLIKE_WEIGHT (0 ignores them). With
+# CONTENT_DECAY_HALF_LIFE_DAYS set, a weight halves per half-life of the
+# rating's age (Rating.updated_at).
+# Profiles are cached per user. On each use the user's current ratings
+# (ratings store) are diffed against the ones the profile was built from
+# and only the changed rows are added or subtracted, so a new rating costs
+# one row update rather than a rebuild. Decay factors are relative to the
+# profile's build time; ageing scales every weight alike, which cosine
+# similarity ignores.
+
+MAX_DECAY_HALVINGS = 30  # rebuild before newer ratings' relative factors lose float precision
+
+def rating_weight(score: int) -> float:
+    w = score - 3.0
+    return w if w > 0 else w * settings.CONTENT_DISLIKE_WEIGHT
+
+def _decay(age_seconds: float) -> float:
+    half_life = settings.CONTENT_DECAY_HALF_LIFE_DAYS * 86400.0
+    return 2.0 ** (-age_seconds / half_life) if half_life > 0 else 1.0
+
+class UserProfile:
+    __slots__ = ("key", "built_at", "scores", "coef", "vec")
+
+    def __init__(self, key: tuple, built_at: float, scores: Dict[int, int], coef: Dict[int, float],
+                 vec: sparse.csr_matrix):
+        self.key = key  # (content model version, folded rows) the rows refer to
+        self.built_at = built_at
+        self.scores = scores  # ratings the profile reflects
+        self.coef = coef  # movie id -> weight * decay (relative to built_at)
+        self.vec = vec  # (1, #features)
+
+    @property
+    def usable(self) -> bool:
+        # at least one like, as before negative feedback was supported
+        return any(c > 0 for c in self.coef.values())
+
+def build_profile(db: Optional[Session], model, user_id: int, ratings: Dict[int, int]) -> UserProfile:
+    now = time.time()
+    ages: Dict[int, float] = {}
+    if settings.CONTENT_DECAY_HALF_LIFE_DAYS > 0 and db is not None:
+        utcnow = datetime.utcnow()
+        ages = {mid: (utcnow - ts).total_seconds()
+                for mid, ts in db.query(Rating.movie_id, Rating.updated_at).filter(Rating.user_id == user_id)
+                if ts is not None}
+    coef = {mid: rating_weight(s) * _decay(ages.get(mid, 0.0))
+            for mid, s in ratings.items() if mid in model.id_to_idx}
+    coef = {mid: c for mid, c in coef.items() if c != 0}
+    rows = np.fromiter((model.id_to_idx[m] for m in coef), dtype=np.int64, count=len(coef))
+    W = sparse.csr_matrix((np.fromiter(coef.values(), dtype=np.float64, count=len(coef)),
+                           (np.zeros(len(coef), dtype=np.int64), rows)), shape=(1, model.X.shape[0]))
+    return UserProfile((model.version, model.folded), now, dict(ratings), coef, (W @ model.X).tocsr())
+
+def update_profile(profile: UserProfile, model, ratings: Dict[int, int]) -> UserProfile:
+    """New profile for `ratings`: rows of the movies rated, re-rated or unrated since are applied."""
+    now = time.time()
+    factor = _decay(profile.built_at - now)  # ratings made now weigh more than the aged ones
+    coef = dict(profile.coef)
+    changed = {m for m in ratings.keys() | profile.scores.keys() if ratings.get(m) != profile.scores.get(m)}
+    delta_rows, delta = [], []
+    for mid in changed:
+        if mid not in model.id_to_idx:
+            continue
+        new = rating_weight(ratings[mid]) * factor if mid in ratings else 0.0
+        old = coef.pop(mid, 0.0)
+        if new:
+            coef[mid] = new
+        if new != old:
+            delta_rows.append(model.id_to_idx[mid])
+            delta.append(new - old)
+    vec = profile.vec
+    if delta:
+        D = sparse.csr_matrix((delta, (np.zeros(len(delta), dtype=np.int64), delta_rows)),
+                              shape=(1, model.X.shape[0]))
+        vec = (vec + D @ model.X).tocsr()
+    return UserProfile(profile.key, profile.built_at, dict(ratings), coef, vec)
+
+class ProfileCache:
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[int, UserProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.updates = self.misses = 0
+
+    def get(self, db: Optional[Session], model, user_id: int, ratings: Dict[int, int]) -> Optional[sparse.csr_matrix]:
+        """The user's profile vector (1, #features) for `ratings`, or None without any liked movie."""
+        with self._lock:
+            profile = self._data.get(user_id)
+        key = (model.version, model.folded)
+        stale = profile is None or profile.key != key or (
+            settings.CONTENT_DECAY_HALF_LIFE_DAYS > 0
+            and time.time() - profile.built_at > MAX_DECAY_HALVINGS * settings.CONTENT_DECAY_HALF_LIFE_DAYS * 86400)
+        if stale:
+            profile = build_profile(db, model, user_id, ratings)
+            self.misses += 1
+        elif profile.scores != ratings:
+            profile = update_profile(profile, model, ratings)
+            self.updates += 1
+        else:
+            self.hits += 1
+        if self.max_entries > 0:
+            with self._lock:
+                self._data[user_id] = profile
+                self._data.move_to_end(user_id)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+        return profile.vec if profile.usable else None
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.updates + self.misses
+            return {"entries": len(self._data), "max_entries": self.max_entries, "hits": self.hits,
+                    "incremental_updates": self.updates, "builds": self.misses,
+                    "hit_rate": round((self.hits + self.updates) / total, 4) if total else 0.0}
+
+profile_cache = ProfileCache(settings.CONTENT_PROFILE_CACHE_MAX_ENTRIES)
@@ -1,15 +1,154 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from typing import Dict, Optional, Tuple
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
 from app.config import settings
 
-connect_args = {"check_same_thread": False} if settings.SQLALCHEMY_DATABASE_URI.startswith("sqlite") else {}
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, echo=False, future=True, connect_args=connect_args)
+# Engines are built by make_engine: SQLite connections get WAL, a busy
+# timeout and mmap/page-cache pragmas on connect; server databases get a
+# sized, recycled, pre-pinged connection pool. DATABASE_READ_URL points the
+# heavy recommender reads (get_read_db) at a replica; without it they share
+# the primary engine. ASYNC_DB serves the routers in app.routers.aio from
+# AsyncEngines over the same URLs (aiosqlite / asyncpg, see get_async_db).
+
+def _is_memory(url) -> bool:
+    return url.database in (None, "", ":memory:") or "mode=memory" in str(url)
+
+def _sqlite_pragmas(read_only: bool, memory: bool):
+    def on_connect(dbapi_conn, record):
+        cur = dbapi_conn.cursor()
+        if not read_only and not memory:
+            # persistent per database file; lets readers run while a writer commits
+            cur.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cur.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cur.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cur.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cur.execute(f"PRAGMA cache_size={-settings.SQLITE_CACHE_SIZE_KB}")  # negative = KiB
+        cur.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cur.execute("PRAGMA query_only=ON")
+        cur.close()
+    return on_connect
+
+def _pool_args() -> dict:
+    return dict(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT, pool_recycle=settings.DB_POOL_RECYCLE,
+                pool_pre_ping=settings.DB_POOL_PRE_PING)
+
+def make_engine(url: str, read_only: bool = False) -> Engine:
+    """Engine for `url` with this app's pool settings and, on SQLite, connection pragmas."""
+    if url.startswith("sqlite"):
+        eng = create_engine(url, echo=False, future=True,
+                            connect_args={"check_same_thread": False,
+                                          "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000})
+        event.listen(eng, "connect", _sqlite_pragmas(read_only, _is_memory(eng.url)))
+        return eng
+    return create_engine(url, echo=False, future=True, **_pool_args())
+
+engine = make_engine(settings.SQLALCHEMY_DATABASE_URI)
+read_engine = make_engine(settings.DATABASE_READ_URL, read_only=True) if settings.DATABASE_READ_URL else engine
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine, future=True)
 Base = declarative_base()
 
+# replica engine -> primary (async engines differ from their sync twin only in the driver)
+_aliases: Dict[Engine, Engine] = {}
+_read_only = set()
+if read_engine is not engine:
+    _aliases[read_engine] = engine
+    _read_only.add(read_engine)
+
+def _bind(db: Session) -> Engine:
+    bind = db.get_bind()
+    return getattr(bind, "engine", bind)
+
+def db_source(db: Session) -> str:
+    """Which database a session reads; a replica (or async) session reports its primary, so in-memory
+    structures (ratings store, models, indexes) are shared instead of rebuilt per engine."""
+    bind = _bind(db)
+    url = _aliases.get(bind, bind).url
+    return url.set(drivername=url.get_backend_name()).render_as_string(hide_password=True)
+
+def is_read_only(db: Session) -> bool:
+    return _bind(db) in _read_only
+
+def pool_status() -> dict:
+    out = {"primary": engine.pool.status()}
+    if read_engine is not engine:
+        out["replica"] = read_engine.pool.status()
+    if _async is not None:
+        out["async_primary"] = _async[0].pool.status()
+        if _async[1] is not _async[0]:
+            out["async_replica"] = _async[1].pool.status()
+    return out
+
+def init_db(bind: Optional[Engine] = None) -> None:
+    """Create missing tables: the schema step of the app's lifespan (DB_CREATE_SCHEMA) and of the scripts."""
+    import app.models  # noqa: F401  (registers the tables on Base)
+    Base.metadata.create_all(bind=bind or engine)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    # recommender reads; may lag the primary by the replica's replication delay
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# -------- Async mode --------
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+_async: Optional[Tuple] = None  # (engine, read engine, sessionmaker, read sessionmaker)
+
+def async_url(url: str) -> str:
+    u = make_url(url)
+    driver = ASYNC_DRIVERS.get(u.get_backend_name())
+    return u.set(drivername=driver).render_as_string(hide_password=False) if driver else url
+
+def make_async_engine(url: str, read_only: bool = False):
+    from sqlalchemy.ext.asyncio import create_async_engine
+    url = async_url(url)
+    if url.startswith("sqlite"):
+        eng = create_async_engine(url, echo=False, connect_args={"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000})
+        event.listen(eng.sync_engine, "connect", _sqlite_pragmas(read_only, _is_memory(eng.url)))
+        return eng
+    return create_async_engine(url, echo=False, **_pool_args())
+
+def async_engines() -> Tuple:
+    """Created on first use, so the async drivers are only needed with ASYNC_DB."""
+    global _async
+    if _async is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        aeng = make_async_engine(settings.SQLALCHEMY_DATABASE_URI)
+        aread = make_async_engine(settings.DATABASE_READ_URL, read_only=True) if settings.DATABASE_READ_URL else aeng
+        if aread is not aeng:
+            _aliases[aread.sync_engine] = engine
+            _read_only.add(aread.sync_engine)
+        # expire_on_commit=False: attributes stay readable after commit without an implicit (sync) refresh
+        _async = (aeng, aread, async_sessionmaker(aeng, autoflush=False, expire_on_commit=False),
+                  async_sessionmaker(aread, autoflush=False, expire_on_commit=False))
+    return _async
+
+async def get_async_db():
+    async with async_engines()[2]() as db:
+        yield db
+
+async def get_async_read_db():
+    async with async_engines()[3]() as db:
+        yield db
+
+async def dispose_async_engines() -> None:
+    global _async
+    if _async is not None:
+        aeng, aread = _async[:2]
+        await aeng.dispose()
+        if aread is not aeng:
+            await aread.dispose()
+        _async = None
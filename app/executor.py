@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from app.config import settings
+from app.utils import logger
+
+# Bounded execution layer for recommender work.
+# Scoring runs on a dedicated thread pool (NumPy/BLAS release the GIL), so it
+# never occupies the threadpool FastAPI uses for sync routes such as login,
+# movie listing and rating writes. Heavy model builds go to a process pool.
+# Each endpoint has a concurrency limit plus a bounded queue; beyond that
+# requests get 503. Concurrent identical requests share one computation.
+# bcrypt hashing has its own small pool with a bounded queue (run_hash,
+# run_hash_sync), so a burst of logins can't starve scoring or tie up the
+# threadpool the other sync routes need.
+
+_scoring_pool = ThreadPoolExecutor(max_workers=settings.SCORING_WORKERS, thread_name_prefix="scoring")
+_hash_pool = ThreadPoolExecutor(max_workers=settings.HASH_WORKERS, thread_name_prefix="bcrypt")
+_build_pool: Optional[ProcessPoolExecutor] = None
+_build_lock = threading.Lock()
+
+def _parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    # "content=4:16,cf=2:8" -> {"content": (4, 16), "cf": (2, 8)}
+    out = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, lim = part.partition("=")
+        conc, _, queue = lim.partition(":")
+        out[name.strip()] = (int(conc), int(queue or settings.REC_MAX_QUEUE))
+    return out
+
+class EndpointLimiter:
+    def __init__(self, name: str, max_concurrent: int, max_queue: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.pending = 0  # running + waiting
+        self.rejected = 0
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._count_lock = threading.Lock()
+
+    def _reject(self) -> HTTPException:
+        self.rejected += 1
+        return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                             detail=f"Too many concurrent {self.name} requests, retry shortly",
+                             headers={"Retry-After": "1"})
+
+    def _admit(self) -> None:
+        # shared by the event loop and threadpool threads, hence the lock
+        with self._count_lock:
+            if self.pending >= self.max_concurrent + self.max_queue:
+                raise self._reject()
+            self.pending += 1
+
+    def _leave(self) -> None:
+        with self._count_lock:
+            self.pending -= 1
+
+    def __enter__(self):
+        # sync routes (threadpool threads): admission only, the pool they submit to bounds concurrency
+        self._admit()
+        return self
+
+    def __exit__(self, *exc):
+        self._leave()
+
+    async def __aenter__(self):
+        self._admit()
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:  # semaphores are bound to the loop they first wait on
+            self._sem, self._loop = asyncio.Semaphore(self.max_concurrent), loop
+        try:
+            await self._sem.acquire()
+        except BaseException:
+            self._leave()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self._sem.release()
+        self._leave()
+
+_limiters: Dict[str, EndpointLimiter] = {}
+_inflight: Dict[Hashable, "asyncio.Future"] = {}
+
+def limiter(name: str, default: Optional[Tuple[int, int]] = None) -> EndpointLimiter:
+    lim = _limiters.get(name)
+    if lim is None:
+        conc, queue = _parse_limits(settings.REC_LIMITS).get(
+            name, default or (settings.REC_MAX_CONCURRENT, settings.REC_MAX_QUEUE))
+        lim = _limiters[name] = EndpointLimiter(name, conc, queue)
+    return lim
+
+async def run_scoring(endpoint: str, key: Hashable, fn: Callable[[], Any]) -> Any:
+    """Run `fn` on the scoring pool under `endpoint`'s limits; identical in-flight keys share one run."""
+    loop = asyncio.get_running_loop()
+    key = (id(loop), key)
+    fut = _inflight.get(key)
+    if fut is not None:
+        return await asyncio.shield(fut)
+    async with limiter(endpoint):
+        fut = _inflight.get(key)  # someone may have started it while we queued
+        if fut is not None:
+            return await asyncio.shield(fut)
+        # carry the request's context (per-request SQL counter) into the scoring thread
+        ctx = contextvars.copy_context()
+        fut = asyncio.ensure_future(loop.run_in_executor(_scoring_pool, ctx.run, fn))
+        _inflight[key] = fut
+        try:
+            return await asyncio.shield(fut)
+        finally:
+            if _inflight.get(key) is fut:
+                del _inflight[key]
+
+async def run_hash(fn: Callable, *args) -> Any:
+    """Run a password hash/verify on the bcrypt pool; 503 once HASH_MAX_QUEUE callers are waiting."""
+    async with limiter("auth", (settings.HASH_WORKERS, settings.HASH_MAX_QUEUE)):
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+
+def run_hash_sync(fn: Callable, *args) -> Any:
+    """run_hash for sync routes: they wait on a threadpool thread, so the same bound (and 503) applies."""
+    with limiter("auth", (settings.HASH_WORKERS, settings.HASH_MAX_QUEUE)):
+        return _hash_pool.submit(fn, *args).result()
+
+def run_build(fn: Callable, *args) -> Any:
+    """Run a picklable, CPU-heavy model build in the build process pool and wait for it."""
+    global _build_pool
+    if settings.BUILD_WORKERS <= 0:
+        return fn(*args)
+    with _build_lock:
+        if _build_pool is None:
+            # spawn: forking a process that runs threads (uvicorn, scoring pool) can deadlock
+            _build_pool = ProcessPoolExecutor(max_workers=settings.BUILD_WORKERS,
+                                              mp_context=multiprocessing.get_context("spawn"))
+    try:
+        return _build_pool.submit(fn, *args).result()
+    except RuntimeError as e:  # pool shut down / broken (e.g. worker killed)
+        logger.warning(f"[EXECUTOR] build pool unavailable ({e}), building in-process")
+        return fn(*args)
+
+def stats() -> dict:
+    return {name: {"pending": lim.pending, "max_concurrent": lim.max_concurrent,
+                   "max_queue": lim.max_queue, "rejected": lim.rejected}
+            for name, lim in _limiters.items()}
+
+def shutdown() -> None:
+    _scoring_pool.shutdown(wait=False, cancel_futures=True)
+    _hash_pool.shutdown(wait=False, cancel_futures=True)
+    if _build_pool is not None:
+        _build_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,182 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import db_source
+from app.models import Genre, Movie, MovieGenre
+from app.utils import logger, timed
+
+# Normalized genres: genres/movie_genres mirror the pipe-separated
+# Movie.genres column. Requests only read them: movies newer than the last
+# linked one are indexed straight from Movie.genres until the model worker
+# links them (by id), so loaders only have to insert into movies;
+# rebuild_after_ingest / scripts/migrate_genres.py relink everything after
+# bulk edits of existing rows. Links and genres are inserted with ON
+# CONFLICT DO NOTHING, so several processes may link the same movies.
+# GenreIndex keeps one boolean array per genre, indexed by movie id, for
+# AND/OR filters in the movies router and candidate masks in recommenders.
+
+def parse_genres(genres: Optional[str]) -> List[str]:
+    out = []
+    for g in (genres or "").split("|"):
+        g = g.strip()
+        if g and g.lower() not in {o.lower() for o in out}:
+            out.append(g)
+    return out
+
+def parse_genre_filter(values: Optional[Sequence[str]]) -> List[str]:
+    # ?genre=Action&genre=Drama and ?genre=Action,Drama are equivalent
+    return [g.strip() for v in values or () for g in v.split(",") if g.strip()]
+
+def _insert_missing(db: Session, table, rows: List[dict]) -> None:
+    # rows another process inserted first are skipped instead of violating a unique key
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        db.execute(insert(table), rows)
+        return
+    db.execute(dialect_insert(table).on_conflict_do_nothing(), rows)
+
+def link_movies(db: Session, after_id: int = 0, chunk: int = 20000) -> int:
+    """Create movie_genres rows for movies with id > after_id (and their genres rows); returns links added."""
+    genre_ids = {name.lower(): gid for gid, name in db.query(Genre.id, Genre.name)}
+    added = 0
+    while True:
+        rows = (db.query(Movie.id, Movie.genres).filter(Movie.id > after_id)
+                .order_by(Movie.id).limit(chunk).all())
+        if not rows:
+            break
+        parsed = [(mid, parse_genres(genres)) for mid, genres in rows]
+        new: Dict[str, str] = {}  # first spelling of each unknown genre
+        for _, names in parsed:
+            for name in names:
+                if name.lower() not in genre_ids:
+                    new.setdefault(name.lower(), name)
+        if new:
+            _insert_missing(db, Genre.__table__, [{"name": name} for name in new.values()])
+            genre_ids = {name.lower(): gid for gid, name in db.query(Genre.id, Genre.name)}
+        links = [{"movie_id": mid, "genre_id": genre_ids[name.lower()]} for mid, names in parsed for name in names]
+        ids = [mid for mid, _ in rows]
+        db.query(MovieGenre).filter(MovieGenre.movie_id.in_(ids)).delete(synchronize_session=False)
+        if links:
+            _insert_missing(db, MovieGenre.__table__, links)
+        db.commit()
+        added += len(links)
+        after_id = rows[-1][0]
+    return added
+
+def migrate_genres(db: Session) -> int:
+    """Rebuild genres/movie_genres from Movie.genres."""
+    db.query(MovieGenre).delete(synchronize_session=False)
+    db.commit()
+    added = link_movies(db)
+    invalidate_genre_index()
+    return added
+
+class GenreIndex:
+    def __init__(self, bits: Dict[str, np.ndarray], names: Dict[str, str], max_movie_id: int,
+                 n_links: int = 0, source: str = ""):
+        self.bits = bits  # lower-cased name -> bool array over movie ids
+        self.names = names  # lower-cased name -> display name
+        self.max_movie_id = max_movie_id  # movies up to this id were linked when built
+        self.n_links = n_links
+        self.source = source
+        self.checked_at = time.time()
+        self.size = max_movie_id + 1
+
+    @classmethod
+    def from_db(cls, db: Session) -> "GenreIndex":
+        max_id = db.query(func.max(Movie.id)).scalar() or 0
+        names = {name.lower(): name for (name,) in db.query(Genre.name)}
+        rows = db.query(Genre.name, MovieGenre.movie_id).join(MovieGenre, MovieGenre.genre_id == Genre.id).all()
+        bits = {key: np.zeros(max_id + 1, dtype=bool) for key in names}
+        linked = 0
+        for name, mid in rows:
+            if mid <= max_id:
+                bits[name.lower()][mid] = True
+                linked = max(linked, mid)
+        # movies not linked yet: read from Movie.genres (linking is left to the write paths)
+        for mid, genres in db.query(Movie.id, Movie.genres).filter(Movie.id > linked):
+            for name in parse_genres(genres):
+                key = name.lower()
+                if key not in bits:
+                    names[key] = name
+                    bits[key] = np.zeros(max_id + 1, dtype=bool)
+                bits[key][mid] = True
+        return cls(bits, names, max_id, n_links=len(rows),
+                   source=db_source(db))
+
+    def mask(self, genres: Iterable[str], mode: str = "and", size: Optional[int] = None) -> np.ndarray:
+        """Movies (by id) having all (mode="and") or any (mode="or") of `genres`; unknown genres match nothing."""
+        keys = [g.strip().lower() for g in genres]
+        out = np.full(self.size, mode == "and", dtype=bool) if keys else np.ones(self.size, dtype=bool)
+        for key in keys:
+            b = self.bits.get(key)
+            if mode == "and":
+                if b is None:
+                    out[:] = False
+                    break
+                out &= b
+            elif b is not None:
+                out |= b
+        if size is not None and size != self.size:
+            # movies newer than the index count as not matching
+            out = np.concatenate([out, np.zeros(max(size - self.size, 0), dtype=bool)])[:size]
+        return out
+
+    def movie_ids(self, genres: Iterable[str], mode: str = "and") -> np.ndarray:
+        return np.flatnonzero(self.mask(genres, mode))
+
+_index: Optional[GenreIndex] = None
+_lock = threading.Lock()
+
+@timed("genre_index_build")
+def _build(db: Session) -> GenreIndex:
+    index = GenreIndex.from_db(db)
+    logger.info(f"[GENRES] indexed {len(index.bits)} genres over {index.max_movie_id} movie ids")
+    return index
+
+def link_new_movies(db: Session) -> int:
+    """Link movies added since the last linked one (model worker; never on the request path)."""
+    linked = db.query(func.max(MovieGenre.movie_id)).scalar() or 0
+    added = link_movies(db, after_id=linked)
+    if added:
+        logger.info(f"[GENRES] linked {added} new movie genres")
+    return added
+
+def get_genre_index(db: Session) -> GenreIndex:
+    """Current index; refreshed every GENRE_INDEX_REFRESH_SECONDS (callers keep the old one meanwhile)."""
+    global _index
+    source = db_source(db)
+    index = _index
+    if index is not None and index.source == source:
+        # never wait for a refresh: async routes call this on the event loop thread (run_sync),
+        # where blocking on a lock held by another request would stall every request
+        if time.time() - index.checked_at <= settings.GENRE_INDEX_REFRESH_SECONDS \
+                or not _lock.acquire(blocking=False):
+            return index
+        try:
+            max_id = db.query(func.max(Movie.id)).scalar() or 0
+            n_links = db.query(func.count(MovieGenre.movie_id)).scalar() or 0
+            if max_id != index.max_movie_id or n_links != index.n_links:
+                _index = _build(db)
+            else:
+                index.checked_at = time.time()
+        finally:
+            _lock.release()
+        return _index
+    with _lock:
+        if _index is None or _index.source != source:
+            _index = _build(db)
+        return _index
+
+def invalidate_genre_index() -> None:
+    global _index
+    _index = None
@@ -0,0 +1,252 @@
+import csv
+import gzip
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Movie, Rating, User
+from app.utils import logger
+
+# Streaming bulk loader for movie catalogs and ratings (scripts/ingest.py).
+# Input is CSV (header row) or JSON lines, optionally gzipped; MovieLens
+# column names (movieId, userId, rating, timestamp, "Title (1995)") are
+# understood. Rows are read in chunks and written with multi-row Core
+# INSERTs that upsert on the primary key / uniq_user_movie, so re-running a
+# chunk is harmless. After every committed chunk the byte offset is saved to
+# a checkpoint file; an interrupted run resumes from there.
+
+_TITLE_YEAR = re.compile(r"^(.*?)\s*\((\d{4})\)\s*$")
+PLACEHOLDER_PASSWORD = "!"  # not a bcrypt hash: imported users cannot log in until they reset it
+
+def _open(path: str):
+    return gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")
+
+def _is_jsonl(path: str) -> bool:
+    base = path[:-3] if path.endswith(".gz") else path
+    return base.rsplit(".", 1)[-1].lower() in ("jsonl", "ndjson", "json")
+
+def read_records(path: str, offset: int = 0, header: Optional[List[str]] = None
+                 ) -> Iterator[Tuple[dict, int, Optional[List[str]]]]:
+    """Yield (record, byte offset after it, csv header) starting at `offset`."""
+    with _open(path) as f:
+        f.seek(offset)
+        pos = offset
+
+        def lines():
+            nonlocal pos
+            for raw in f:
+                pos += len(raw)
+                yield raw.decode("utf-8-sig" if pos == len(raw) else "utf-8")
+
+        if _is_jsonl(path):
+            for line in lines():
+                if line.strip():
+                    yield json.loads(line), pos, None
+            return
+        reader = csv.reader(lines())
+        if header is None:
+            header = next(reader, None)
+            if header is None:
+                return
+        for row in reader:
+            if row:
+                yield dict(zip(header, row)), pos, header
+
+def _get(rec: dict, *names, default=None):
+    for n in names:
+        v = rec.get(n)
+        if v not in (None, ""):
+            return v
+    return default
+
+def movie_row(rec: dict) -> Optional[dict]:
+    title = _get(rec, "title")
+    if not title:
+        return None
+    year = _get(rec, "year")
+    m = _TITLE_YEAR.match(title) if year is None else None
+    if m:
+        title, year = m.group(1), m.group(2)
+    genres = _get(rec, "genres")
+    if isinstance(genres, list):
+        genres = "|".join(genres)
+    if genres == "(no genres listed)":
+        genres = None
+    row = {"title": title[:255], "year": int(year) if year else None, "genres": genres,
+           "overview": _get(rec, "overview")}
+    mid = _get(rec, "id", "movie_id", "movieId")
+    if mid is not None:
+        row["id"] = int(mid)
+    return row
+
+def rating_row(rec: dict) -> Optional[dict]:
+    uid, mid, score = _get(rec, "user_id", "userId"), _get(rec, "movie_id", "movieId"), _get(rec, "score", "rating")
+    if uid is None or mid is None or score is None:
+        return None
+    ts = _get(rec, "timestamp", "created_at")
+    when = None
+    if ts is not None:
+        when = datetime.utcfromtimestamp(int(float(ts))) if str(ts).replace(".", "", 1).isdigit() \
+            else datetime.fromisoformat(str(ts))
+    # half-star scales (MovieLens 0.5-5.0) are rounded onto the app's 1..5
+    return {"user_id": int(uid), "movie_id": int(mid), "score": min(5, max(1, int(float(score) + 0.5))),
+            "created_at": when, "updated_at": when}
+
+def _upsert(conn: Connection, table, rows: List[dict], keys: List[str], update: List[str]) -> None:
+    dialect = conn.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        # insert-only rows skip conflicts on any unique constraint (users.email as well as the key)
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_={c: stmt.excluded[c] for c in update}) \
+            if update else stmt.on_conflict_do_nothing()
+        conn.execute(stmt, rows)
+        return
+    cond = " AND ".join(f"{k} = :{k}" for k in keys)
+    if not update:  # generic fallback: insert the missing keys only
+        existing = {tuple(r) for r in conn.execute(select(*(table.c[k] for k in keys)).where(
+            table.c[keys[0]].in_([r[keys[0]] for r in rows])))}
+        rows = [r for r in rows if tuple(r[k] for k in keys) not in existing]
+        if rows:
+            conn.execute(insert(table), rows)
+        return
+    # generic fallback: replace existing keys
+    conn.execute(text(f"DELETE FROM {table.name} WHERE {cond}"), [{k: r[k] for k in keys} for r in rows])
+    conn.execute(insert(table), rows)
+
+def _write_movies(conn: Connection, rows: List[dict]) -> int:
+    with_id = list({r["id"]: r for r in rows if "id" in r}.values())  # last row per id wins
+    if with_id:
+        _upsert(conn, Movie.__table__, with_id, ["id"], ["title", "year", "genres", "overview"])
+    # no ids (e.g. data/movies_sample.csv): (title, year) identifies a movie, known ones are skipped
+    without = list({(r["title"], r["year"]): r for r in rows if "id" not in r}.values())
+    if without:
+        titles = list({r["title"] for r in without})
+        known = set(conn.execute(select(Movie.title, Movie.year).where(Movie.title.in_(titles))).all())
+        without = [r for r in without if (r["title"], r["year"]) not in known]
+    if without:
+        conn.execute(insert(Movie.__table__), without)
+    return len(with_id) + len(without)
+
+def _write_ratings(conn: Connection, rows: List[dict]) -> int:
+    dedup = list({(r["user_id"], r["movie_id"]): r for r in rows}.values())  # last rating per pair wins
+    for r in dedup:
+        if r["created_at"] is None:
+            r["created_at"] = r["updated_at"] = datetime.utcnow()
+    users = sorted({r["user_id"] for r in dedup})
+    _upsert(conn, User.__table__, [{"id": u, "email": f"user{u}@import.invalid", "password_hash": PLACEHOLDER_PASSWORD}
+                                   for u in users], ["id"], [])
+    _upsert(conn, Rating.__table__, dedup, ["user_id", "movie_id"], ["score", "updated_at"])
+    return len(dedup)
+
+# tables a kind writes explicit ids into; Postgres SERIAL sequences don't see those
+EXPLICIT_IDS = {"movies": [Movie.__table__], "ratings": [User.__table__]}
+
+def _sync_sequences(conn: Connection, kind: str) -> None:
+    """Move Postgres id sequences past the loaded ids, so signups / id-less inserts don't collide."""
+    if conn.dialect.name != "postgresql":
+        return
+    for table in EXPLICIT_IDS[kind]:
+        conn.execute(text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                          f"COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {table.name}"))
+    conn.commit()
+
+WRITERS: Dict[str, Tuple[Callable[[dict], Optional[dict]], Callable[[Connection, List[dict]], int]]] = {
+    "movies": (movie_row, _write_movies),
+    "ratings": (rating_row, _write_ratings),
+}
+
+def _load_checkpoint(path: str, source: str, kind: str) -> Tuple[int, Optional[List[str]], int]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            cp = json.load(f)
+    except (OSError, ValueError):
+        return 0, None, 0
+    st = os.stat(source)
+    if (cp.get("source"), cp.get("kind"), cp.get("size"), cp.get("mtime")) != (os.path.abspath(source), kind, st.st_size, st.st_mtime):
+        logger.info(f"[INGEST] ignoring checkpoint {path}: it belongs to another file or the file changed")
+        return 0, None, 0
+    return cp["offset"], cp.get("header"), cp.get("rows", 0)
+
+def _save_checkpoint(path: str, source: str, kind: str, offset: int, header, rows: int) -> None:
+    st = os.stat(source)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"source": os.path.abspath(source), "kind": kind, "size": st.st_size, "mtime": st.st_mtime,
+                   "offset": offset, "header": header, "rows": rows}, f)
+    os.replace(tmp, path)
+
+def _bulk_pragmas(conn: Connection) -> None:
+    if conn.dialect.name == "sqlite":
+        # this connection only: skip fsyncs while loading (the checkpoint covers a crash)
+        conn.execute(text("PRAGMA journal_mode=WAL"))
+        conn.execute(text("PRAGMA synchronous=OFF"))
+        conn.execute(text("PRAGMA temp_store=MEMORY"))
+        conn.execute(text("PRAGMA cache_size=-200000"))
+        conn.commit()
+
+def ingest_file(engine: Engine, kind: str, path: str, chunk_size: int = 50_000,
+                checkpoint: Optional[str] = None, resume: bool = True) -> dict:
+    """Stream `path` into the `kind` ("movies" | "ratings") table; returns counts and timing."""
+    parse, write = WRITERS[kind]
+    checkpoint = checkpoint or path + ".ingest.json"
+    offset, header, done = _load_checkpoint(checkpoint, path, kind) if resume else (0, None, 0)
+    if offset:
+        logger.info(f"[INGEST] resuming {path} at byte {offset} ({done} rows already loaded)")
+    read = skipped = 0
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        _bulk_pragmas(conn)
+        batch: List[dict] = []
+        pos = offset
+        for rec, pos, header in read_records(path, offset, header):
+            read += 1
+            row = parse(rec)
+            if row is None:
+                skipped += 1
+                continue
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                done += write(conn, batch)
+                conn.commit()
+                _save_checkpoint(checkpoint, path, kind, pos, header, done)
+                batch = []
+                dt = time.perf_counter() - t0
+                logger.info(f"[INGEST] {kind}: {done} rows written, {read / dt:,.0f} rows/s")
+        if batch:
+            done += write(conn, batch)
+            conn.commit()
+        _sync_sequences(conn, kind)
+        if conn.dialect.name == "sqlite":
+            # back to the pooled connection's settings (see app.database)
+            conn.execute(text(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}"))
+            conn.execute(text(f"PRAGMA cache_size={-settings.SQLITE_CACHE_SIZE_KB}"))
+    dt = time.perf_counter() - t0
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)  # finished: the next run starts from the top
+    logger.info(f"[INGEST] {kind}: {read} records read, {skipped} skipped, {done} rows written in {dt:.1f}s "
+                f"({read / dt if dt else 0:,.0f} rows/s)")
+    return {"kind": kind, "read": read, "skipped": skipped, "written": done, "seconds": round(dt, 2)}
+
+def rebuild_after_ingest(db: Session, movies: bool = False, ratings: bool = False) -> None:
+    """Derived data is rebuilt once per run instead of being maintained per row."""
+    from app.catalog import invalidate_catalog
+    from app.content_model import rebuild_content_model
+    from app.genres import migrate_genres
+    from app.movie_stats import rebuild_movie_stats
+    if movies:
+        invalidate_catalog()  # titles of existing ids may have changed
+        migrate_genres(db)
+        rebuild_content_model(db)
+    if movies or ratings:
+        rebuild_movie_stats(db)
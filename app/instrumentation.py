@@ -0,0 +1,166 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# In-process metrics: latency histograms (Prometheus buckets + a window of
+# recent samples for p50/p95/p99), call and error counts.
+#   app_function_duration_seconds{name}          @timed functions
+#   app_recommender_phase_duration_seconds{...}  phase() blocks inside them
+#   app_http_request_duration_seconds{...}       every route (middleware)
+#   app_http_request_sql_statements{...}         SQL statements per request
+# Rendered as JSON (/api/metrics/latency) and Prometheus text
+# (/api/metrics/prometheus).
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+QUANTILES = (0.5, 0.95, 0.99)
+
+class Series:
+    def __init__(self, buckets: Sequence[float], window: int):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float, error: bool = False) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        self.errors += int(error)
+        self.recent.append(value)
+
+    def quantiles(self) -> Dict[str, Optional[float]]:
+        if not self.recent:
+            return {f"p{int(q * 100)}": None for q in QUANTILES}
+        vals = np.quantile(np.fromiter(self.recent, dtype=float), QUANTILES)
+        return {f"p{int(q * 100)}": float(v) for q, v in zip(QUANTILES, vals)}
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...],
+                 buckets: Sequence[float] = LATENCY_BUCKETS, window: int = 2048):
+        self.name, self.help, self.labels = name, help, labels
+        self.buckets, self.window = buckets, window
+        self.series: Dict[Tuple[str, ...], Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str, error: bool = False) -> None:
+        with self._lock:
+            s = self.series.get(label_values)
+            if s is None:
+                s = self.series[label_values] = Series(self.buckets, self.window)
+            s.observe(value, error)
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            items = list(self.series.items())
+        out = []
+        for values, s in sorted(items):
+            row = dict(zip(self.labels, values))
+            row.update(count=s.count, errors=s.errors, mean=s.total / s.count if s.count else 0.0)
+            row.update(s.quantiles())
+            out.append(row)
+        return out
+
+    def prometheus(self) -> List[str]:
+        def fmt(values, extra=""):
+            pairs = [f"{k}={_quote(v)}" for k, v in zip(self.labels, values)]
+            if extra:
+                pairs.append(extra)
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        with self._lock:
+            items = sorted(self.series.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, s in items:
+            acc = 0
+            for le, c in zip(list(self.buckets) + ["+Inf"], s.counts):
+                acc += c
+                lines.append(f"{self.name}_bucket{fmt(values, 'le=' + _quote(le))} {acc}")
+            lines.append(f"{self.name}_sum{fmt(values)} {s.total}")
+            lines.append(f"{self.name}_count{fmt(values)} {s.count}")
+        lines += [f"# HELP {self.name}_errors_total Calls that raised.", f"# TYPE {self.name}_errors_total counter"]
+        lines += [f"{self.name}_errors_total{fmt(values)} {s.errors}" for values, s in items]
+        lines += [f"# HELP {self.name}_recent Quantiles over the last {self.window} observations.",
+                  f"# TYPE {self.name}_recent gauge"]
+        for values, s in items:
+            for q, v in zip(QUANTILES, s.quantiles().values()):
+                if v is not None:
+                    lines.append(f"{self.name}_recent{fmt(values, 'quantile=' + _quote(q))} {v}")
+        return lines
+
+def _quote(v) -> str:
+    return '"' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+function_latency = Histogram("app_function_duration_seconds", "Latency of instrumented functions.", ("name",))
+phase_latency = Histogram("app_recommender_phase_duration_seconds", "Recommender time by phase.",
+                          ("recommender", "phase"))
+http_latency = Histogram("app_http_request_duration_seconds", "HTTP request latency by route.",
+                         ("method", "route", "status"))
+http_sql = Histogram("app_http_request_sql_statements", "SQL statements executed per request.",
+                     ("method", "route"), buckets=COUNT_BUCKETS)
+HISTOGRAMS = (function_latency, phase_latency, http_latency, http_sql)
+
+sql_statements_total = 0
+_current_fn: contextvars.ContextVar[str] = contextvars.ContextVar("current_fn", default="")
+# mutable per-request cell; copied contexts (threadpool, scoring pool) share the same list
+_request_sql: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_sql", default=None)
+
+@contextmanager
+def track_function(name: str):
+    token = _current_fn.set(name)
+    t0 = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        function_latency.observe(time.perf_counter() - t0, name, error=error)
+        _current_fn.reset(token)
+
+@contextmanager
+def phase(name: str):
+    """Time one phase of the enclosing @timed function (e.g. "db_load", "similarity")."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        phase_latency.observe(time.perf_counter() - t0, _current_fn.get() or "-", name)
+
+def start_request() -> contextvars.Token:
+    return _request_sql.set([0])
+
+def end_request(token: contextvars.Token) -> int:
+    cell = _request_sql.get()
+    _request_sql.reset(token)
+    return cell[0] if cell else 0
+
+def count_sql_statement(*_args, **_kwargs) -> None:
+    # SQLAlchemy before_cursor_execute listener
+    global sql_statements_total
+    sql_statements_total += 1
+    cell = _request_sql.get()
+    if cell is not None:
+        cell[0] += 1
+
+def snapshot() -> dict:
+    out = {h.name: h.snapshot() for h in HISTOGRAMS}
+    out["app_sql_statements_total"] = sql_statements_total
+    return out
+
+def render_prometheus() -> str:
+    lines = []
+    for h in HISTOGRAMS:
+        lines += h.prometheus()
+    lines += ["# HELP app_sql_statements_total SQL statements executed.",
+              "# TYPE app_sql_statements_total counter", f"app_sql_statements_total {sql_statements_total}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,260 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+from app import model_registry
+from app.config import settings
+from app.utils import logger, timed
+
+# Item-item collaborative filtering (adjusted cosine: ratings centered per
+# user). For every movie the ITEM_CF_NEIGHBORS most similar movies are
+# precomputed offline (scripts/build_item_cf.py) in blocks of rows across a
+# process pool and stored as .npy files (int32 movie ids, float16
+# similarities) in versioned ITEM_CF_DIR snapshots (see app.model_registry)
+# that serving processes memory-map.
+# Rated movies are queued by the ratings routes; every
+# ITEM_CF_REFRESH_SECONDS up to ITEM_CF_REFRESH_MAX_MOVIES of them (the
+# rest wait for the next round) have their lists recomputed against the live
+# ratings matrix and kept as in-memory overrides (also offered to the
+# lists of their neighbours) until the next full build.
+# A user's recommendations add up the neighbour lists of their rated
+# movies, weighted by score - 3 (dislikes push their neighbours down).
+
+_ARRAYS = ("item_ids", "neighbors", "sims")
+
+def item_vectors(M) -> sparse.csr_matrix:
+    """Unit-length rows of user-centered ratings, one per movie column of the RatingsMatrix."""
+    X = M.Rc_T.astype(np.float32)
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    return sparse.diags(1.0 / np.maximum(norms, 1e-9)).astype(np.float32) @ X
+
+def _topk_rows(X: sparse.csr_matrix, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Columns and similarities of the k most similar (positive) rows of X for each of `rows`."""
+    S = (X[rows] @ X.T).toarray()
+    S[np.arange(len(rows)), rows] = 0.0  # not its own neighbour
+    kk = min(k, S.shape[1])
+    part = np.argpartition(-S, kk - 1, axis=1)[:, :kk]
+    sims = np.take_along_axis(S, part, axis=1)
+    order = np.argsort(-sims, axis=1, kind="stable")
+    part, sims = np.take_along_axis(part, order, axis=1), np.take_along_axis(sims, order, axis=1)
+    cols = np.full((len(rows), k), -1, dtype=np.int64)
+    out = np.zeros((len(rows), k), dtype=np.float32)
+    keep = sims > 0
+    cols[:, :kk][keep], out[:, :kk][keep] = part[keep], sims[keep]
+    return cols, out
+
+_worker_X: Optional[sparse.csr_matrix] = None
+
+def _init_worker(X: sparse.csr_matrix) -> None:
+    global _worker_X
+    _worker_X = X
+
+def _block(args) -> Tuple[int, np.ndarray, np.ndarray]:
+    start, end, k = args
+    cols, sims = _topk_rows(_worker_X, np.arange(start, end), k)
+    return start, cols, sims
+
+@timed("item_cf_build")
+def build_neighbors(M, k: int = 50, workers: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(movie ids, neighbour movie ids (n, k), similarities (n, k)) for every movie of the RatingsMatrix M."""
+    X = item_vectors(M)
+    n = X.shape[0]
+    item_ids = np.asarray(M.movies, dtype=np.int32)
+    neighbors = np.zeros((n, k), dtype=np.int32)  # 0 = no neighbour (movie ids start at 1)
+    sims = np.zeros((n, k), dtype=np.float16)
+    block = max(1, settings.BATCH_MAX_CELLS // max(n, 1))  # dense (block x n) similarities per task
+    tasks = [(s, min(s + block, n), k) for s in range(0, n, block)]
+
+    def store(start, cols, s):
+        end = start + len(cols)
+        neighbors[start:end] = np.where(cols >= 0, item_ids[np.maximum(cols, 0)], 0)
+        sims[start:end] = s
+
+    if workers <= 1 or len(tasks) == 1:
+        _init_worker(X)
+        for t in tasks:
+            store(*_block(t))
+    else:
+        # spawn: the caller may be running threads (see app.executor.run_build)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(X,)) as pool:
+            for done, result in enumerate(pool.map(_block, tasks), 1):
+                store(*result)
+                if done % 10 == 0:
+                    logger.info(f"[ITEMCF] {done}/{len(tasks)} blocks")
+    return item_ids, neighbors, sims
+
+class ItemNeighbors:
+    def __init__(self, item_ids: np.ndarray, neighbors: np.ndarray, sims: np.ndarray, version: int = 1):
+        self.item_ids, self.neighbors, self.sims = item_ids, neighbors, sims
+        self.version = version
+        self.k = neighbors.shape[1] if neighbors.ndim == 2 else 0
+        self.row_of = np.full(int(item_ids.max()) + 1 if len(item_ids) else 1, -1, dtype=np.int64)
+        self.row_of[np.asarray(item_ids)] = np.arange(len(item_ids))
+        # movie id -> (neighbour ids, similarities) recomputed since the snapshot was built
+        self.overrides: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self.updates = 0  # incremental refreshes applied (part of result-cache keys)
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        for name in _ARRAYS:
+            # new file + rename, so processes that have the old one memory-mapped keep a valid view
+            tmp = os.path.join(path, f"{name}.npy.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(getattr(self, name)))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "k": self.k, "items": len(self.item_ids)}, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))  # written last: marks the snapshot complete
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "ItemNeighbors":
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        arr = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+               for name in _ARRAYS}
+        return cls(arr["item_ids"], arr["neighbors"], arr["sims"], version=meta["version"])
+
+    def row(self, movie_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Neighbour ids and similarities of a movie, best first (empty if unknown)."""
+        hit = self.overrides.get(movie_id)
+        if hit is not None:
+            return hit
+        r = self.row_of[movie_id] if 0 <= movie_id < len(self.row_of) else -1
+        if r < 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        ids, sims = self.neighbors[r], self.sims[r]
+        keep = ids > 0
+        return np.asarray(ids[keep]), np.asarray(sims[keep], dtype=np.float32)
+
+    def similar(self, movie_id: int, top_n: int) -> List[Tuple[int, float]]:
+        ids, sims = self.row(movie_id)
+        return [(int(i), float(s)) for i, s in zip(ids[:top_n], sims[:top_n])]
+
+    def scores(self, ratings: Dict[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """(candidate movie ids, scores): neighbour lists of the rated movies weighted by score - 3."""
+        ids, vals = [], []
+        for mid, score in ratings.items():
+            w = score - 3.0
+            if w == 0:
+                continue
+            n_ids, n_sims = self.row(mid)
+            ids.append(n_ids)
+            vals.append(n_sims * w)
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        ids, vals = np.concatenate(ids).astype(np.int64), np.concatenate(vals).astype(np.float64)
+        cand, inv = np.unique(ids, return_inverse=True)
+        return cand, np.bincount(inv, weights=vals, minlength=len(cand))
+
+    def refresh(self, M, movie_ids: Iterable[int]) -> int:
+        """Recompute the lists of `movie_ids` against the ratings matrix M; returns lists updated."""
+        cols = np.array(sorted({M.m_index[m] for m in movie_ids if m in M.m_index}), dtype=np.int64)
+        if not len(cols) or not self.k:
+            return 0
+        X = item_vectors(M)
+        movies = np.asarray(M.movies)
+        block = max(1, settings.BATCH_MAX_CELLS // max(X.shape[0], 1))  # dense (block x n) similarities at a time
+        parts = [_topk_rows(X, cols[s:s + block], self.k) for s in range(0, len(cols), block)]
+        nb_cols, nb_sims = np.concatenate([p[0] for p in parts]), np.concatenate([p[1] for p in parts])
+        touched = set()
+        for col, row_cols, row_sims in zip(cols, nb_cols, nb_sims):
+            mid = int(movies[col])
+            old_ids, _ = self.row(mid)
+            keep = row_cols >= 0
+            new_ids = movies[row_cols[keep]].astype(np.int32)
+            self.overrides[mid] = (new_ids, row_sims[keep])
+            touched.add(mid)
+            # similarity is symmetric: fix this movie's entry in the lists of its old and new neighbours
+            others = np.union1d(old_ids, new_ids)
+            others = others[np.isin(others, movies)]
+            if not len(others):
+                continue
+            o_cols = np.array([M.m_index[int(o)] for o in others])
+            s = np.asarray((X[o_cols] @ X[col].T).todense()).ravel()
+            for other, sim in zip(others.tolist(), s.tolist()):
+                if other not in touched:
+                    self._offer(other, mid, sim)
+        self.updates += 1
+        return len(touched)
+
+    def _offer(self, movie_id: int, neighbor: int, sim: float) -> None:
+        ids, sims = self.row(movie_id)
+        ids, sims = ids.copy(), sims.astype(np.float32)
+        pos = np.flatnonzero(ids == neighbor)
+        if len(pos):
+            ids, sims = np.delete(ids, pos), np.delete(sims, pos)
+        if sim > 0 and (len(ids) < self.k or sim > sims[-1]):
+            at = int(np.searchsorted(-sims, -sim))
+            ids, sims = np.insert(ids, at, neighbor)[:self.k], np.insert(sims, at, sim)[:self.k]
+        self.overrides[movie_id] = (ids, sims)
+
+def build_snapshot(db: Session, workers: int = settings.ITEM_CF_WORKERS,
+                   k: int = settings.ITEM_CF_NEIGHBORS) -> Optional[int]:
+    """Recompute all neighbour lists and publish the next ITEM_CF_DIR snapshot; returns its version."""
+    from app.cf_engine import RatingsMatrix
+    started = time.time()
+    mark = model_registry.rating_mark(db)
+    M = RatingsMatrix.from_db(db)
+    if not len(M):
+        return None
+    model = ItemNeighbors(*build_neighbors(M, k=k, workers=workers),
+                          version=model_registry.next_version(settings.ITEM_CF_DIR))
+    model_registry.publish(settings.ITEM_CF_DIR, model.version, model.save, started, rating_mark=mark,
+                           items=len(M.movies), pairs=int((model.neighbors > 0).sum()))
+    return model.version
+
+_model: Optional[ItemNeighbors] = None
+_path: Optional[str] = None
+_lock = threading.Lock()
+_dirty: Set[int] = set()
+_refreshed_at = 0.0
+
+def touch(movie_id: int) -> None:
+    """A rating of `movie_id` changed: recompute its neighbour list on the next refresh."""
+    _dirty.add(movie_id)
+
+def load_current(wait: bool = True) -> Optional[ItemNeighbors]:
+    """Swap in the current ITEM_CF_DIR snapshot if it isn't the one served (`wait`: for the lock)."""
+    global _model, _path
+    path = model_registry.current_path(settings.ITEM_CF_DIR)
+    if path is None or path == _path or not _lock.acquire(blocking=wait):
+        return _model
+    try:
+        if path != _path:
+            # lists refreshed since were computed from ratings the new build has seen
+            _model, _path = ItemNeighbors.load(path), path
+            model_registry.loaded("item", _model.version)
+            logger.info(f"[ITEMCF] loaded v{_model.version}: {len(_model.item_ids)} movies x {_model.k} neighbours")
+    finally:
+        _lock.release()
+    return _model
+
+def get_item_cf(store=None) -> Optional[ItemNeighbors]:
+    """Memory-mapped neighbour lists of the current snapshot (swapped like app.mf.get_mf_model),
+    with queued movies refreshed against `store` (the ratings store) every ITEM_CF_REFRESH_SECONDS."""
+    global _refreshed_at
+    model = _model
+    if model is None or not model_registry.watching():
+        model = load_current(wait=model is None)
+    if model is None:
+        return None
+    if store is not None and _dirty and time.time() - _refreshed_at > settings.ITEM_CF_REFRESH_SECONDS \
+            and _lock.acquire(blocking=False):  # never wait: serve the current lists meanwhile
+        try:
+            batch = set(list(_dirty)[:settings.ITEM_CF_REFRESH_MAX_MOVIES])  # bounded work per request
+            _dirty.difference_update(batch)
+            n = model.refresh(store.matrix(), batch)
+            _refreshed_at = time.time()
+            logger.info(f"[ITEMCF] refreshed {n} neighbour lists ({len(model.overrides)} overridden)")
+        finally:
+            _lock.release()
+    return model
@@ -0,0 +1,36 @@
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.batch import precomputed_rows
+from app.models import Movie, MovieStats, PrecomputedRecommendation, Rating, User
+
+# Async counterparts of the per-request reads, for the routers in
+# app.routers.aio. Each is one awaited statement; scoring itself stays in
+# the scoring pool (app.executor) on a sync session.
+
+async def load_user(db: AsyncSession, email: str) -> Optional[User]:
+    return (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
+
+async def load_rating(db: AsyncSession, user_id: int, movie_id: int) -> Optional[Rating]:
+    return (await db.execute(
+        select(Rating).where(Rating.user_id == user_id, Rating.movie_id == movie_id))).scalar_one_or_none()
+
+async def load_user_ratings(db: AsyncSession, user_id: int) -> List[Tuple[Rating, str]]:
+    rows = await db.execute(
+        select(Rating, Movie.title).join(Movie, Movie.id == Rating.movie_id)
+        .where(Rating.user_id == user_id).order_by(Rating.updated_at.desc()))
+    return [(r, title) for r, title in rows]
+
+async def load_precomputed(db: AsyncSession, user_id: int, method: str, top_n: int,
+                           k: Optional[int] = None) -> Optional[List[Tuple[int, str, float]]]:
+    row = (await db.execute(select(PrecomputedRecommendation).where(
+        PrecomputedRecommendation.user_id == user_id, PrecomputedRecommendation.method == method)
+    )).scalars().first()
+    return precomputed_rows(row, top_n, k)
+
+async def load_overview(db: AsyncSession) -> Dict[str, int]:
+    users = (await db.execute(select(func.count(User.id)))).scalar() or 0
+    movies = (await db.execute(select(func.count(Movie.id)))).scalar() or 0
+    ratings, covered = (await db.execute(
+        select(func.sum(MovieStats.rating_count), func.count(MovieStats.movie_id)))).one()
+    return {"users": users, "movies": movies, "ratings": ratings or 0, "covered": covered or 0}
@@ -1,24 +1,110 @@
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
-from app.database import Base, engine, get_db
-from app.routers import auth as auth_router
-from app.routers import movies as movies_router
-from app.routers import ratings as ratings_router
-from app.routers import recommendations as rec_router
-from app.routers import metrics as metrics_router
+from starlette.concurrency import run_in_threadpool
+from app.database import SessionLocal, async_engines, dispose_async_engines, get_db, init_db
+from app.search import ensure_search_index
+from app import executor, instrumentation, model_registry
+from app.config import settings
+from app.warmup import warmup
+if settings.ASYNC_DB:
+    from app.routers.aio import auth as auth_router
+    from app.routers.aio import movies as movies_router
+    from app.routers.aio import ratings as ratings_router
+    from app.routers.aio import recommendations as rec_router
+    from app.routers.aio import metrics as metrics_router
+else:
+    from app.routers import auth as auth_router
+    from app.routers import movies as movies_router
+    from app.routers import ratings as ratings_router
+    from app.routers import recommendations as rec_router
+    from app.routers import metrics as metrics_router
 
-Base.metadata.create_all(bind=engine)
+def _ensure_movie_stats() -> None:
+    from app.movie_stats import ensure_movie_stats
+    with SessionLocal() as db:
+        ensure_movie_stats(db)
 
-app = FastAPI(title="Movie Recommendation Web App", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_CREATE_SCHEMA:
+        # the schema step (run scripts/init_db.py instead when disabled), not an import side effect
+        await run_in_threadpool(init_db)
+    # movie_stats backs the overview, listings and popularity: filled before the first request
+    # whatever STARTUP_WARMUP says (a no-op unless the database predates the table)
+    await run_in_threadpool(_ensure_movie_stats)
+    if settings.ASYNC_DB:
+        # the search index is tracked per engine; create/check it before requests race for it
+        async with async_engines()[2]() as adb:
+            await adb.run_sync(ensure_search_index)
+    if settings.STARTUP_WARMUP == "blocking":
+        await run_in_threadpool(warmup.start, "blocking", SessionLocal)
+    else:
+        warmup.start(settings.STARTUP_WARMUP, SessionLocal)
+    if settings.MODEL_WORKER:
+        # rebuilds due snapshots and swaps new ones in (app.model_registry)
+        model_registry.worker.start(SessionLocal, can_build=lambda: warmup.ready)
+    try:
+        yield
+    finally:
+        model_registry.worker.stop()
+        executor.shutdown()
+        await dispose_async_engines()
+
+app = FastAPI(title="Movie Recommendation Web App", version="1.0.0", lifespan=lifespan)
 app.include_router(auth_router.router)
 app.include_router(movies_router.router)
 app.include_router(ratings_router.router)
 app.include_router(rec_router.router)
 app.include_router(metrics_router.router)
 
+# every engine (including test/replica engines) counts its statements
+event.listen(Engine, "before_cursor_execute", instrumentation.count_sql_statement)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    token = instrumentation.start_request()
+    t0 = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        dt = time.perf_counter() - t0
+        statements = instrumentation.end_request(token)
+        route = request.scope.get("route")
+        # label by route template (/api/movies/{movie_id}), not the raw path
+        path = getattr(route, "path", None) or "unmatched"
+        instrumentation.http_latency.observe(dt, request.method, path, str(status_code), error=status_code >= 500)
+        instrumentation.http_sql.observe(statements, request.method, path)
+
+# -------- Probes --------
+
+@app.get("/healthz", tags=["health"])
+def healthz():
+    # liveness: the process serves requests (no database or model access)
+    return {"status": "ok"}
+
+@app.get("/readyz", tags=["health"])
+def readyz(db: Session = Depends(get_db)):
+    # readiness: warm-up finished (or skipped) and the database answers
+    body = {"warmup": warmup.status()}
+    try:
+        db.execute(text("SELECT 1"))
+        body["database"] = "ok"
+    except Exception as e:
+        body["database"] = repr(e)
+    ready = warmup.ready and body["database"] == "ok"
+    body["status"] = "ready" if ready else "starting"
+    return JSONResponse(body, status_code=200 if ready else 503)
+
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 
@@ -0,0 +1,221 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+from app import model_registry
+from app.config import settings
+from app.executor import run_build
+from app.utils import logger, timed
+
+# Matrix factorization trained offline with alternating least squares.
+# Explicit mode fits centered ratings (weighted-lambda regularisation);
+# implicit mode treats every rating as a positive interaction with
+# confidence 1 + alpha * score (Hu, Koren & Volinsky 2008).
+# Factors are stored as .npy files in versioned MF_MODEL_DIR snapshots (see
+# app.model_registry) so serving processes can memory-map them.
+
+def _solve_rows(R: sparse.csr_matrix, Y: np.ndarray, reg: float, implicit: bool, alpha: float,
+                mean: float, block_rows: int = 4096, YtY: Optional[np.ndarray] = None) -> np.ndarray:
+    """One ALS half-step: solve every row of R against the fixed factors Y (batched LAPACK solves).
+    `YtY`: Y.T @ Y if the caller already has it (implicit mode)."""
+    n, f = R.shape[0], Y.shape[1]
+    X = np.zeros((n, f))
+    eye = np.eye(f)
+    if implicit and YtY is None:
+        YtY = Y.T @ Y
+    counts = np.diff(R.indptr)
+    if implicit:
+        w_gram, w_rhs = alpha * R.data, 1.0 + alpha * R.data  # (C - I) and C p
+    else:
+        w_gram, w_rhs = np.ones_like(R.data), R.data - mean
+    for start in range(0, n, block_rows):
+        end = min(start + block_rows, n)
+        A = np.zeros((end - start, f, f))
+        b = np.zeros((end - start, f))
+        for i in np.flatnonzero(counts[start:end]):
+            lo, hi = R.indptr[start + i], R.indptr[start + i + 1]
+            Yu = Y[R.indices[lo:hi]]
+            # one (f x cnt) @ (cnt x f) BLAS product per row; stacking the (cnt, f, f) outer
+            # products and summing them moved cnt * f * f floats through memory
+            A[i] = Yu.T @ (w_gram[lo:hi, None] * Yu)
+            b[i] = w_rhs[lo:hi] @ Yu
+        lam = reg * (np.ones(end - start) if implicit else np.maximum(counts[start:end], 1))
+        A += lam[:, None, None] * eye
+        if implicit:
+            A += YtY
+        X[start:end] = np.linalg.solve(A, b[:, :, None])[:, :, 0]
+    return X
+
+@timed("mf_als_train")
+def train_als(R: sparse.csr_matrix, factors: int = 64, reg: float = 0.1, iterations: int = 15,
+              implicit: bool = False, alpha: float = 40.0, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, float]:
+    """Returns (user factors, item factors, global mean) for the users x items matrix R."""
+    R = R.tocsr().astype(np.float64)
+    Rt = R.T.tocsr()
+    mean = 0.0 if implicit or R.nnz == 0 else float(R.data.mean())
+    rng = np.random.default_rng(seed)
+    V = rng.normal(scale=0.01, size=(R.shape[1], factors))
+    U = np.zeros((R.shape[0], factors))
+    for it in range(iterations):
+        U = _solve_rows(R, V, reg, implicit, alpha, mean)
+        V = _solve_rows(Rt, U, reg, implicit, alpha, mean)
+        if not implicit:
+            pred = np.einsum("ij,ij->i", U[np.repeat(np.arange(R.shape[0]), np.diff(R.indptr))], V[R.indices]) + mean
+            logger.info(f"[MF] iteration {it + 1}: train rmse {np.sqrt(np.mean((pred - R.data) ** 2)):.4f}")
+    return U, V, mean
+
+_M1, _M2 = np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB)
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finaliser (uint64 arithmetic wraps)
+    x = (x ^ (x >> np.uint64(30))) * _M1
+    x = (x ^ (x >> np.uint64(27))) * _M2
+    return x ^ (x >> np.uint64(31))
+
+def _pair_hashes(movie_ids: np.ndarray, scores: np.ndarray) -> np.ndarray:
+    return _mix(movie_ids.astype(np.uint64) * np.uint64(8) + scores.astype(np.uint64))
+
+def ratings_checksum(ratings: Dict[int, int]) -> int:
+    """Order-independent checksum of one user's (movie_id, score) pairs."""
+    if not ratings:
+        return 0
+    h = _pair_hashes(np.fromiter(ratings.keys(), dtype=np.int64, count=len(ratings)),
+                     np.fromiter(ratings.values(), dtype=np.int64, count=len(ratings)))
+    return int(h.sum(dtype=np.uint64))
+
+def user_checksums(M) -> np.ndarray:
+    """ratings_checksum of every row of a RatingsMatrix."""
+    h = _pair_hashes(M.movies[M.R.indices], np.rint(M.R.data).astype(np.int64))
+    counts = np.diff(M.R.indptr)
+    sums = np.zeros(len(counts), dtype=np.uint64)
+    rows = np.flatnonzero(counts)
+    if len(rows):
+        sums[rows] = np.add.reduceat(h, M.R.indptr[rows], dtype=np.uint64)
+    return sums
+
+class MFModel:
+    def __init__(self, user_ids: np.ndarray, item_ids: np.ndarray, U: np.ndarray, V: np.ndarray,
+                 user_counts: np.ndarray, mean: float = 0.0, reg: float = 0.1, implicit: bool = False,
+                 alpha: float = 40.0, version: int = 1, user_checksums: Optional[np.ndarray] = None):
+        self.user_ids, self.item_ids = user_ids, item_ids
+        self.U, self.V = U, V
+        self.user_counts = user_counts  # ratings per user at training time
+        # checksum of each user's ratings at training time (None: snapshot written before it)
+        self.user_checksums = user_checksums
+        self._YtY: Optional[np.ndarray] = None
+        self.mean, self.reg, self.implicit, self.alpha = mean, reg, implicit, alpha
+        self.version = version
+        self.u_index: Dict[int, int] = {int(u): i for i, u in enumerate(user_ids)}
+        self.i_index: Dict[int, int] = {int(m): i for i, m in enumerate(item_ids)}
+
+    def save(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        names = ("user_ids", "item_ids", "U", "V", "user_counts") + \
+            (("user_checksums",) if self.user_checksums is not None else ())
+        for name in names:
+            # new file + rename, so processes that have the old one memory-mapped keep a valid view
+            tmp = os.path.join(path, f"{name}.npy.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(getattr(self, name)))
+            os.replace(tmp, os.path.join(path, f"{name}.npy"))
+        meta = {"version": self.version, "mean": self.mean, "reg": self.reg,
+                "implicit": self.implicit, "alpha": self.alpha, "factors": int(self.U.shape[1])}
+        tmp = os.path.join(path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(path, "meta.json"))  # written last: marks the snapshot complete
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "MFModel":
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        names = [n for n in ("user_ids", "item_ids", "U", "V", "user_counts", "user_checksums")
+                 if os.path.exists(os.path.join(path, f"{n}.npy"))]
+        arr = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None) for name in names}
+        return cls(arr["user_ids"], arr["item_ids"], arr["U"], arr["V"], arr["user_counts"],
+                   mean=meta["mean"], reg=meta["reg"], implicit=meta["implicit"],
+                   alpha=meta["alpha"], version=meta["version"], user_checksums=arr.get("user_checksums"))
+
+    @property
+    def YtY(self) -> Optional[np.ndarray]:
+        """V.T @ V, computed once per loaded model (the implicit-mode fold-in needs it on every call)."""
+        if self.implicit and self._YtY is None:
+            V = np.asarray(self.V)
+            self._YtY = V.T @ V
+        return self._YtY
+
+    def fold_in(self, ratings: Dict[int, int]) -> Optional[np.ndarray]:
+        """User factor for `ratings` (movie_id -> score) with item factors fixed: one f x f solve."""
+        items = [(self.i_index[m], s) for m, s in ratings.items() if m in self.i_index]
+        if not items:
+            return None
+        idx, r = np.array([i for i, _ in items]), np.array([s for _, s in items], dtype=np.float64)
+        R = sparse.csr_matrix((r, (np.zeros(len(idx), dtype=np.int64), idx)), shape=(1, len(self.item_ids)))
+        return _solve_rows(R, np.asarray(self.V), self.reg, self.implicit, self.alpha, self.mean, YtY=self.YtY)[0]
+
+    def _trained_on(self, ui: int, ratings: Dict[int, int]) -> bool:
+        if self.user_counts[ui] != len(ratings):
+            return False
+        # same count can still be a re-rated or swapped movie
+        return self.user_checksums is None or int(self.user_checksums[ui]) == ratings_checksum(ratings)
+
+    def user_vector(self, user_id: int, ratings: Dict[int, int]) -> Optional[np.ndarray]:
+        ui = self.u_index.get(user_id)
+        if ui is not None and self._trained_on(ui, ratings):
+            return np.asarray(self.U[ui])
+        # new user or ratings changed since training
+        return self.fold_in(ratings)
+
+    def scores(self, user_vec: np.ndarray) -> np.ndarray:
+        return self.V @ user_vec + self.mean
+
+def train_from_matrix(M, version: int = 1) -> MFModel:
+    U, V, mean = run_build(train_als, M.R, settings.MF_FACTORS, settings.MF_REG, settings.MF_ITERATIONS,
+                           settings.MF_IMPLICIT, settings.MF_ALPHA)
+    return MFModel(M.users, M.movies, U, V, np.diff(M.R.indptr), mean=mean, reg=settings.MF_REG,
+                   implicit=settings.MF_IMPLICIT, alpha=settings.MF_ALPHA, version=version,
+                   user_checksums=user_checksums(M))
+
+def build_snapshot(db: Session) -> Optional[int]:
+    """Train on the current ratings and publish the next MF_MODEL_DIR snapshot; returns its version."""
+    from app.cf_engine import RatingsMatrix
+    started = time.time()
+    mark = model_registry.rating_mark(db)
+    M = RatingsMatrix.from_db(db)
+    if not len(M):
+        return None
+    model = train_from_matrix(M, version=model_registry.next_version(settings.MF_MODEL_DIR))
+    model_registry.publish(settings.MF_MODEL_DIR, model.version, model.save, started, rating_mark=mark,
+                           users=len(M.users), items=len(M.movies))
+    return model.version
+
+_model: Optional[MFModel] = None
+_path: Optional[str] = None
+_lock = threading.Lock()
+
+def load_current(wait: bool = True) -> Optional[MFModel]:
+    """Swap in the current MF_MODEL_DIR snapshot if it isn't the one served (`wait`: for the lock)."""
+    global _model, _path
+    path = model_registry.current_path(settings.MF_MODEL_DIR)
+    if path is None or path == _path or not _lock.acquire(blocking=wait):
+        return _model
+    try:
+        if path != _path:
+            _model, _path = MFModel.load(path), path
+            model_registry.loaded("mf", _model.version)
+            logger.info(f"[MF] loaded model v{_model.version}: {len(_model.user_ids)} users, {len(_model.item_ids)} items")
+    finally:
+        _lock.release()
+    return _model
+
+def get_mf_model() -> Optional[MFModel]:
+    """Memory-mapped model of the current snapshot. Newer snapshots are swapped in by the model
+    worker, or here without waiting (a concurrent load keeps serving the old model) when none runs."""
+    if _model is None or not model_registry.watching():
+        return load_current(wait=_model is None)
+    return _model
@@ -0,0 +1,280 @@
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Rating
+from app.utils import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are only coordinated within the process
+    fcntl = None
+
+# Versioned model snapshots and the worker that rebuilds and swaps them.
+# Each model directory (CONTENT_MODEL_DIR, ITEM_CF_DIR, MF_MODEL_DIR,
+# POPULARITY_DIR) holds one complete directory per build (v000001, ...) and
+# a CURRENT file naming the served one. A build is written to
+# vNNNNNN.partial, renamed, and then CURRENT is replaced (write + rename),
+# so readers only ever see whole snapshots. Older snapshots are pruned down
+# to MODEL_KEEP_SNAPSHOTS; processes still mapping their files keep valid
+# views of them.
+# Serving processes memory-map the current snapshot. In every uvicorn
+# worker a background thread notices a new CURRENT, loads it and replaces
+# the module's model reference: requests already running keep the object
+# they started with. The same thread rebuilds a model every
+# MODEL_REBUILD_SECONDS (popularity: POPULARITY_REFRESH_SECONDS) or after
+# MODEL_REBUILD_AFTER_RATINGS new ratings; a file lock in the model
+# directory lets one process build while the others just pick up the result.
+# A directory written before snapshots existed (meta.json at the top) is
+# served as is until the first build. Each check also links the genres of
+# newly inserted movies (app.genres).
+
+CURRENT = "CURRENT"
+BUILD_INFO = "build.json"
+_VERSION_DIR = re.compile(r"^v(\d{6,})$")
+
+def _versions(root: str) -> List[int]:
+    try:
+        return sorted(int(m.group(1)) for m in map(_VERSION_DIR.match, os.listdir(root)) if m)
+    except OSError:
+        return []
+
+_current: Dict[str, tuple] = {}  # root -> (CURRENT mtime, snapshot path)
+
+def current_path(root: str) -> Optional[str]:
+    """Directory of the served snapshot of `root` (one stat while CURRENT is unchanged)."""
+    pointer = os.path.join(root, CURRENT)
+    try:
+        mtime = os.stat(pointer).st_mtime_ns
+    except OSError:
+        return root if os.path.exists(os.path.join(root, "meta.json")) else None
+    hit = _current.get(root)
+    if hit is not None and hit[0] == mtime:
+        return hit[1]
+    with open(pointer, encoding="utf-8") as f:
+        path = os.path.join(root, f.read().strip())
+    _current[root] = (mtime, path)
+    return path
+
+def snapshot_version(path: Optional[str]) -> int:
+    if path is None:
+        return 0
+    m = _VERSION_DIR.match(os.path.basename(path))
+    if m:
+        return int(m.group(1))
+    try:  # pre-snapshot layout
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            return int(json.load(f).get("version", 0))
+    except (OSError, ValueError):
+        return 0
+
+def next_version(root: str) -> int:
+    return max(_versions(root) + [snapshot_version(current_path(root))]) + 1
+
+def build_info(root: str) -> dict:
+    """build.json of the current snapshot ({} before the first build)."""
+    path = current_path(root)
+    try:
+        with open(os.path.join(path, BUILD_INFO), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, TypeError, ValueError):
+        return {}
+
+def rating_mark(db: Session) -> int:
+    # highest rating id: how many ratings a snapshot has seen (primary key lookup, unlike count(*))
+    return int(db.query(func.max(Rating.id)).scalar() or 0)
+
+def publish(root: str, version: int, save: Callable[[str], None], started: float, **info) -> str:
+    """Write a snapshot with `save(directory)` and make it current; returns its directory."""
+    final = os.path.join(root, f"v{version:06d}")
+    tmp = final + ".partial"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    save(tmp)
+    info = {"version": version, "built_at": time.time(), "build_seconds": round(time.time() - started, 3), **info}
+    with open(os.path.join(tmp, BUILD_INFO), "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    os.replace(tmp, final)
+    pointer = os.path.join(root, CURRENT)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(os.path.basename(final))
+    os.replace(pointer + ".tmp", pointer)
+    _prune(root, version)
+    return final
+
+def _prune(root: str, current: int) -> None:
+    old = [v for v in _versions(root) if v != current]
+    for v in old[:max(len(old) - settings.MODEL_KEEP_SNAPSHOTS + 1, 0)]:
+        shutil.rmtree(os.path.join(root, f"v{v:06d}"), ignore_errors=True)
+
+@contextmanager
+def build_lock(root: str) -> Iterator[bool]:
+    """Exclusive right to build into `root` across processes; yields False if another one holds it."""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".lock"), "a") as f:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+# -------- serving side: which snapshot each kind is served from --------
+
+_loaded: Dict[str, int] = {}
+
+def loaded(kind: str, version: int) -> None:
+    _loaded[kind] = version
+
+class _Kind:
+    def __init__(self, root: Callable[[], str], build: Callable[[Session], Optional[int]],
+                 load: Callable[[Session], object], interval: Callable[[], int], uses_ratings: bool = True):
+        self.root, self.build, self.load = root, build, load
+        self.interval, self.uses_ratings = interval, uses_ratings
+
+def kinds() -> Dict[str, _Kind]:
+    from app import content_model, item_cf, mf, popularity
+    return {
+        "content": _Kind(lambda: settings.CONTENT_MODEL_DIR, content_model.build_snapshot,
+                         content_model.load_current, lambda: settings.MODEL_REBUILD_SECONDS, uses_ratings=False),
+        "popularity": _Kind(lambda: settings.POPULARITY_DIR, popularity.build_snapshot,
+                            lambda db: popularity.load_current(), lambda: settings.POPULARITY_REFRESH_SECONDS),
+        "item": _Kind(lambda: settings.ITEM_CF_DIR, item_cf.build_snapshot,
+                      lambda db: item_cf.load_current(), lambda: settings.MODEL_REBUILD_SECONDS),
+        "mf": _Kind(lambda: settings.MF_MODEL_DIR, mf.build_snapshot,
+                    lambda db: mf.load_current(), lambda: settings.MODEL_REBUILD_SECONDS),
+    }
+
+def _due(kind: _Kind, mark: int) -> bool:
+    info = build_info(kind.root())
+    if not info:
+        return True
+    interval = kind.interval()
+    if interval > 0 and time.time() - info["built_at"] >= interval:
+        return True
+    after = settings.MODEL_REBUILD_AFTER_RATINGS
+    return kind.uses_ratings and after > 0 and mark - info.get("rating_mark", 0) >= after
+
+class ModelWorker:
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._requested: Set[str] = set()
+        self._can_build: Callable[[], bool] = lambda: True
+        self.checked_at = 0.0
+        self.builds = self.failures = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, session_factory: Callable[[], Session], can_build: Callable[[], bool] = lambda: True) -> None:
+        """`can_build`: False holds scheduled builds back (e.g. while the startup warm-up builds missing
+        models itself); new snapshots are still swapped in."""
+        if self.running:
+            return
+        self._stop.clear()
+        self._can_build = can_build
+        self._thread = threading.Thread(target=self._run, args=(session_factory,), name="model-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def request(self, kind: str) -> bool:
+        """Ask for a rebuild of `kind` on the worker; False if no worker runs (caller builds itself)."""
+        if not self.running:
+            return False
+        self._requested.add(kind)
+        self._wake.set()
+        return True
+
+    def _run(self, session_factory: Callable[[], Session]) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(settings.MODEL_WATCH_SECONDS)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            db = session_factory()
+            try:
+                self.check(db, build=self._can_build())
+            except Exception:
+                self.failures += 1
+                logger.exception("[MODELS] check failed")
+            finally:
+                db.close()
+
+    def check(self, db: Session, build: bool = True) -> None:
+        """Rebuild what is due (or requested), then swap in any newer snapshot."""
+        enabled = {k.strip() for k in settings.MODEL_KINDS.split(",") if k.strip()} if build else set()
+        mark = rating_mark(db)
+        if build:
+            self._link_genres(db)
+        requested, self._requested = (self._requested, set()) if build else (set(), self._requested)
+        for name, kind in kinds().items():
+            try:
+                if name in requested or (name in enabled and _due(kind, mark)):
+                    with build_lock(kind.root()) as mine:
+                        # re-check under the lock: another process may just have built it
+                        if mine and (name in requested or _due(kind, mark)):
+                            version = kind.build(db)
+                            if version is not None:
+                                self.builds += 1
+                                logger.info(f"[MODELS] built {name} v{version}")
+                kind.load(db)
+            except Exception:
+                self.failures += 1
+                logger.exception(f"[MODELS] {name} rebuild failed")
+        self.checked_at = time.time()
+
+    def _link_genres(self, db: Session) -> None:
+        # movie_genres for newly inserted movies: written here, not by the requests reading the genre index
+        from app.genres import link_new_movies
+        try:
+            link_new_movies(db)
+        except Exception:
+            db.rollback()
+            self.failures += 1
+            logger.exception("[MODELS] genre linking failed")
+
+worker = ModelWorker()
+
+def watching() -> bool:
+    """True while the worker swaps snapshots in (getters then never load on the request path)."""
+    return worker.running
+
+def status() -> dict:
+    now = time.time()
+    out = {}
+    for name, kind in kinds().items():
+        root = kind.root()
+        info = build_info(root)
+        out[name] = {
+            "version": snapshot_version(current_path(root)) or None,
+            "served_version": _loaded.get(name),
+            "built_at": info.get("built_at"),
+            "age_seconds": round(now - info["built_at"], 1) if info else None,
+            "build_seconds": info.get("build_seconds"),
+            "snapshots": len(_versions(root)),
+        }
+    return {"models": out, "worker": {"running": worker.running, "builds": worker.builds,
+                                      "failures": worker.failures, "checked_at": worker.checked_at or None}}
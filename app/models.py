@@ -1,3 +1,4 @@
+from datetime import datetime
 from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, UniqueConstraint, DateTime, func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -20,6 +21,17 @@ class Movie(Base):
     created_at = Column(DateTime, server_default=func.now())
     ratings = relationship("Rating", back_populates="movie", cascade="all, delete-orphan")
 
+class Genre(Base):
+    __tablename__ = "genres"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(64), unique=True, nullable=False, index=True)
+
+class MovieGenre(Base):
+    # normalized Movie.genres (the pipe-separated column stays for display); see app.genres
+    __tablename__ = "movie_genres"
+    movie_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    genre_id = Column(Integer, ForeignKey("genres.id"), primary_key=True, index=True)
+
 class Rating(Base):
     __tablename__ = "ratings"
     id = Column(Integer, primary_key=True, index=True)
@@ -33,3 +45,24 @@ class Rating(Base):
     movie = relationship("Movie", back_populates="ratings")
 
     __table_args__ = (UniqueConstraint("user_id", "movie_id", name="uniq_user_movie"),)
+
+class MovieStats(Base):
+    # per-movie rating aggregates, kept in sync by the ratings router (see app.movie_stats)
+    __tablename__ = "movie_stats"
+    movie_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    rating_sum = Column(Integer, nullable=False, default=0)
+    rating_count = Column(Integer, nullable=False, default=0, index=True)
+    avg_rating = Column(Float)
+    bayes_score = Column(Float, nullable=False, index=True)
+
+class PrecomputedRecommendation(Base):
+    __tablename__ = "precomputed_recommendations"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    method = Column(String(16), nullable=False)  # content | cf | mf
+    k = Column(Integer)  # neighbours used (cf only)
+    top_n = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON [[movie_id, title, score], ...]
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # UTC, compared in Python
+
+    __table_args__ = (UniqueConstraint("user_id", "method", name="uniq_user_method"),)
@@ -0,0 +1,84 @@
+from typing import List, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import MovieStats, Rating
+from app.popularity import invalidate_popularity
+from app.utils import logger
+
+# movie_stats holds sum/count/avg and a Bayesian-weighted score per rated
+# movie. Rating writes apply their delta in the same transaction; anything
+# that writes ratings in bulk (seed scripts, imports) calls
+# rebuild_movie_stats afterwards. check_movie_stats compares the table with
+# a fresh aggregate over ratings.
+
+def bayes_score(rating_sum, rating_count):
+    w, m = settings.POPULARITY_PRIOR_WEIGHT, settings.POPULARITY_PRIOR_MEAN
+    return (w * m + rating_sum) / (w + rating_count)
+
+def _derived(rating_sum, rating_count) -> dict:
+    return {
+        "avg_rating": case((rating_count > 0, rating_sum * 1.0 / rating_count), else_=None),
+        "bayes_score": bayes_score(rating_sum, rating_count),
+    }
+
+def apply_rating_delta(db: Session, movie_id: int, d_sum: int, d_count: int) -> None:
+    """Add a rating write's effect to movie_stats (in the caller's transaction)."""
+    new_sum, new_count = MovieStats.rating_sum + d_sum, MovieStats.rating_count + d_count
+    # computed from the stored values, so concurrent writers don't lose increments
+    values = {"rating_sum": new_sum, "rating_count": new_count, **_derived(new_sum, new_count)}
+    dialect = db.get_bind().dialect.name
+    if d_count > 0 and dialect in ("sqlite", "postgresql"):
+        # one upsert: two concurrent first ratings of a movie can't both try to insert its row
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(MovieStats).values(movie_id=movie_id, rating_sum=d_sum, rating_count=d_count,
+                                                 avg_rating=d_sum / d_count, bayes_score=bayes_score(d_sum, d_count))
+        db.execute(stmt.on_conflict_do_update(index_elements=["movie_id"], set_=values))
+        return
+    res = db.execute(update(MovieStats).where(MovieStats.movie_id == movie_id).values(**values))
+    if res.rowcount == 0 and d_count > 0:
+        db.execute(insert(MovieStats).values(movie_id=movie_id, rating_sum=d_sum, rating_count=d_count,
+                                             avg_rating=d_sum / d_count, bayes_score=bayes_score(d_sum, d_count)))
+    elif d_count < 0:
+        # unrated movies have no row (popularity ranking lists rated movies only)
+        db.execute(delete(MovieStats).where(MovieStats.movie_id == movie_id, MovieStats.rating_count <= 0))
+
+def _aggregate():
+    s, c = func.sum(Rating.score), func.count(Rating.id)
+    return select(Rating.movie_id, s.label("rating_sum"), c.label("rating_count")).group_by(Rating.movie_id)
+
+def rebuild_movie_stats(db: Session) -> int:
+    agg = _aggregate().subquery()
+    db.query(MovieStats).delete(synchronize_session=False)
+    db.execute(insert(MovieStats).from_select(
+        ["movie_id", "rating_sum", "rating_count", "avg_rating", "bayes_score"],
+        select(agg.c.movie_id, agg.c.rating_sum, agg.c.rating_count,
+               agg.c.rating_sum * 1.0 / agg.c.rating_count, bayes_score(agg.c.rating_sum, agg.c.rating_count)),
+    ))
+    db.commit()
+    invalidate_popularity()
+    n = db.query(func.count(MovieStats.movie_id)).scalar() or 0
+    logger.info(f"[STATS] rebuilt movie_stats for {n} movies")
+    return n
+
+def check_movie_stats(db: Session, tolerance: float = 1e-6) -> List[Tuple[int, tuple, tuple]]:
+    """Movies whose stored (sum, count, bayes) differ from the ratings table: [(movie_id, expected, stored)]."""
+    expected = {mid: (int(s), int(c)) for mid, s, c in db.execute(_aggregate())}
+    stored = {mid: (s, c, b) for mid, s, c, b in db.query(MovieStats.movie_id, MovieStats.rating_sum,
+                                                           MovieStats.rating_count, MovieStats.bayes_score)}
+    bad = []
+    for mid in expected.keys() | stored.keys():
+        s, c = expected.get(mid, (0, 0))
+        got = stored.get(mid, (0, 0, bayes_score(0, 0)))
+        if (s, c) != tuple(got[:2]) or abs(bayes_score(s, c) - got[2]) > tolerance:
+            bad.append((mid, (s, c, bayes_score(s, c)), tuple(got)))
+    return sorted(bad)
+
+def ensure_movie_stats(db: Session) -> None:
+    # first start on a database that predates movie_stats
+    if db.query(MovieStats.movie_id).first() is None and db.query(Rating.id).first() is not None:
+        rebuild_movie_stats(db)
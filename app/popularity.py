@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+from app import model_registry
+from app.config import settings
+from app.database import db_source
+from app.models import Movie, MovieStats
+from app.utils import logger, timed
+
+# Cold-start ranking served from memory. Movies are ranked once by the
+# Bayesian score in movie_stats (unrated movies last); per-genre and
+# per-year-bucket rankings are index arrays into that global order. Serving
+# skips the user's rated movies: at most len(rated) of the first
+# top_n + len(rated) candidates can be rated, so one slice always fills the page.
+# The model worker publishes the ranking as POPULARITY_DIR snapshots (see
+# app.model_registry) so every process serves the same one; without a
+# worker it is rebuilt every POPULARITY_REFRESH_SECONDS on first use.
+
+class PopularityRanking:
+    def __init__(self, ids: np.ndarray, titles: List[str], scores: np.ndarray,
+                 genres: List[Optional[str]], years: np.ndarray, source: str = "", built_at: Optional[float] = None):
+        self.ids = ids  # movie ids, best first
+        self.titles = titles
+        self.genres = genres
+        self.years = years
+        self.scores = scores  # average rating (0 for unrated movies)
+        self.source = source
+        self.built_at = time.time() if built_at is None else built_at
+        self.rank_of = np.full(int(ids.max()) + 1 if len(ids) else 1, -1, dtype=np.int64)
+        self.rank_of[ids] = np.arange(len(ids))
+        by_genre: Dict[str, List[int]] = {}
+        for r, g in enumerate(genres):
+            for name in filter(None, (g or "").split("|")):
+                by_genre.setdefault(name.strip().lower(), []).append(r)
+        self.by_genre = {g: np.array(ranks, dtype=np.int64) for g, ranks in by_genre.items()}
+        bucket = settings.POPULARITY_YEAR_BUCKET
+        self.by_year: Dict[int, np.ndarray] = {}
+        known = np.flatnonzero(years > 0)
+        buckets = years[known] // bucket * bucket
+        for b in np.unique(buckets):
+            self.by_year[int(b)] = known[buckets == b]  # ascending ranks, i.e. best first
+
+    @classmethod
+    def from_db(cls, db: Session) -> "PopularityRanking":
+        rows = (
+            db.query(Movie.id, Movie.title, Movie.genres, Movie.year, MovieStats.avg_rating)
+            .outerjoin(MovieStats, MovieStats.movie_id == Movie.id)
+            .order_by(MovieStats.bayes_score.desc().nullslast(), MovieStats.rating_count.desc().nullslast(),
+                      Movie.id)
+            .all()
+        )
+        return cls(np.array([r[0] for r in rows], dtype=np.int64), [r[1] for r in rows],
+                   np.array([float(r[4] or 0.0) for r in rows]), [r[2] for r in rows],
+                   np.array([r[3] or 0 for r in rows], dtype=np.int64),
+                   source=db_source(db))
+
+    def save(self, path: str) -> None:
+        for name in ("ids", "scores", "years"):
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"source": self.source, "built_at": self.built_at,
+                       "titles": list(self.titles), "genres": list(self.genres)}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "PopularityRanking":
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        arr = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in ("ids", "scores", "years")}
+        return cls(arr["ids"], meta["titles"], arr["scores"], meta["genres"], arr["years"],
+                   source=meta["source"], built_at=meta["built_at"])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def top_unrated(self, rated: Iterable[int], top_n: int, genre: Optional[str] = None,
+                    year: Optional[int] = None, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, str, float]]:
+        """`allowed` is an extra bool mask over movie ids (e.g. from the genre index)."""
+        rated = np.fromiter(rated, dtype=np.int64)
+        rated_ranks = self.rank_of[rated[(rated >= 0) & (rated < len(self.rank_of))]]
+        window = top_n + len(rated)
+        cand = None
+        if allowed is not None:
+            ok = self.ids < len(allowed)
+            ok[ok] = allowed[self.ids[ok]]
+            cand = np.flatnonzero(ok)
+        if genre is not None:
+            ranks = self.by_genre.get(genre.strip().lower(), np.empty(0, dtype=np.int64))
+            cand = ranks if cand is None else np.intersect1d(cand, ranks, assume_unique=True)
+        if year is not None:
+            bucket = year // settings.POPULARITY_YEAR_BUCKET * settings.POPULARITY_YEAR_BUCKET
+            ranks = self.by_year.get(bucket, np.empty(0, dtype=np.int64))
+            cand = ranks if cand is None else np.intersect1d(cand, ranks, assume_unique=True)
+        cand = np.arange(min(window, len(self.ids))) if cand is None else cand[:window]
+        if not len(cand):
+            return []
+        # bitmap over the ranks the candidate window spans, set for the user's rated movies
+        skip = np.zeros(int(cand[-1]) + 1, dtype=bool)
+        skip[rated_ranks[(rated_ranks >= 0) & (rated_ranks < len(skip))]] = True
+        ranks = cand[~skip[cand]][:top_n]
+        return [(int(self.ids[r]), self.titles[r], float(self.scores[r])) for r in ranks]
+
+_ranking: Optional[PopularityRanking] = None
+_path: Optional[str] = None
+_lock = threading.Lock()
+
+@timed("popularity_build")
+def _build(db: Session) -> PopularityRanking:
+    ranking = PopularityRanking.from_db(db)
+    logger.info(f"[POPULAR] ranked {len(ranking)} movies, {len(ranking.by_genre)} genres, {len(ranking.by_year)} year buckets")
+    return ranking
+
+def build_snapshot(db: Session) -> Optional[int]:
+    """Rank from movie_stats and publish the next POPULARITY_DIR snapshot; returns its version."""
+    started = time.time()
+    mark = model_registry.rating_mark(db)
+    ranking = _build(db)
+    version = model_registry.next_version(settings.POPULARITY_DIR)
+    model_registry.publish(settings.POPULARITY_DIR, version, ranking.save, started, rating_mark=mark,
+                           movies=len(ranking))
+    return version
+
+def load_current(wait: bool = True) -> Optional[PopularityRanking]:
+    """Swap in the current POPULARITY_DIR snapshot if it isn't the one served (`wait`: for the lock)."""
+    global _ranking, _path
+    path = model_registry.current_path(settings.POPULARITY_DIR)
+    if path is None or path == _path or not _lock.acquire(blocking=wait):
+        return _ranking
+    try:
+        if path != _path:
+            _ranking, _path = PopularityRanking.load(path), path
+            model_registry.loaded("popularity", model_registry.snapshot_version(path))
+    finally:
+        _lock.release()
+    return _ranking
+
+def get_popularity(db: Session) -> PopularityRanking:
+    """Current ranking: the published snapshot, or rebuilt here every POPULARITY_REFRESH_SECONDS
+    without a model worker (callers keep the old one meanwhile)."""
+    global _ranking
+    source = db_source(db)
+    watched = model_registry.watching()
+    if _ranking is None or not watched:
+        load_current(wait=_ranking is None)
+    ranking = _ranking
+    if ranking is None or ranking.source != source:
+        with _lock:
+            if _ranking is None or _ranking.source != source:
+                _ranking = _build(db)
+            return _ranking
+    if not watched and time.time() - ranking.built_at > settings.POPULARITY_REFRESH_SECONDS \
+            and _lock.acquire(blocking=False):
+        try:
+            _ranking = _build(db)
+        finally:
+            _lock.release()
+    return _ranking
+
+def invalidate_popularity() -> None:
+    """Force a rebuild on next use (after bulk imports or movie_stats rebuilds)."""
+    global _ranking
+    _ranking = None
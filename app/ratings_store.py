@@ -0,0 +1,198 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.cf_engine import RatingsMatrix
+from app.config import settings
+from app.database import db_source
+from app.models import Rating
+from app.utils import logger
+
+# Process-wide, in-memory copy of the ratings table.
+# Columns are array-backed (user_id, movie_id, score); `_pos` maps
+# user_id -> {movie_id: row}. Writes go through upsert()/remove() from the
+# ratings router after commit; every change bumps `generation` so caches
+# derived from the store (e.g. the CF matrix) know when to rebuild.
+# The database queries of a (re)load or consistency check run without the
+# store lock, so readers and write-throughs never wait for a table scan;
+# writes that arrive while a load is reading are replayed onto its result.
+
+class RatingsStore:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.generation = 0
+        self.epoch = 0  # bumped on every full (re)load from the database
+        self.source: Optional[str] = None
+        self.checked_at = 0.0
+        self._reset(0)
+        self._matrix: Optional[RatingsMatrix] = None
+        self._matrix_gen = -1
+        self._matrix_lock = threading.Lock()  # one build at a time, outside the store lock
+        self._load_lock = threading.RLock()  # one (re)load at a time
+        self._replay: Optional[List[Tuple[int, int, Optional[int]]]] = None  # writes during a load
+
+    def _reset(self, capacity: int) -> None:
+        capacity = max(capacity, 1024)
+        self._users = np.zeros(capacity, dtype=np.int32)
+        self._movies = np.zeros(capacity, dtype=np.int32)
+        self._scores = np.zeros(capacity, dtype=np.int8)
+        self._n = 0
+        self._pos: Dict[int, Dict[int, int]] = {}
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def loaded(self) -> bool:
+        return self.source is not None
+
+    def _grow(self) -> None:
+        capacity = len(self._users) * 2
+        for name in ("_users", "_movies", "_scores"):
+            col = getattr(self, name)
+            new = np.zeros(capacity, dtype=col.dtype)
+            new[: self._n] = col[: self._n]
+            setattr(self, name, new)
+
+    def load(self, db: Session) -> None:
+        with self._load_lock:
+            with self._lock:
+                self._replay = []
+            try:
+                rows = db.query(Rating.user_id, Rating.movie_id, Rating.score).all()
+                n = len(rows)
+                capacity = max(n, 1024)
+                users, movies = np.zeros(capacity, dtype=np.int32), np.zeros(capacity, dtype=np.int32)
+                scores = np.zeros(capacity, dtype=np.int8)
+                pos: Dict[int, Dict[int, int]] = {}
+                if rows:
+                    u, m, s = zip(*rows)
+                    users[:n], movies[:n], scores[:n] = u, m, s
+                    for i, (uid, mid) in enumerate(zip(u, m)):
+                        pos.setdefault(uid, {})[mid] = i
+            except BaseException:
+                with self._lock:
+                    self._replay = None
+                raise
+            with self._lock:
+                self._users, self._movies, self._scores, self._n, self._pos = users, movies, scores, n, pos
+                self.source = db_source(db)
+                # write-throughs that landed while the rows were read (re-applying one the query saw is a no-op)
+                replay, self._replay = self._replay, None
+                for user_id, movie_id, score in replay:
+                    if score is None:
+                        self._remove(user_id, movie_id)
+                    else:
+                        self._upsert(user_id, movie_id, score)
+                self.checked_at = time.time()
+                self.epoch += 1
+                self.generation += 1
+        logger.info(f"[RATINGS] loaded {self._n} ratings into memory")
+
+    def upsert(self, user_id: int, movie_id: int, score: int) -> None:
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((user_id, movie_id, score))
+            if self.loaded:
+                self._upsert(user_id, movie_id, score)
+
+    def remove(self, user_id: int, movie_id: int) -> None:
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((user_id, movie_id, None))
+            self._remove(user_id, movie_id)
+
+    def _upsert(self, user_id: int, movie_id: int, score: int) -> None:
+        row = self._pos.get(user_id, {}).get(movie_id)
+        if row is None:
+            if self._n == len(self._users):
+                self._grow()
+            row = self._n
+            self._n += 1
+            self._users[row], self._movies[row] = user_id, movie_id
+            self._pos.setdefault(user_id, {})[movie_id] = row
+        self._scores[row] = score
+        self.generation += 1
+
+    def _remove(self, user_id: int, movie_id: int) -> None:
+        row = self._pos.get(user_id, {}).pop(movie_id, None)
+        if row is None:
+            return
+        if not self._pos[user_id]:
+            del self._pos[user_id]
+        last = self._n - 1
+        if row != last:
+            # move the last row into the hole to keep the columns dense
+            lu, lm = int(self._users[last]), int(self._movies[last])
+            self._users[row], self._movies[row], self._scores[row] = lu, lm, self._scores[last]
+            self._pos[lu][lm] = row
+        self._n = last
+        self.generation += 1
+
+    def user_ratings(self, user_id: int) -> Dict[int, int]:
+        with self._lock:
+            return {mid: int(self._scores[row]) for mid, row in self._pos.get(user_id, {}).items()}
+
+    def matrix(self) -> RatingsMatrix:
+        """Sparse user-item matrix for the current generation (built at most once per generation)."""
+        with self._matrix_lock:
+            with self._lock:
+                if self._matrix is not None and self._matrix_gen == self.generation:
+                    return self._matrix
+                # copy the columns (the matrix wants these dtypes anyway) and build without the lock,
+                # so writers and user_ratings() don't wait for the sort + CSR build
+                n, gen = self._n, self.generation
+                cols = (self._users[:n].astype(np.int64), self._movies[:n].astype(np.int64),
+                        self._scores[:n].astype(np.float64))
+            M = RatingsMatrix(*cols)
+            with self._lock:
+                if gen > self._matrix_gen:  # publish unless a newer one got there first
+                    self._matrix, self._matrix_gen = M, gen
+            return M
+
+    def check(self, db: Session) -> bool:
+        """Cheap consistency check against the database (row count + column checksums).
+
+        A write-through that lands between the aggregate and the comparison makes
+        the snapshot incomparable; that counts as in sync but leaves the store due
+        for another check on the next request.
+        """
+        with self._lock:
+            gen = self.generation
+        cnt, s_sum, u_sum, m_sum = db.query(
+            func.count(Rating.id), func.sum(Rating.score), func.sum(Rating.user_id), func.sum(Rating.movie_id)
+        ).one()
+        with self._lock:
+            if self.generation != gen:
+                self.checked_at = 0.0
+                return True
+            n = self._n
+            mine = (n, int(self._scores[:n].sum(dtype=np.int64)), int(self._users[:n].sum(dtype=np.int64)),
+                    int(self._movies[:n].sum(dtype=np.int64)))
+        return mine == (cnt or 0, int(s_sum or 0), int(u_sum or 0), int(m_sum or 0))
+
+    def ensure(self, db: Session) -> "RatingsStore":
+        """Load on first use, reload if the database changed under us (other workers, scripts)."""
+        source = db_source(db)
+        with self._lock:
+            stale = self.source != source
+            due = not stale and time.time() - self.checked_at > settings.RATINGS_STORE_RESYNC_SECONDS
+            if due:
+                self.checked_at = time.time()  # claim the check so concurrent requests don't repeat it
+        if stale:
+            with self._load_lock:
+                if self.source == source:  # another request loaded it while we waited
+                    return self
+                self.load(db)
+        elif due and not self.check(db):
+            logger.info("[RATINGS] in-memory store out of sync, reloading")
+            self.load(db)
+        return self
+
+ratings_store = RatingsStore()
+
+def get_ratings_store(db: Session) -> RatingsStore:
+    return ratings_store.ensure(db)
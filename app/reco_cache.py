@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from app.config import settings
+from app.utils import logger
+
+# Per-user recommendation result cache.
+# Keys are (user_id, method, k, top_n, model_version); a user's entries are
+# dropped when they rate/delete (ratings router) and a rebuilt model changes
+# the version part of the key. Every invalidation also bumps the user's
+# token: a result computed from the ratings before it is not stored. Other
+# users' new ratings are picked up by CF once the entry expires
+# (RECO_CACHE_TTL_SECONDS).
+
+Key = Tuple[int, str, int, int, tuple]
+Rows = List[Tuple[int, str, float]]
+
+class ResultCache:
+    """In-process LRU + TTL cache."""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Key, Tuple[float, Rows]]" = OrderedDict()
+        self._by_user: Dict[int, Set[Key]] = {}
+        self._tokens: Dict[int, int] = {}  # user_id -> invalidations so far
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def _drop(self, key: Key) -> None:
+        self._data.pop(key, None)
+        keys = self._by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[key[0]]
+
+    def user_token(self, user_id: int) -> int:
+        """Taken before computing a result; set() drops the result if the user was invalidated since."""
+        with self._lock:
+            return self._tokens.get(user_id, 0)
+
+    def get(self, key: Key, token: Optional[int] = None) -> Optional[Rows]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Key, rows: Rows, token: Optional[int] = None) -> None:
+        with self._lock:
+            if token is not None and self._tokens.get(key[0], 0) != token:
+                return  # the user rated while this was computed
+            self._data[key] = (time.monotonic() + self.ttl, rows)
+            self._data.move_to_end(key)
+            self._by_user.setdefault(key[0], set()).add(key)
+            while len(self._data) > self.max_entries:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._drop(key)
+            self._tokens[user_id] = self._tokens.get(user_id, 0) + 1
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._by_user.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"backend": "memory", "entries": len(self._data), "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions, "invalidations": self.invalidations}
+
+class RedisResultCache(ResultCache):
+    """Shared cache for multi-worker deployments (any Redis-protocol server).
+
+    Per-user invalidation bumps a per-user version that is part of every key,
+    so stale entries are simply never read again and expire via TTL; size is
+    bounded by the server's maxmemory/LRU policy.
+    """
+
+    def __init__(self, url: str, ttl: float = 300.0, prefix: str = "reco"):
+        import redis  # optional dependency, only needed with RECO_CACHE_URL
+        super().__init__(max_entries=0, ttl=ttl)
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def user_token(self, user_id: int) -> int:
+        return int(self.client.get(f"{self.prefix}:uver:{user_id}") or 0)
+
+    def _rkey(self, key: Key, token: Optional[int] = None) -> str:
+        # a result stored under the version it was computed at is never read after an invalidation
+        user_ver = self.user_token(key[0]) if token is None else token
+        return f"{self.prefix}:{key[0]}:{user_ver}:{key[1]}:{key[2]}:{key[3]}:{':'.join(map(str, key[4]))}"
+
+    def get(self, key: Key, token: Optional[int] = None) -> Optional[Rows]:
+        raw = self.client.get(self._rkey(key, token))
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return [tuple(r) for r in json.loads(raw)]
+
+    def set(self, key: Key, rows: Rows, token: Optional[int] = None) -> None:
+        self.client.set(self._rkey(key, token), json.dumps(rows), ex=max(int(self.ttl), 1))
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.client.incr(f"{self.prefix}:uver:{user_id}")
+        with self._lock:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+    def stats(self) -> dict:
+        out = super().stats()
+        out.update(backend="redis", entries=None, max_entries=None)
+        return out
+
+def _make_cache() -> ResultCache:
+    if settings.RECO_CACHE_URL:
+        try:
+            return RedisResultCache(settings.RECO_CACHE_URL, ttl=settings.RECO_CACHE_TTL_SECONDS)
+        except ImportError:
+            logger.warning("[CACHE] RECO_CACHE_URL set but the redis package is missing; using in-process cache")
+    return ResultCache(max_entries=settings.RECO_CACHE_MAX_ENTRIES, ttl=settings.RECO_CACHE_TTL_SECONDS)
+
+reco_cache = _make_cache()
+
+def cached(user_id: int, method: str, k: int, top_n: int, version: tuple, compute: Callable[[], Rows]) -> Rows:
+    if not settings.RECO_CACHE_ENABLED:
+        return compute()
+    key = (user_id, method, k, top_n, version)
+    token = reco_cache.user_token(user_id)
+    rows = reco_cache.get(key, token)
+    if rows is None:
+        rows = compute()
+        reco_cache.set(key, rows, token)
+    return rows
@@ -1,166 +1,306 @@
-from typing import List, Dict, Tuple
-from collections import defaultdict
+from typing import List, Dict, Optional, Tuple
 import numpy as np
+from scipy import sparse
 from sqlalchemy.orm import Session
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity as sk_cosine
-from functools import lru_cache
-from app.models import Movie, Rating, User
+from app.models import User
 from app.config import settings
+from app.content_model import get_content_model
+from app.content_profile import profile_cache
+from app.ann import get_ann_index
+from app.ratings_store import get_ratings_store
+from app.mf import get_mf_model
+from app.item_cf import get_item_cf
+from app.popularity import get_popularity
+from app.genres import get_genre_index
+from app.catalog import hydrate
+from app.instrumentation import phase
 from app.utils import timed
 
-def _genres_to_str(genres: str) -> str:
-    return "" if not genres else " ".join([g.strip().replace("-", "").replace("|", " ") for g in genres.split("|")])
-
 @timed("content_based_recommender")
-def content_based(db: Session, user: User, top_n: int = 20) -> List[Tuple[int, str, float]]:
-    movies = db.query(Movie).all()
-    if not movies:
+def content_based(db: Session, user: User, top_n: int = 20, genres: Optional[List[str]] = None,
+                  genre_mode: str = "or", offset: int = 0) -> List[Tuple[int, str, float]]:
+    # TF-IDF matrix is built once and persisted; see app.content_model
+    with phase("matrix_build"):
+        model = get_content_model(db)
+    if model is None:
         return []
+    X, ids, id_to_idx = model.X, model.ids, model.id_to_idx
 
-    # Build corpus: genres + optional overview
-    docs = []
-    ids = []
-    for m in movies:
-        text = _genres_to_str(m.genres)
-        if settings.ENABLE_TFIDF and m.overview:
-            text = f"{text} {m.overview}"
-        docs.append(text)
-        ids.append(m.id)
-
-    # TF-IDF vectorization
-    vectorizer = TfidfVectorizer(max_features=8000, ngram_range=(1, 2), stop_words="english")
-    X = vectorizer.fit_transform(docs)  # (#movies, #features)
-
-    # User preference vector: weighted avg of liked movies (score-centered)
-    user_ratings = db.query(Rating).filter(Rating.user_id == user.id).all()
-    rated_ids = {r.movie_id: r.score for r in user_ratings}
+    # User preference vector: sparse score-weighted sum of rated movies, cached (see app.content_profile)
+    with phase("db_load"):
+        rated_ids = get_ratings_store(db).user_ratings(user.id)
     if not rated_ids:
         # cold-start: highest average rated (fallback)
-        return _popular_unrated(db, user, top_n)
-
-    # Center scores around neutral 3 to emphasize likes
-    weights = []
-    vecs = []
-    id_to_idx = {mid: i for i, mid in enumerate(ids)}
-    for mid, score in rated_ids.items():
-        if mid in id_to_idx:
-            w = score - 3.0
-            if w > 0:  # focus on likes
-                weights.append(w)
-                vecs.append(X[id_to_idx[mid]].toarray()[0])
-
-    if not weights:
-        return _popular_unrated(db, user, top_n)
-
-    user_vec = np.average(np.array(vecs), axis=0, weights=np.array(weights)).reshape(1, -1)
-    sims = sk_cosine(user_vec, X).flatten()  # similarity to all movies
-
-    # Exclude rated
-    for mid in rated_ids:
-        if mid in id_to_idx:
-            sims[id_to_idx[mid]] = -1
-
-    # Top-N
-    order = np.argsort(-sims)[:top_n]
-    out: List[Tuple[int, str, float]] = []
-    for idx in order:
-        m_id = ids[idx]
-        m = next((mm for mm in movies if mm.id == m_id), None)
-        if m:
-            out.append((m.id, m.title, float(sims[idx])))
-    return out
+        return _popular_unrated(db, user, top_n, genres=genres, genre_mode=genre_mode, offset=offset)
+
+    with phase("vectorize"):
+        user_vec = profile_cache.get(db, model, user.id, rated_ids)
+    if user_vec is None:
+        return _popular_unrated(db, user, top_n, genres=genres, genre_mode=genre_mode, offset=offset)
+
+    with phase("similarity"):
+        # rows of X are L2-normalised: X @ unit profile is the cosine similarity
+        q = user_vec.toarray().ravel()
+        q /= np.linalg.norm(q) + 1e-12
+        allowed = _genre_mask(db, genres, genre_mode, ids)
+        index = get_ann_index(model) if settings.CONTENT_ANN and len(ids) >= settings.ANN_MIN_MOVIES else None
+        if allowed is not None:
+            # genre pre-filter: exact scores for the matching movies only
+            rows = np.flatnonzero(allowed)
+            sims = np.full(len(ids), -np.inf)
+            sims[rows] = X[rows] @ q if len(rows) else []
+        else:
+            # ANN: score only the candidates (with room for movies the user already rated)
+            want = offset + top_n + len(rated_ids)
+            rows = index.search(q.reshape(1, -1), want) if index is not None else None
+            if rows is not None and len(rows) >= want:
+                sims = np.full(len(ids), -np.inf)
+                sims[rows] = X[rows] @ q
+            else:
+                sims = X @ q  # similarity to all movies
+
+    with phase("top_n"):
+        order = select_top(sims, top_n, offset, exclude=_rows_of(rated_ids, id_to_idx))
+    with phase("hydrate"):
+        return hydrate(db, ids[order].tolist(), sims[order])
 
 @timed("cf_user_user_knn")
-def collaborative_filtering(db: Session, user: User, k: int = 20, top_n: int = 20) -> List[Tuple[int, str, float]]:
-    # Build user-item matrix in-memory
-    ratings = db.query(Rating).all()
-    if not ratings:
+def collaborative_filtering(db: Session, user: User, k: int = 20, top_n: int = 20, genres: Optional[List[str]] = None,
+                            genre_mode: str = "or", offset: int = 0) -> List[Tuple[int, str, float]]:
+    # Sparse user-item matrix from the in-memory ratings store
+    with phase("db_load"):
+        store = get_ratings_store(db)
+    with phase("matrix_build"):
+        M = store.matrix()
+    if not len(M):
         return []
 
-    users = sorted({r.user_id for r in ratings})
-    movies = sorted({r.movie_id for r in ratings})
-    u_index = {u: i for i, u in enumerate(users)}
-    m_index = {m: i for i, m in enumerate(movies)}
-
-    R = np.zeros((len(users), len(movies)), dtype=float)
-    mask = np.zeros_like(R, dtype=bool)
-    for r in ratings:
-        ui, mi = u_index[r.user_id], m_index[r.movie_id]
-        R[ui, mi] = r.score
-        mask[ui, mi] = True
-
-    if user.id not in u_index:
-        return _popular_unrated(db, user, top_n)
-
-    ui = u_index[user.id]
-    # Mean-center per-user to mitigate user bias
-    means = np.sum(R, axis=1) / np.maximum(mask.sum(axis=1), 1)
-    R_centered = R - means[:, None]
-    R_centered[~mask] = 0.0
-
-    # Cosine similarity between users
-    def row_cosine(A):
-        norms = np.linalg.norm(A, axis=1, keepdims=True) + 1e-9
-        A = A / norms
-        return np.dot(A, A.T)
-
-    S = row_cosine(R_centered)
-    sims = S[ui].copy()
-    sims[ui] = 0.0  # exclude self
-
-    # K nearest neighbors (by similarity)
-    nn_idx = np.argsort(-sims)[:k]
-    nn_sims = sims[nn_idx].reshape(-1, 1)
-
-    # Predict for items the target user hasn't rated
-    user_mask = mask[ui]
-    preds = np.zeros(len(movies))
-    denom = np.sum(np.abs(nn_sims), axis=0)[0] + 1e-9
-
-    for mi in range(len(movies)):
-        if user_mask[mi]:
-            preds[mi] = -1  # already seen
-            continue
-        neigh_ratings = R_centered[nn_idx, mi].reshape(-1, 1)
-        num = float(np.sum(nn_sims * neigh_ratings))
-        score = means[ui] + num / denom  # de-center
-        preds[mi] = score
-
-    order = np.argsort(-preds)[:top_n]
-    out = []
-    movie_objs = {m.id: m for m in db.query(Movie).filter(Movie.id.in_(movies))}
-    for mi in order:
-        if preds[mi] <= 0:
-            continue
-        mid = movies[mi]
-        m = movie_objs.get(mid)
-        if m:
-            out.append((m.id, m.title, float(preds[mi])))
-    if not out:
-        return _popular_unrated(db, user, top_n)
+    if user.id not in M.u_index:
+        return _popular_unrated(db, user, top_n, genres=genres, genre_mode=genre_mode, offset=offset)
+
+    with phase("similarity"):
+        preds = M.predict_user(M.u_index[user.id], k=k)
+        allowed = _genre_mask(db, genres, genre_mode, M.movies)
+        if allowed is not None:
+            preds[~allowed] = -1
+
+    with phase("top_n"):
+        # rated (and filtered-out) movies are predicted as -1
+        order = select_top(preds, top_n, offset, floor=0.0)
+    with phase("hydrate"):
+        out = hydrate(db, np.asarray(M.movies)[order].tolist(), preds[order])
+    if not out and not offset:
+        return _popular_unrated(db, user, top_n, genres=genres, genre_mode=genre_mode)
+    return out
+
+@timed("mf_als")
+def matrix_factorization(db: Session, user: User, top_n: int = 20, genres: Optional[List[str]] = None,
+                         genre_mode: str = "or", offset: int = 0) -> List[Tuple[int, str, float]]:
+    # Factors are trained offline by scripts/train_mf.py; see app.mf
+    with phase("matrix_build"):
+        model = get_mf_model()
+    with phase("db_load"):
+        rated_ids = get_ratings_store(db).user_ratings(user.id)
+    with phase("vectorize"):
+        user_vec = model.user_vector(user.id, rated_ids) if model is not None and rated_ids else None
+    if user_vec is None:
+        return _popular_unrated(db, user, top_n, genres=genres, genre_mode=genre_mode, offset=offset)
+
+    with phase("similarity"):
+        allowed = _genre_mask(db, genres, genre_mode, model.item_ids)
+        if allowed is None:
+            scores = model.scores(user_vec)
+        else:
+            # genre pre-filter: score the matching items only
+            rows = np.flatnonzero(allowed)
+            scores = np.full(len(model.item_ids), -np.inf)
+            scores[rows] = np.asarray(model.V)[rows] @ user_vec + model.mean
+    with phase("top_n"):
+        order = select_top(scores, top_n, offset, exclude=_rows_of(rated_ids, model.i_index))
+    with phase("hydrate"):
+        return hydrate(db, np.asarray(model.item_ids)[order].tolist(), scores[order])
+
+@timed("hybrid")
+def hybrid(db: Session, user: User, top_n: int = 20, k: int = 20, w_content: Optional[float] = None,
+           w_cf: Optional[float] = None, diversity: Optional[float] = None, genres: Optional[List[str]] = None,
+           genre_mode: str = "or", offset: int = 0) -> List[Tuple[int, str, float]]:
+    # Content and user-user CF scores from one load of the ratings store and TF-IDF model, each min-max
+    # normalised over the eligible movies and blended with the weights; the best HYBRID_CANDIDATES are
+    # re-ranked by MMR (diversity = lambda, relevance vs. TF-IDF similarity to movies already picked)
+    # and hydrated with a single query.
+    w_content = settings.HYBRID_WEIGHT_CONTENT if w_content is None else w_content
+    w_cf = settings.HYBRID_WEIGHT_CF if w_cf is None else w_cf
+    diversity = settings.HYBRID_MMR_LAMBDA if diversity is None else diversity
+    with phase("db_load"):
+        store = get_ratings_store(db)
+        rated_ids = store.user_ratings(user.id)
+    with phase("matrix_build"):
+        model = get_content_model(db)
+        M = store.matrix()
+    if model is None or not rated_ids:
+        return _popular_unrated(db, user, top_n, genres=genres, genre_mode=genre_mode, offset=offset)
+    ids = model.ids
+
+    with phase("vectorize"):
+        user_vec = profile_cache.get(db, model, user.id, rated_ids) if w_content > 0 else None
+    with phase("similarity"):
+        # rows of X are L2-normalised, so X @ profile ranks like cosine (min-max below removes the scale)
+        content = model.X @ user_vec.toarray().ravel() if user_vec is not None else None
+        cf = None
+        if w_cf > 0 and user.id in M.u_index:
+            preds = M.predict_user(M.u_index[user.id], k=k)
+            # onto the content model's movie order
+            row_of = np.full(max(model.max_id, int(M.movies.max()) if len(M.movies) else 0) + 1, -1)
+            row_of[ids] = np.arange(len(ids))
+            pos = row_of[np.asarray(M.movies, dtype=np.int64)]
+            known = pos >= 0
+            cf = np.full(len(ids), np.nan)
+            cf[pos[known]] = preds[known]
+        if content is None and cf is None:
+            return _popular_unrated(db, user, top_n, genres=genres, genre_mode=genre_mode, offset=offset)
+        valid = np.ones(len(ids), dtype=bool)
+        valid[_rows_of(rated_ids, model.id_to_idx)] = False
+        allowed = _genre_mask(db, genres, genre_mode, ids)
+        if allowed is not None:
+            valid &= allowed
+        blend = np.zeros(len(ids))
+        for w, s in ((w_content, content), (w_cf, cf)):
+            if s is not None:
+                blend += w * _minmax(s, valid)
+        blend[~valid] = -np.inf
+
+    with phase("top_n"):
+        part = select_top(blend, max(settings.HYBRID_CANDIDATES, offset + top_n))
+        if not len(part):
+            return _popular_unrated(db, user, top_n, genres=genres, genre_mode=genre_mode, offset=offset)
+    with phase("rerank"):
+        # MMR picks in order, so page `offset` is the continuation of the earlier pages
+        order = part[mmr(model.X[part], blend[part] / max(w_content + w_cf, 1e-9), offset + top_n, diversity)]
+        order = order[offset:]
+    with phase("hydrate"):
+        return hydrate(db, ids[order].tolist(), blend[order])
+
+def _minmax(scores: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """`scores` scaled to [0, 1] over the valid, known (non-NaN) entries; unknown ones score 0."""
+    known = valid & np.isfinite(scores)
+    out = np.zeros(len(scores))
+    if known.any():
+        lo, hi = scores[known].min(), scores[known].max()
+        out[known] = (scores[known] - lo) / (hi - lo) if hi > lo else 1.0
+    return out
+
+def mmr(X, relevance: np.ndarray, n: int, lam: float) -> np.ndarray:
+    """Maximal marginal relevance: greedily pick rows maximising lam * relevance - (1 - lam) * max
+    similarity (X @ X.T, rows L2-normalised) to the rows already picked. Returns positions in pick order."""
+    n = min(n, len(relevance))
+    if lam >= 1.0 or n <= 1:
+        return np.argsort(-relevance, kind="stable")[:n]
+    S = np.asarray((X @ X.T).todense()) if sparse.issparse(X) else X @ X.T
+    penalty = np.zeros(len(relevance))
+    free = np.ones(len(relevance), dtype=bool)
+    picked = []
+    for _ in range(n):
+        i = int(np.argmax(np.where(free, lam * relevance - (1.0 - lam) * penalty, -np.inf)))
+        picked.append(i)
+        free[i] = False
+        penalty = np.maximum(penalty, S[i])
+    return np.array(picked, dtype=np.int64)
+
+@timed("item_item_cf")
+def item_based(db: Session, user: User, top_n: int = 20, genres: Optional[List[str]] = None,
+               genre_mode: str = "or", offset: int = 0) -> List[Tuple[int, str, float]]:
+    # Neighbour lists are built offline by scripts/build_item_cf.py; see app.item_cf
+    with phase("db_load"):
+        store = get_ratings_store(db)
+        rated_ids = store.user_ratings(user.id)
+    with phase("matrix_build"):
+        model = get_item_cf(store)
+    if model is None or not rated_ids:
+        return _popular_unrated(db, user, top_n, genres=genres, genre_mode=genre_mode, offset=offset)
+
+    with phase("similarity"):
+        cand, scores = model.scores(rated_ids)
+        allowed = _genre_mask(db, genres, genre_mode, cand)
+        if allowed is not None:
+            scores[~allowed] = -np.inf
+    with phase("top_n"):
+        rated = np.isin(cand, np.fromiter(rated_ids, dtype=np.int64, count=len(rated_ids)))
+        order = select_top(scores, top_n, offset, exclude=np.flatnonzero(rated), floor=0.0)
+    with phase("hydrate"):
+        out = hydrate(db, cand[order].tolist(), scores[order])
+    if not out and not offset:
+        return _popular_unrated(db, user, top_n, genres=genres, genre_mode=genre_mode)
     return out
 
-def _popular_unrated(db: Session, user: User, top_n: int):
-    # fallback by avg rating
-    subq = (
-        db.query(Rating.movie_id, func.avg(Rating.score).label("avg"), func.count(Rating.id).label("cnt"))
-        .group_by(Rating.movie_id)
-        .subquery()
-    )
-    from sqlalchemy import func
-    q = (
-        db.query(Movie, subq.c.avg, subq.c.cnt)
-        .join(subq, subq.c.movie_id == Movie.id, isouter=True)
-        .order_by((subq.c.avg).desc().nullslast(), (subq.c.cnt).desc().nullslast())
-        .limit(top_n * 2)
-    )
-    rated = {r.movie_id for r in db.query(Rating).filter(Rating.user_id == user.id)}
-    out = []
-    for m, avg, cnt in q:
-        if m.id in rated:
-            continue
-        out.append((m.id, m.title, float(avg or 0.0)))
-        if len(out) >= top_n:
-            break
+def similar_movies(db: Session, movie_id: int, top_n: int = 20) -> List[Tuple[int, str, float]]:
+    """Movies like `movie_id`: its item-item neighbours, else the closest movies by content."""
+    model = get_item_cf(get_ratings_store(db))
+    pairs = model.similar(movie_id, top_n) if model is not None else []
+    if not pairs:
+        content = get_content_model(db)
+        if content is None or movie_id not in content.id_to_idx:
+            return []
+        # TF-IDF rows are unit length: cosine similarities are plain dot products
+        sims = (content.X @ content.X[content.id_to_idx[movie_id]].T).toarray().ravel()
+        sims[content.id_to_idx[movie_id]] = -np.inf
+        n = min(top_n, len(sims) - 1)
+        if n <= 0:
+            return []
+        part = np.argpartition(-sims, n - 1)[:n]
+        part = part[np.argsort(-sims[part], kind="stable")]
+        pairs = [(int(content.ids[i]), float(sims[i])) for i in part if sims[i] > 0]
+    return hydrate(db, [m for m, _ in pairs], [s for _, s in pairs])
+
+def model_version(db: Session, method: str) -> tuple:
+    """Identifies the model state behind `method`'s results (part of result-cache keys)."""
+    if method == "content":
+        model = get_content_model(db)
+        return (model.version, model.folded) if model is not None else (0, 0)
+    if method == "mf":
+        model = get_mf_model()
+        return (model.version,) if model is not None else (0,)
+    if method == "hybrid":
+        return model_version(db, "content") + model_version(db, "cf")
+    if method == "item":
+        model = get_item_cf()
+        return (model.version, model.updates) if model is not None else (0, 0)
+    return (get_ratings_store(db).epoch,)
+
+def select_top(scores: np.ndarray, n: int, offset: int = 0, exclude: Optional[np.ndarray] = None,
+               floor: float = -np.inf) -> np.ndarray:
+    """Positions of the best scores (above `floor`, finite) ranked offset .. offset + n, best first.
+
+    argpartition keeps this O(len(scores)); `exclude` positions are set to -inf in `scores` itself.
+    """
+    if exclude is not None and len(exclude):
+        scores[exclude] = -np.inf
+    m = min(offset + n, len(scores))
+    if m <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, m - 1)[:m]
+    part = part[np.argsort(-scores[part], kind="stable")]
+    part = part[np.isfinite(scores[part]) & (scores[part] > floor)]
+    return part[offset:offset + n]
+
+def _rows_of(movie_ids, index: Dict[int, int]) -> np.ndarray:
+    """Rows of a model's `index` (movie id -> row) for the movies it knows."""
+    return np.fromiter((index[m] for m in movie_ids if m in index), dtype=np.int64)
+
+def _genre_mask(db: Session, genres: Optional[List[str]], mode: str, ids) -> Optional[np.ndarray]:
+    """Which of `ids` (a model's movie ids) pass the genre filter; None when there is no filter."""
+    if not genres:
+        return None
+    allowed = get_genre_index(db).mask(genres, mode)
+    ids = np.asarray(ids, dtype=np.int64)
+    known = ids < len(allowed)
+    out = np.zeros(len(ids), dtype=bool)
+    out[known] = allowed[ids[known]]
     return out
+
+def _popular_unrated(db: Session, user: User, top_n: int, genre: Optional[str] = None,
+                     year: Optional[int] = None, genres: Optional[List[str]] = None, genre_mode: str = "or",
+                     offset: int = 0):
+    # cold-start fallback: in-memory Bayesian popularity ranking (see app.popularity)
+    rated = get_ratings_store(db).user_ratings(user.id)
+    allowed = get_genre_index(db).mask(genres, genre_mode) if genres else None
+    return get_popularity(db).top_unrated(rated, offset + top_n, genre=genre, year=year, allowed=allowed)[offset:]
@@ -0,0 +1,3 @@
+# Async twins of the routers in app.routers, mounted instead of them when
+# ASYNC_DB=1: same paths, schemas and behaviour, database I/O awaited on an
+# AsyncSession (app.database.get_async_db).
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.loaders import load_user
+from app.models import User
+from app.schemas import SignupRequest, LoginRequest, TokenResponse
+from app.auth import hash_password, verify_password, create_access_token
+from app.executor import run_hash
+
+router = APIRouter(prefix="/api/auth", tags=["auth"])
+
+# bcrypt is CPU-bound: hashing runs on the bcrypt pool (app.executor.run_hash), not on the event loop
+
+@router.post("/signup", response_model=TokenResponse)
+async def signup(payload: SignupRequest, db: AsyncSession = Depends(get_async_db)):
+    if await load_user(db, payload.email):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
+    user = User(email=payload.email, password_hash=await run_hash(hash_password, payload.password))
+    db.add(user)
+    await db.commit()
+    return TokenResponse(access_token=create_access_token(user.email, uid=user.id))
+
+@router.post("/login", response_model=TokenResponse)
+async def login(payload: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    user = await load_user(db, payload.email)
+    if not user or not await run_hash(verify_password, payload.password, user.password_hash):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    return TokenResponse(access_token=create_access_token(user.email, uid=user.id))
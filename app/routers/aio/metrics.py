@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.loaders import load_overview
+from app.routers import metrics as sync_metrics
+from app.schemas import MetricsOut
+
+router = APIRouter(prefix="/api/metrics", tags=["metrics"])
+
+@router.get("/overview", response_model=MetricsOut)
+async def overview(db: AsyncSession = Depends(get_async_db)):
+    c = await load_overview(db)
+    return sync_metrics.overview_out(c["users"], c["movies"], c["ratings"], c["covered"])
+
+# the other metrics endpoints don't touch the database
+router.routes.extend(r for r in sync_metrics.router.routes if r.path != "/api/metrics/overview")
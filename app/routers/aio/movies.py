@@ -0,0 +1,41 @@
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.database import get_async_read_db, get_db, get_read_db
+from app.genres import parse_genre_filter
+from app.models import Movie
+from app.recommenders import similar_movies
+from app.routers.movies import movie_page
+from app.schemas import MovieOut, RecoOut
+
+router = APIRouter(prefix="/api/movies", tags=["movies"])
+
+@router.get("", response_model=List[MovieOut])
+async def list_movies(
+    response: Response,
+    db: Session = Depends(get_db),
+    q: Optional[str] = Query(None, description="full-text search (title + overview), best matches first"),
+    year: Optional[int] = None,
+    genre: Optional[List[str]] = Query(None, description="exact genre; repeat or comma-separate for several"),
+    genre_mode: Literal["and", "or"] = Query("and", description="movies with all / any of the genres"),
+    page: int = 1,
+    size: int = 20,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page (replaces page)"),
+):
+    # shared with the sync router; FTS ranking, typo matching and a genre index build stay off the event loop
+    out, next_cursor = await run_in_threadpool(movie_page, db, q, year, parse_genre_filter(genre), genre_mode,
+                                               page, size, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return out
+
+@router.get("/{movie_id}/similar", response_model=List[RecoOut])
+async def similar(movie_id: int, db: Session = Depends(get_read_db), adb: AsyncSession = Depends(get_async_read_db),
+                  top_n: int = Query(20, ge=1, le=100)):
+    if await adb.get(Movie, movie_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    # neighbour lookup (and a possible content-model load) stays off the event loop
+    rows = await run_in_threadpool(similar_movies, db, movie_id, top_n)
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
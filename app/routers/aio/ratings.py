@@ -0,0 +1,55 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.auth import get_current_user_async
+from app.loaders import load_rating, load_user_ratings
+from app.models import Rating, Movie
+from app.ratings_store import ratings_store
+from app.batch import invalidate_precomputed
+from app.item_cf import touch
+from app.movie_stats import apply_rating_delta
+from app.reco_cache import reco_cache
+from app.schemas import RatingCreate, RatingOut
+
+router = APIRouter(prefix="/api/ratings", tags=["ratings"])
+
+@router.post("", response_model=RatingOut)
+async def upsert_rating(payload: RatingCreate, db: AsyncSession = Depends(get_async_db),
+                        user=Depends(get_current_user_async)):
+    movie = await db.get(Movie, payload.movie_id)
+    if not movie:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    rat = await load_rating(db, user.id, payload.movie_id)
+    if rat:
+        await db.run_sync(apply_rating_delta, rat.movie_id, payload.score - rat.score, 0)
+        rat.score = payload.score
+    else:
+        rat = Rating(user_id=user.id, movie_id=payload.movie_id, score=payload.score)
+        db.add(rat)
+        await db.run_sync(apply_rating_delta, rat.movie_id, payload.score, 1)
+    await db.run_sync(invalidate_precomputed, user.id)
+    await db.commit()
+    ratings_store.upsert(user.id, rat.movie_id, rat.score)
+    touch(rat.movie_id)
+    reco_cache.invalidate_user(user.id)
+    return RatingOut(id=rat.id, movie_id=rat.movie_id, score=rat.score, title=movie.title)
+
+@router.get("/me", response_model=List[RatingOut])
+async def my_ratings(db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user_async)):
+    rows = await load_user_ratings(db, user.id)
+    return [RatingOut(id=r.id, movie_id=r.movie_id, score=r.score, title=title) for r, title in rows]
+
+@router.delete("/{movie_id}")
+async def delete_rating(movie_id: int, db: AsyncSession = Depends(get_async_db), user=Depends(get_current_user_async)):
+    rat = await load_rating(db, user.id, movie_id)
+    if not rat:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rating not found")
+    await db.delete(rat)
+    await db.run_sync(apply_rating_delta, movie_id, -rat.score, -1)
+    await db.run_sync(invalidate_precomputed, user.id)
+    await db.commit()
+    ratings_store.remove(user.id, movie_id)
+    touch(movie_id)
+    reco_cache.invalidate_user(user.id)
+    return {"ok": True}
@@ -0,0 +1,124 @@
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.database import get_async_read_db, get_read_db
+from app.auth import authorize_batch, batch_service, get_current_user_async
+from app.recommenders import content_based, collaborative_filtering, hybrid, item_based, matrix_factorization, \
+    model_version, _popular_unrated
+from app.batch import batch_recommend
+from app.config import settings
+from app.genres import parse_genre_filter
+from app.loaders import load_precomputed
+from app.reco_cache import cached
+from app.executor import run_scoring
+from app.routers.recommendations import GenreFilter, GenreMode, Offset, _filtered, _skip, hybrid_params
+from app.schemas import RecoOut, BatchRecoRequest, BatchRecoOut
+
+router = APIRouter(prefix="/api/recommendations", tags=["recommendations"])
+
+# The user and precomputed results are awaited on the AsyncSession; scoring is
+# CPU-bound and stays in the scoring pool with a sync read session (`db`),
+# which only touches the database when an in-memory model needs a refresh.
+
+@router.get("/content", response_model=List[RecoOut])
+async def rec_content(db: Session = Depends(get_read_db), adb: AsyncSession = Depends(get_async_read_db),
+                      user=Depends(get_current_user_async), top_n: int = Query(20, ge=1, le=100),
+                      genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                      offset: int = Offset):
+    genres = parse_genre_filter(genre)
+    name = _filtered("content", genres, genre_mode, offset)
+    stored = not genres and _skip(await load_precomputed(adb, user.id, "content", offset + top_n), offset)
+    rows = stored or await run_scoring(
+        "content", (name, user.id, top_n), lambda: cached(
+            user.id, name, 0, top_n, model_version(db, "content"),
+            lambda: content_based(db, user, top_n=top_n, genres=genres, genre_mode=genre_mode, offset=offset)))
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
+
+@router.get("/cf", response_model=List[RecoOut])
+async def rec_cf(db: Session = Depends(get_read_db), adb: AsyncSession = Depends(get_async_read_db),
+                 user=Depends(get_current_user_async), k: int = Query(20, ge=1, le=100),
+                 top_n: int = Query(20, ge=1, le=100),
+                 genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                 offset: int = Offset):
+    genres = parse_genre_filter(genre)
+    name = _filtered("cf", genres, genre_mode, offset)
+    stored = not genres and _skip(await load_precomputed(adb, user.id, "cf", offset + top_n, k=k), offset)
+    rows = stored or await run_scoring(
+        "cf", (name, user.id, k, top_n), lambda: cached(
+            user.id, name, k, top_n, model_version(db, "cf"),
+            lambda: collaborative_filtering(db, user, k=k, top_n=top_n, genres=genres, genre_mode=genre_mode,
+                                            offset=offset)))
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
+
+@router.get("/mf", response_model=List[RecoOut])
+async def rec_mf(db: Session = Depends(get_read_db), adb: AsyncSession = Depends(get_async_read_db),
+                 user=Depends(get_current_user_async), top_n: int = Query(20, ge=1, le=100),
+                 genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                 offset: int = Offset):
+    genres = parse_genre_filter(genre)
+    name = _filtered("mf", genres, genre_mode, offset)
+    stored = not genres and _skip(await load_precomputed(adb, user.id, "mf", offset + top_n), offset)
+    rows = stored or await run_scoring(
+        "mf", (name, user.id, top_n), lambda: cached(
+            user.id, name, 0, top_n, model_version(db, "mf"),
+            lambda: matrix_factorization(db, user, top_n=top_n, genres=genres, genre_mode=genre_mode, offset=offset)))
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
+
+@router.get("/hybrid", response_model=List[RecoOut])
+async def rec_hybrid(db: Session = Depends(get_read_db), user=Depends(get_current_user_async),
+                     k: int = Query(20, ge=1, le=100), top_n: int = Query(20, ge=1, le=100),
+                     w_content: Optional[float] = Query(None, ge=0, description="content weight (HYBRID_WEIGHT_CONTENT)"),
+                     w_cf: Optional[float] = Query(None, ge=0, description="CF weight (HYBRID_WEIGHT_CF)"),
+                     diversity: Optional[float] = Query(None, ge=0, le=1, description="MMR lambda, 1 = no re-ranking"),
+                     genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                     offset: int = Offset):
+    wc, wf, lam = hybrid_params(w_content, w_cf, diversity)
+    genres = parse_genre_filter(genre)
+    name = _filtered(f"hybrid:{wc:g}:{wf:g}:{lam:g}", genres, genre_mode, offset)
+    rows = await run_scoring("hybrid", (name, user.id, k, top_n), lambda: cached(
+        user.id, name, k, top_n, model_version(db, "hybrid"),
+        lambda: hybrid(db, user, top_n=top_n, k=k, w_content=wc, w_cf=wf, diversity=lam,
+                       genres=genres, genre_mode=genre_mode, offset=offset)))
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
+
+@router.get("/item", response_model=List[RecoOut])
+async def rec_item(db: Session = Depends(get_read_db), user=Depends(get_current_user_async),
+                   top_n: int = Query(20, ge=1, le=100),
+                   genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                   offset: int = Offset):
+    genres = parse_genre_filter(genre)
+    name = _filtered("item", genres, genre_mode, offset)
+    rows = await run_scoring("item", (name, user.id, top_n), lambda: cached(
+        user.id, name, 0, top_n, model_version(db, "item"),
+        lambda: item_based(db, user, top_n=top_n, genres=genres, genre_mode=genre_mode, offset=offset)))
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
+
+@router.get("/popular", response_model=List[RecoOut])
+async def rec_popular(db: Session = Depends(get_read_db), user=Depends(get_current_user_async),
+                      top_n: int = Query(20, ge=1, le=100),
+                      genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                      year: Optional[int] = None, offset: int = Offset):
+    genres = parse_genre_filter(genre)
+    if len(genres) == 1:  # precomputed per-genre ranking
+        rows = await run_in_threadpool(_popular_unrated, db, user, top_n, genre=genres[0], year=year, offset=offset)
+    else:
+        rows = await run_in_threadpool(_popular_unrated, db, user, top_n, year=year, genres=genres,
+                                       genre_mode=genre_mode, offset=offset)
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
+
+@router.post("/batch", response_model=List[BatchRecoOut])
+async def rec_batch(payload: BatchRecoRequest, db: Session = Depends(get_read_db),
+                    user=Depends(get_current_user_async), service: bool = Depends(batch_service)):
+    authorize_batch(user, payload.user_ids, service)
+    if len(payload.user_ids) > settings.BATCH_MAX_USERS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {settings.BATCH_MAX_USERS} users per batch")
+    key = ("batch", tuple(payload.user_ids), payload.method, payload.top_n, payload.k)
+    recs = await run_scoring("batch", key, lambda: batch_recommend(
+        db, payload.user_ids, method=payload.method, top_n=payload.top_n, k=payload.k))
+    return [
+        BatchRecoOut(user_id=uid, items=[RecoOut(movie_id=i, title=t, score=s) for i, t, s in recs[uid]])
+        for uid in payload.user_ids if uid in recs
+    ]
@@ -4,6 +4,7 @@ from app.database import get_db
 from app.models import User
 from app.schemas import SignupRequest, LoginRequest, TokenResponse
 from app.auth import hash_password, verify_password, create_access_token
+from app.executor import run_hash_sync
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -12,16 +13,16 @@ def signup(payload: SignupRequest, db: Session = Depends(get_db)):
     exists = db.query(User).filter(User.email == payload.email).first()
     if exists:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
-    user = User(email=payload.email, password_hash=hash_password(payload.password))
+    user = User(email=payload.email, password_hash=run_hash_sync(hash_password, payload.password))
     db.add(user)
     db.commit()
-    token = create_access_token(user.email)
+    token = create_access_token(user.email, uid=user.id)
     return TokenResponse(access_token=token)
 
 @router.post("/login", response_model=TokenResponse)
 def login(payload: LoginRequest, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+    if not user or not run_hash_sync(verify_password, payload.password, user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    token = create_access_token(user.email)
+    token = create_access_token(user.email, uid=user.id)
     return TokenResponse(access_token=token)
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from app.database import get_db
-from app.models import User, Movie, Rating
-from app.schemas import MetricsOut
+from app.database import get_db, pool_status
+from app.models import User, Movie, MovieStats
+from app.schemas import MetricsOut, CacheStatsOut
+from app.reco_cache import reco_cache
+from app.auth import user_cache
+from app.content_profile import profile_cache
+from app import executor, instrumentation, model_registry
 
 router = APIRouter(prefix="/api/metrics", tags=["metrics"])
 
@@ -11,10 +16,13 @@ router = APIRouter(prefix="/api/metrics", tags=["metrics"])
 def overview(db: Session = Depends(get_db)):
     total_users = db.query(func.count(User.id)).scalar() or 0
     total_movies = db.query(func.count(Movie.id)).scalar() or 0
-    total_ratings = db.query(func.count(Rating.id)).scalar() or 0
+    total_ratings = db.query(func.sum(MovieStats.rating_count)).scalar() or 0
+    covered = db.query(func.count(MovieStats.movie_id)).scalar() or 0
+    return overview_out(total_users, total_movies, total_ratings, covered)
+
+def overview_out(total_users: int, total_movies: int, total_ratings: int, covered: int) -> MetricsOut:
     avg_ratings_per_user = (total_ratings / total_users) if total_users else 0.0
     # coverage: fraction of movies with at least 1 rating
-    covered = db.query(func.count(func.distinct(Rating.movie_id))).scalar() or 0
     coverage_pct = (covered / total_movies * 100.0) if total_movies else 0.0
     return MetricsOut(
         total_users=total_users,
@@ -23,3 +31,41 @@ def overview(db: Session = Depends(get_db)):
         avg_ratings_per_user=round(avg_ratings_per_user, 3),
         coverage_pct=round(coverage_pct, 2),
     )
+
+@router.get("/cache", response_model=CacheStatsOut)
+def cache_stats():
+    return CacheStatsOut(**reco_cache.stats())
+
+@router.get("/auth")
+def auth_stats():
+    # token -> user resolution cache (app.auth)
+    return user_cache.stats()
+
+@router.get("/profiles")
+def profile_stats():
+    # per-user content profile cache (app.content_profile)
+    return profile_cache.stats()
+
+@router.get("/models")
+def model_stats():
+    # served snapshot per model (version, age, build duration) and the rebuild worker
+    return model_registry.status()
+
+@router.get("/executor")
+def executor_stats():
+    # per-endpoint in-flight/limit/rejection counters of the recommender execution layer
+    return executor.stats()
+
+@router.get("/database")
+def database_stats():
+    # connection pool occupancy of the primary (and replica) engine
+    return pool_status()
+
+@router.get("/latency")
+def latency():
+    # counts, errors, mean and p50/p95/p99 per function, recommender phase and route
+    return instrumentation.snapshot()
+
+@router.get("/prometheus", response_class=PlainTextResponse)
+def prometheus():
+    return PlainTextResponse(instrumentation.render_prometheus(), media_type="text/plain; version=0.0.4")
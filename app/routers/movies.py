@@ -1,56 +1,98 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
+from types import SimpleNamespace
+from typing import List, Literal, Optional, Tuple
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.database import get_db
-from app.models import Movie, Rating
-from app.schemas import MovieOut
+from app.database import get_db, get_read_db
+from app.models import Movie, MovieStats
+from app.recommenders import similar_movies
+from app.schemas import MovieOut, RecoOut
+from app.genres import get_genre_index, parse_genre_filter
+from app.search import decode_cursor, encode_cursor, keyset_page, search_movie_ids
 
 router = APIRouter(prefix="/api/movies", tags=["movies"])
 
+GENRE_IN_LIST_MAX = 2000  # genre filters matching fewer movies become an id IN (...) filter
+
 @router.get("", response_model=List[MovieOut])
 def list_movies(
+    response: Response,
     db: Session = Depends(get_db),
-    q: Optional[str] = Query(None, description="search title"),
+    q: Optional[str] = Query(None, description="full-text search (title + overview), best matches first"),
     year: Optional[int] = None,
-    genre: Optional[str] = None,
+    genre: Optional[List[str]] = Query(None, description="exact genre; repeat or comma-separate for several"),
+    genre_mode: Literal["and", "or"] = Query("and", description="movies with all / any of the genres"),
     page: int = 1,
     size: int = 20,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page (replaces page)"),
 ):
     """
     List / search movies with optional filters and pagination.
     Returns avg rating & rating count for each movie.
+    The next page's cursor is returned in the X-Next-Cursor header.
     """
-    query = db.query(Movie)
+    out, next_cursor = movie_page(db, q, year, parse_genre_filter(genre), genre_mode, page, size, cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return out
+
+@router.get("/{movie_id}/similar", response_model=List[RecoOut])
+def similar(movie_id: int, db: Session = Depends(get_read_db), top_n: int = Query(20, ge=1, le=100)):
+    """Movies like this one: item-item CF neighbours, or the closest by content for unrated movies."""
+    if db.get(Movie, movie_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Movie not found")
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in similar_movies(db, movie_id, top_n)]
+
+def movie_page(db: Session, q: Optional[str], year: Optional[int], genres: List[str], genre_mode: str,
+               page: int, size: int, cursor: Optional[str]) -> Tuple[List[MovieOut], Optional[str]]:
+    """One page of list_movies and the next page's cursor (shared with the async router)."""
+    allowed = get_genre_index(db).mask(genres, genre_mode) if genres else None
+    keep = (lambda mid: mid < len(allowed) and bool(allowed[mid])) if allowed is not None else None
 
-    if q:
-        query = query.filter(Movie.title.ilike(f"%{q}%"))
-    if year:
-        query = query.filter(Movie.year == year)
-    if genre:
-        # allows partial match; e.g., "Action" matches "Action|Sci-Fi"
-        query = query.filter(Movie.genres.ilike(f"%{genre}%"))
+    found = search_movie_ids(db, q, size, cursor=cursor, offset=(page - 1) * size, year=year, keep=keep) if q else None
+    if found is not None:
+        ids, next_cursor = found
+        by_id = {m.id: m for m in db.query(Movie).filter(Movie.id.in_(ids))} if ids else {}
+        movies = [by_id[i] for i in ids if i in by_id]
+    else:
+        query = db.query(Movie)
 
-    # pagination + deterministic order
-    query = query.order_by(Movie.title.asc()).offset((page - 1) * size).limit(size)
+        if q:
+            query = query.filter(Movie.title.ilike(f"%{q}%"))
+        if year:
+            query = query.filter(Movie.year == year)
+        if allowed is not None and allowed.sum() <= GENRE_IN_LIST_MAX:
+            # selective genre filter: fetch exactly those movies
+            query = query.filter(Movie.id.in_(np.flatnonzero(allowed).tolist()))
+            keep = None
+        # pagination + deterministic order; keyset on (title, id) when a cursor is given
+        query = query.order_by(Movie.title.asc(), Movie.id.asc())
 
-    movies = query.all()
+        def fetch(after, n, offset):
+            qq = query
+            if after is not None:
+                qq = qq.filter(or_(Movie.title > after.title, and_(Movie.title == after.title, Movie.id > after.id)))
+            return qq.offset(offset).limit(n).all()
+
+        after = None
+        if cursor:
+            title, last_id = decode_cursor(cursor, "t")
+            after = SimpleNamespace(title=title, id=last_id)
+        movies, last = keyset_page(fetch, size, after=after, skip=0 if cursor else (page - 1) * size,
+                                   keep=(lambda m: keep(m.id)) if keep else None)
+        next_cursor = encode_cursor("t", last.title, last.id) if last is not None else None
 
     out: List[MovieOut] = []
     if not movies:
-        return out
+        return out, next_cursor
 
     ids = [m.id for m in movies]
 
-    # Build mapping: movie_id -> (avg, cnt)
+    # Build mapping: movie_id -> (avg, cnt) from the maintained aggregates
     rows = (
-        db.query(
-            Rating.movie_id,
-            func.avg(Rating.score).label("avg"),
-            func.count(Rating.id).label("cnt"),
-        )
-        .filter(Rating.movie_id.in_(ids))
-        .group_by(Rating.movie_id)
+        db.query(MovieStats.movie_id, MovieStats.avg_rating, MovieStats.rating_count)
+        .filter(MovieStats.movie_id.in_(ids))
         .all()
     )
     agg = {
@@ -72,4 +114,4 @@ def list_movies(
             )
         )
 
-    return out
+    return out, next_cursor
@@ -5,6 +5,11 @@ from sqlalchemy import select
 from app.database import get_db
 from app.auth import get_current_user
 from app.models import Rating, Movie
+from app.ratings_store import ratings_store
+from app.batch import invalidate_precomputed
+from app.item_cf import touch
+from app.movie_stats import apply_rating_delta
+from app.reco_cache import reco_cache
 from app.schemas import RatingCreate, RatingOut
 
 router = APIRouter(prefix="/api/ratings", tags=["ratings"])
@@ -17,11 +22,17 @@ def upsert_rating(payload: RatingCreate, db: Session = Depends(get_db), user=Dep
     # upsert
     rat = db.query(Rating).filter(Rating.user_id == user.id, Rating.movie_id == payload.movie_id).first()
     if rat:
+        apply_rating_delta(db, rat.movie_id, payload.score - rat.score, 0)
         rat.score = payload.score
     else:
         rat = Rating(user_id=user.id, movie_id=payload.movie_id, score=payload.score)
         db.add(rat)
+        apply_rating_delta(db, rat.movie_id, payload.score, 1)
+    invalidate_precomputed(db, user.id)
     db.commit()
+    ratings_store.upsert(user.id, rat.movie_id, rat.score)
+    touch(rat.movie_id)
+    reco_cache.invalidate_user(user.id)
     return RatingOut(id=rat.id, movie_id=rat.movie_id, score=rat.score, title=movie.title)
 
 @router.get("/me", response_model=List[RatingOut])
@@ -41,5 +52,10 @@ def delete_rating(movie_id: int, db: Session = Depends(get_db), user=Depends(get
     if not rat:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Rating not found")
     db.delete(rat)
+    apply_rating_delta(db, movie_id, -rat.score, -1)
+    invalidate_precomputed(db, user.id)
     db.commit()
+    ratings_store.remove(user.id, movie_id)
+    touch(movie_id)
+    reco_cache.invalidate_user(user.id)
     return {"ok": True}
@@ -1,19 +1,130 @@
-from typing import List
-from fastapi import APIRouter, Depends, Query
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.auth import get_current_user
-from app.recommenders import content_based, collaborative_filtering
-from app.schemas import RecoOut
+from app.database import get_read_db
+from app.auth import authorize_batch, batch_service, get_current_user
+from app.recommenders import content_based, collaborative_filtering, hybrid, item_based, matrix_factorization, \
+    model_version, _popular_unrated
+from app.batch import batch_recommend, load_precomputed
+from app.config import settings
+from app.genres import parse_genre_filter
+from app.reco_cache import cached
+from app.executor import run_scoring
+from app.schemas import RecoOut, BatchRecoRequest, BatchRecoOut
 
 router = APIRouter(prefix="/api/recommendations", tags=["recommendations"])
 
+GenreFilter = Query(None, description="only movies of these genres; repeat or comma-separate")
+GenreMode = Query("or", description="movies with any / all of the genres")
+
+Offset = Query(0, ge=0, le=1000, description="skip this many results (next pages of a ranking)")
+
+def _filtered(method: str, genres: List[str], genre_mode: str, offset: int = 0) -> str:
+    # cache/coalescing name of a genre-filtered or paged request (precomputed results are unfiltered)
+    name = f"{method}|{genre_mode}:{','.join(sorted(g.lower() for g in genres))}" if genres else method
+    return f"{name}@{offset}" if offset else name
+
+def _skip(rows, offset: int):
+    # page of precomputed results fetched `offset + top_n` deep; None/[] still mean "compute online"
+    return rows[offset:] if rows else rows
+
 @router.get("/content", response_model=List[RecoOut])
-def rec_content(db: Session = Depends(get_db), user=Depends(get_current_user), top_n: int = Query(20, ge=1, le=100)):
-    rows = content_based(db, user, top_n=top_n)
+async def rec_content(db: Session = Depends(get_read_db), user=Depends(get_current_user), top_n: int = Query(20, ge=1, le=100),
+                      genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                      offset: int = Offset):
+    genres = parse_genre_filter(genre)
+    name = _filtered("content", genres, genre_mode, offset)
+    rows = await run_scoring("content", (name, user.id, top_n), lambda: cached(
+        user.id, name, 0, top_n, model_version(db, "content"),
+        lambda: (not genres and _skip(load_precomputed(db, user.id, "content", offset + top_n), offset))
+        or content_based(db, user, top_n=top_n, genres=genres, genre_mode=genre_mode, offset=offset)))
     return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
 
 @router.get("/cf", response_model=List[RecoOut])
-def rec_cf(db: Session = Depends(get_db), user=Depends(get_current_user), k: int = Query(20, ge=1, le=100), top_n: int = Query(20, ge=1, le=100)):
-    rows = collaborative_filtering(db, user, k=k, top_n=top_n)
+async def rec_cf(db: Session = Depends(get_read_db), user=Depends(get_current_user), k: int = Query(20, ge=1, le=100), top_n: int = Query(20, ge=1, le=100),
+                 genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                 offset: int = Offset):
+    genres = parse_genre_filter(genre)
+    name = _filtered("cf", genres, genre_mode, offset)
+    rows = await run_scoring("cf", (name, user.id, k, top_n), lambda: cached(
+        user.id, name, k, top_n, model_version(db, "cf"),
+        lambda: (not genres and _skip(load_precomputed(db, user.id, "cf", offset + top_n, k=k), offset))
+        or collaborative_filtering(db, user, k=k, top_n=top_n, genres=genres, genre_mode=genre_mode, offset=offset)))
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
+
+@router.get("/mf", response_model=List[RecoOut])
+async def rec_mf(db: Session = Depends(get_read_db), user=Depends(get_current_user), top_n: int = Query(20, ge=1, le=100),
+                 genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                 offset: int = Offset):
+    genres = parse_genre_filter(genre)
+    name = _filtered("mf", genres, genre_mode, offset)
+    rows = await run_scoring("mf", (name, user.id, top_n), lambda: cached(
+        user.id, name, 0, top_n, model_version(db, "mf"),
+        lambda: (not genres and _skip(load_precomputed(db, user.id, "mf", offset + top_n), offset))
+        or matrix_factorization(db, user, top_n=top_n, genres=genres, genre_mode=genre_mode, offset=offset)))
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
+
+def hybrid_params(w_content: Optional[float], w_cf: Optional[float], diversity: Optional[float]) -> tuple:
+    w = (settings.HYBRID_WEIGHT_CONTENT if w_content is None else w_content,
+         settings.HYBRID_WEIGHT_CF if w_cf is None else w_cf,
+         settings.HYBRID_MMR_LAMBDA if diversity is None else diversity)
+    if w[0] + w[1] <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="w_content + w_cf must be positive")
+    return w
+
+@router.get("/hybrid", response_model=List[RecoOut])
+async def rec_hybrid(db: Session = Depends(get_read_db), user=Depends(get_current_user), k: int = Query(20, ge=1, le=100),
+                     top_n: int = Query(20, ge=1, le=100),
+                     w_content: Optional[float] = Query(None, ge=0, description="content weight (HYBRID_WEIGHT_CONTENT)"),
+                     w_cf: Optional[float] = Query(None, ge=0, description="CF weight (HYBRID_WEIGHT_CF)"),
+                     diversity: Optional[float] = Query(None, ge=0, le=1, description="MMR lambda, 1 = no re-ranking"),
+                     genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                     offset: int = Offset):
+    # content + CF blended in one pass (one ratings/catalog load, one hydration query)
+    wc, wf, lam = hybrid_params(w_content, w_cf, diversity)
+    genres = parse_genre_filter(genre)
+    name = _filtered(f"hybrid:{wc:g}:{wf:g}:{lam:g}", genres, genre_mode, offset)
+    rows = await run_scoring("hybrid", (name, user.id, k, top_n), lambda: cached(
+        user.id, name, k, top_n, model_version(db, "hybrid"),
+        lambda: hybrid(db, user, top_n=top_n, k=k, w_content=wc, w_cf=wf, diversity=lam,
+                       genres=genres, genre_mode=genre_mode, offset=offset)))
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
+
+@router.get("/item", response_model=List[RecoOut])
+async def rec_item(db: Session = Depends(get_read_db), user=Depends(get_current_user), top_n: int = Query(20, ge=1, le=100),
+                   genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                   offset: int = Offset):
+    # item-item CF over precomputed neighbour lists (scripts/build_item_cf.py)
+    genres = parse_genre_filter(genre)
+    name = _filtered("item", genres, genre_mode, offset)
+    rows = await run_scoring("item", (name, user.id, top_n), lambda: cached(
+        user.id, name, 0, top_n, model_version(db, "item"),
+        lambda: item_based(db, user, top_n=top_n, genres=genres, genre_mode=genre_mode, offset=offset)))
     return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
+
+@router.get("/popular", response_model=List[RecoOut])
+def rec_popular(db: Session = Depends(get_read_db), user=Depends(get_current_user), top_n: int = Query(20, ge=1, le=100),
+                genre: Optional[List[str]] = GenreFilter, genre_mode: Literal["or", "and"] = GenreMode,
+                year: Optional[int] = None, offset: int = Offset):
+    # cold-start list, optionally within genres and/or the year's bucket (POPULARITY_YEAR_BUCKET)
+    genres = parse_genre_filter(genre)
+    if len(genres) == 1:  # precomputed per-genre ranking
+        rows = _popular_unrated(db, user, top_n, genre=genres[0], year=year, offset=offset)
+    else:
+        rows = _popular_unrated(db, user, top_n, year=year, genres=genres, genre_mode=genre_mode, offset=offset)
+    return [RecoOut(movie_id=i, title=t, score=s) for i, t, s in rows]
+
+@router.post("/batch", response_model=List[BatchRecoOut])
+async def rec_batch(payload: BatchRecoRequest, db: Session = Depends(get_read_db), user=Depends(get_current_user),
+                    service: bool = Depends(batch_service)):
+    authorize_batch(user, payload.user_ids, service)
+    if len(payload.user_ids) > settings.BATCH_MAX_USERS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"At most {settings.BATCH_MAX_USERS} users per batch")
+    key = ("batch", tuple(payload.user_ids), payload.method, payload.top_n, payload.k)
+    recs = await run_scoring("batch", key, lambda: batch_recommend(
+        db, payload.user_ids, method=payload.method, top_n=payload.top_n, k=payload.k))
+    return [
+        BatchRecoOut(user_id=uid, items=[RecoOut(movie_id=i, title=t, score=s) for i, t, s in recs[uid]])
+        for uid in payload.user_ids if uid in recs
+    ]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 
 class SignupRequest(BaseModel):
     email: EmailStr
@@ -47,3 +47,24 @@ class RecoOut(BaseModel):
     movie_id: int
     title: str
     score: float
+
+class BatchRecoRequest(BaseModel):
+    user_ids: List[int] = Field(min_length=1)
+    method: Literal["content", "cf", "mf"] = "cf"
+    k: int = Field(20, ge=1, le=100)
+    top_n: int = Field(20, ge=1, le=100)
+
+class BatchRecoOut(BaseModel):
+    user_id: int
+    items: List[RecoOut]
+
+class CacheStatsOut(BaseModel):
+    backend: str
+    entries: Optional[int]
+    max_entries: Optional[int]
+    ttl_seconds: float
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    invalidations: int
@@ -0,0 +1,206 @@
+import base64
+import difflib
+import json
+import re
+import threading
+import time
+import weakref
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from app.utils import logger, timed
+
+# Full-text movie search over title + overview.
+# SQLite: external-content FTS5 table kept in sync by triggers, bm25 ranking
+# (title weighted higher), fts5vocab for typo correction.
+# Postgres: generated tsvector column with a GIN index, ts_rank_cd ranking.
+# Every query term is a prefix match; a term that matches nothing is
+# widened with close vocabulary words (difflib). Results are paginated by
+# keyset cursors over (score, id), or (title, id) when listing without a
+# query, so deep pages don't pay for OFFSET.
+# Other databases (or SQLite builds without FTS5) fall back to ILIKE.
+
+# engine -> "sqlite" | "postgresql" | None (per engine: two in-memory databases share a URL)
+_backends: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+_pg_vocab: Dict[str, Tuple[float, List[str]]] = {}
+PG_VOCAB_TTL = 600
+
+_SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE movies_fts USING fts5(title, overview, content='movies', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts_vocab USING fts5vocab(movies_fts, 'row')",
+    "CREATE TRIGGER IF NOT EXISTS movies_fts_ai AFTER INSERT ON movies BEGIN "
+    "INSERT INTO movies_fts(rowid, title, overview) VALUES (new.id, new.title, new.overview); END",
+    "CREATE TRIGGER IF NOT EXISTS movies_fts_ad AFTER DELETE ON movies BEGIN "
+    "INSERT INTO movies_fts(movies_fts, rowid, title, overview) VALUES ('delete', old.id, old.title, old.overview); END",
+    "CREATE TRIGGER IF NOT EXISTS movies_fts_au AFTER UPDATE OF title, overview ON movies BEGIN "
+    "INSERT INTO movies_fts(movies_fts, rowid, title, overview) VALUES ('delete', old.id, old.title, old.overview); "
+    "INSERT INTO movies_fts(rowid, title, overview) VALUES (new.id, new.title, new.overview); END",
+    "INSERT INTO movies_fts(movies_fts) VALUES ('rebuild')",  # index movies inserted before the table existed
+]
+
+_PG_DDL = [
+    "ALTER TABLE movies ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(overview, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_movies_search_tsv ON movies USING gin (search_tsv)",
+]
+
+def _engine_key(db: Session) -> str:
+    return db.get_bind().url.render_as_string(hide_password=True)
+
+def ensure_search_index(db: Session) -> Optional[str]:
+    """Create the search index for this database on first use; returns the backend name or None."""
+    bind = db.get_bind()
+    key = getattr(bind, "engine", bind)
+    if key in _backends:
+        return _backends[key]
+    # another request is creating it: use ILIKE meanwhile rather than block (async routes run this on
+    # the event loop thread); app startup creates it before the first request
+    if not _lock.acquire(blocking=False):
+        return None
+    try:
+        if key in _backends:
+            return _backends[key]
+        backend = None
+        try:
+            with bind.begin() as conn:
+                if bind.dialect.name == "sqlite":
+                    exists = conn.execute(text(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'movies_fts'")).first()
+                    if not exists:
+                        for stmt in _SQLITE_DDL:
+                            conn.execute(text(stmt))
+                        logger.info("[SEARCH] created FTS5 index movies_fts")
+                    backend = "sqlite"
+                elif bind.dialect.name == "postgresql":
+                    for stmt in _PG_DDL:
+                        conn.execute(text(stmt))
+                    backend = "postgresql"
+        except DBAPIError as e:  # e.g. SQLite compiled without FTS5
+            logger.warning(f"[SEARCH] full-text index unavailable ({e.orig}), using ILIKE search")
+        _backends[key] = backend
+        return backend
+    finally:
+        _lock.release()
+
+def encode_cursor(kind: str, value, last_id: int) -> str:
+    raw = json.dumps([kind, value, last_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, kind: str) -> Tuple[object, int]:
+    try:
+        k, value, last_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if k != kind:
+            raise ValueError(k)
+        return value, int(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def _terms(q: str) -> List[str]:
+    return re.findall(r"\w+", q.lower())
+
+def _sqlite_alternatives(db: Session, term: str) -> List[str]:
+    hit = db.execute(text("SELECT 1 FROM movies_fts_vocab WHERE term >= :lo AND term < :hi LIMIT 1"),
+                     {"lo": term, "hi": term + "\uffff"}).first()
+    if hit or len(term) < 3:
+        return []
+    # typo: compare against vocabulary words sharing the first letter and of similar length
+    words = [w for (w,) in db.execute(
+        text("SELECT term FROM movies_fts_vocab WHERE term >= :lo AND term < :hi AND length(term) BETWEEN :a AND :b"),
+        {"lo": term[0], "hi": term[0] + "\uffff", "a": len(term) - 2, "b": len(term) + 2})]
+    return difflib.get_close_matches(term, words, n=3, cutoff=0.75)
+
+def _pg_alternatives(db: Session, term: str) -> List[str]:
+    key = _engine_key(db)
+    built, words = _pg_vocab.get(key, (0.0, []))
+    if time.time() - built > PG_VOCAB_TTL:
+        words = sorted(w for (w,) in db.execute(text("SELECT word FROM ts_stat('SELECT search_tsv FROM movies')")))
+        _pg_vocab[key] = (time.time(), words)
+    if len(term) < 3 or any(w.startswith(term) for w in words):
+        return []
+    return difflib.get_close_matches(term, [w for w in words if w[:1] == term[:1]], n=3, cutoff=0.75)
+
+def keyset_page(fetch: Callable[[Optional[tuple], int, int], list], size: int, after: Optional[tuple] = None,
+                skip: int = 0, keep: Optional[Callable[[tuple], bool]] = None) -> Tuple[list, Optional[tuple]]:
+    """`size` rows of fetch(after_row, n, offset) (keyset order) passing `keep`, after skipping `skip` of them.
+
+    Returns the rows and the last row consumed (the next page starts after it), or None when exhausted.
+    """
+    if keep is None:
+        rows = fetch(after, size, skip)
+        return rows, rows[-1] if len(rows) == size else None
+    n = max(size * 2, 64)
+    out = []
+    while True:
+        rows = fetch(after, n, 0)
+        for row in rows:
+            after = row
+            if keep(row):
+                if skip:
+                    skip -= 1
+                    continue
+                out.append(row)
+                if len(out) == size:
+                    return out, row
+        if len(rows) < n:
+            return out, None
+
+@timed("movie_search")
+def search_movie_ids(db: Session, q: str, limit: int, cursor: Optional[str] = None, offset: int = 0,
+                     year: Optional[int] = None, keep: Optional[Callable[[int], bool]] = None
+                     ) -> Optional[Tuple[List[int], Optional[str]]]:
+    """Best-first movie ids for `q` and the cursor of the next page; None if there is no full-text index.
+
+    `keep(movie_id)` filters results in memory (e.g. the genre bitmap); pages are still filled.
+    """
+    backend = ensure_search_index(db)
+    terms = _terms(q)
+    if backend is None or not terms:
+        return None
+    params = {"year": year}
+    if backend == "sqlite":
+        groups = []
+        for t in terms:
+            alts = [f'"{t}"*'] + [f'"{a}"' for a in _sqlite_alternatives(db, t)]
+            groups.append(alts[0] if len(alts) == 1 else "(" + " OR ".join(alts) + ")")
+        params["q"] = " AND ".join(groups)
+        sql = """
+            SELECT id, score FROM (
+                SELECT movies.id AS id, bm25(movies_fts, 10.0, 1.0) AS score
+                FROM movies_fts JOIN movies ON movies.id = movies_fts.rowid
+                WHERE movies_fts MATCH :q AND (:year IS NULL OR movies.year = :year)
+            )
+            WHERE :after_score IS NULL OR score > :after_score OR (score = :after_score AND id > :after_id)
+            ORDER BY score, id LIMIT :limit OFFSET :offset"""
+    else:
+        groups = []
+        for t in terms:
+            alts = [f"{t}:*"] + _pg_alternatives(db, t)
+            groups.append("(" + " | ".join(alts) + ")")
+        params["q"] = " & ".join(groups)
+        sql = """
+            SELECT id, score FROM (
+                SELECT id, -ts_rank_cd(search_tsv, query) AS score
+                FROM movies, to_tsquery('simple', :q) AS query
+                WHERE search_tsv @@ query AND (CAST(:year AS INTEGER) IS NULL OR year = :year)
+            ) s
+            WHERE CAST(:after_score AS DOUBLE PRECISION) IS NULL OR score > :after_score
+               OR (score = :after_score AND id > :after_id)
+            ORDER BY score, id LIMIT :limit OFFSET :offset"""
+
+    def fetch(after, n, off):
+        return [tuple(r) for r in db.execute(text(sql), dict(
+            params, limit=n, offset=off, after_score=after[1] if after else None, after_id=after[0] if after else 0))]
+
+    after = None
+    if cursor:
+        score, last_id = decode_cursor(cursor, "s")
+        after = (last_id, score)
+    rows, last = keyset_page(fetch, limit, after=after, skip=0 if cursor else max(offset, 0),
+                             keep=(lambda row: keep(row[0])) if keep else None)
+    return [r[0] for r in rows], encode_cursor("s", last[1], last[0]) if last else None
@@ -1,19 +1,22 @@
 import time
 import logging
 from functools import wraps
+from app.instrumentation import track_function
 
 logger = logging.getLogger("app")
 logging.basicConfig(level=logging.INFO)
 
 def timed(name: str):
+    # latency/count/errors go to app.instrumentation (/api/metrics/latency, /api/metrics/prometheus)
     def dec(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             t0 = time.perf_counter()
             try:
-                return fn(*args, **kwargs)
+                with track_function(name):
+                    return fn(*args, **kwargs)
             finally:
                 dt = (time.perf_counter() - t0) * 1000
-                logger.info(f"[TIMING] {name}: {dt:.2f} ms")
+                logger.debug(f"[TIMING] {name}: {dt:.2f} ms")
         return wrapper
     return dec
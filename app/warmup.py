@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from app.utils import logger
+
+# Startup warm-up: loads what the first requests would otherwise load on
+# demand - the ratings store, popularity ranking, genre and search indexes,
+# the TF-IDF model and the item-item / ALS snapshots (movie_stats is checked
+# by the lifespan itself).
+# STARTUP_WARMUP=blocking runs it before the app accepts requests,
+# background on a thread once it does (liveness checks pass immediately,
+# /readyz turns ready when it is done), off leaves everything to first use.
+# The recommender modules are imported here, not by app.main, so a worker
+# only pays for scikit-learn once a model is actually loaded.
+
+def _steps() -> List[Tuple[str, Callable[[Session], object]]]:
+    from app.content_model import get_content_model
+    from app.genres import get_genre_index
+    from app.item_cf import load_current as load_item_cf
+    from app.mf import load_current as load_mf
+    from app.popularity import get_popularity
+    from app.ratings_store import ratings_store
+    from app.search import ensure_search_index
+    return [
+        ("ratings_store", ratings_store.load),
+        ("popularity", get_popularity),
+        ("genre_index", get_genre_index),
+        ("search_index", ensure_search_index),
+        ("content_model", get_content_model),  # loaded (or built) before the first content request
+        ("item_cf", lambda db: load_item_cf()),
+        ("mf", lambda db: load_mf()),
+    ]
+
+class Warmup:
+    def __init__(self):
+        self.mode = ""
+        self.state = "pending"  # -> running -> done; "skipped" with STARTUP_WARMUP=off
+        self.steps: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        # failed steps are retried lazily by the requests that need them
+        return self.state in ("done", "skipped")
+
+    def start(self, mode: str, session_factory: Callable[[], Session]) -> None:
+        """`blocking` runs the warm-up here; `background` on a daemon thread; `off` skips it."""
+        self.mode = mode
+        if mode == "off":
+            self.state = "skipped"
+        elif mode == "background":
+            self.state = "running"
+            self._thread = threading.Thread(target=self.run, args=(session_factory,), name="warmup", daemon=True)
+            self._thread.start()
+        else:
+            self.run(session_factory)
+
+    def run(self, session_factory: Callable[[], Session]) -> None:
+        self.state, self.started_at = "running", time.time()
+        db = session_factory()
+        try:
+            for name, step in _steps():
+                t0 = time.perf_counter()
+                try:
+                    step(db)
+                except Exception as e:
+                    db.rollback()
+                    self.errors[name] = repr(e)
+                    logger.exception(f"[WARMUP] {name} failed")
+                self.steps[name] = round(time.perf_counter() - t0, 3)
+        finally:
+            db.close()
+        self.state, self.finished_at = "done", time.time()
+        logger.info(f"[WARMUP] done in {self.finished_at - self.started_at:.2f}s: {self.steps}")
+
+    def status(self) -> dict:
+        return {"mode": self.mode, "state": self.state, "steps": self.steps, "errors": self.errors,
+                "seconds": round(self.finished_at - self.started_at, 3) if self.finished_at else None}
+
+warmup = Warmup()
@@ -0,0 +1,138 @@
+"""Sync vs async request path: the same API served by one uvicorn worker with
+ASYNC_DB=0 and ASYNC_DB=1, driven by many concurrent clients.
+
+    python -m benchmarks.run --preset small --requests 1      # load ./bench/bench.db once
+    python -m benchmarks.async_compare --db sqlite:///./bench/bench.db --concurrency 64
+
+I/O-bound endpoints only (listing, search, ratings, overview, popular): the
+recommenders' scoring is CPU-bound and runs in the scoring pool either way.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.report import summarize
+
+ENDPOINTS = ("movies", "search", "my_ratings", "overview", "popular")
+
+def serve(db: str, async_mode: bool, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=db, ASYNC_DB="1" if async_mode else "0", RECO_CACHE_ENABLED="0")
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--workers", "1", "--log-level", "warning"], env=env)
+
+def wait_ready(url: str, proc: subprocess.Popen, timeout: float = 300.0) -> None:
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server exited with {proc.returncode}")
+        try:
+            if httpx.get(url + "/api/metrics/cache", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"{url} not ready after {timeout:.0f}s")
+
+async def drive(url: str, request: Callable[[int], tuple], requests: int, concurrency: int) -> dict:
+    """`concurrency` clients issue `requests` calls back to back; request(i) -> (path, params, headers)."""
+    import httpx
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                path, params, headers = request(i)
+                t0 = time.perf_counter()
+                try:
+                    ok = (await client.get(path, params=params, headers=headers)).status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - t0)
+                errors += not ok
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+    out = summarize(latencies)
+    out.update(requests=requests, concurrency=concurrency, errors=errors,
+               throughput_rps=round(requests / wall, 2) if wall else 0.0)
+    return out
+
+def requests_for(db_url: str, seed: int = 0) -> Dict[str, Callable[[int], tuple]]:
+    os.environ["DATABASE_URL"] = db_url
+    from sqlalchemy import func
+    from app.auth import create_access_token
+    from app.database import SessionLocal
+    from app.models import Movie, User
+
+    db = SessionLocal()
+    try:
+        n_movies = db.query(func.count(Movie.id)).scalar() or 1
+        users = db.query(User.id, User.email).order_by(User.id).limit(200).all()
+        terms = [t.split()[0][:4] for (t,) in db.query(Movie.title).limit(50)]
+    finally:
+        db.close()
+    if not users:
+        raise SystemExit("no users in the database; load a dataset first")
+    tokens = [{"Authorization": f"Bearer {create_access_token(e, uid=uid)}"} for uid, e in users]
+    pages = max(1, n_movies // 20)
+    return {
+        "movies": lambda i: ("/api/movies", {"page": i % pages + 1}, None),
+        "search": lambda i: ("/api/movies", {"q": terms[i % len(terms)]}, None),
+        "my_ratings": lambda i: ("/api/ratings/me", None, tokens[i % len(tokens)]),
+        "overview": lambda i: ("/api/metrics/overview", None, None),
+        "popular": lambda i: ("/api/recommendations/popular", None, tokens[i % len(tokens)]),
+    }
+
+def to_markdown(results: Dict[str, Dict[str, dict]]) -> str:
+    lines = ["| endpoint | mode | req/s | p50 ms | p95 ms | p99 ms | errors |", "|---|---|---:|---:|---:|---:|---:|"]
+    for name in ENDPOINTS:
+        for mode in ("sync", "async"):
+            r = results.get(mode, {}).get(name)
+            if r:
+                lines.append(f"| {name} | {mode} | {r['throughput_rps']} | {r['p50_ms']} | {r['p95_ms']} | "
+                             f"{r['p99_ms']} | {r['errors']} |")
+    return "\n".join(lines) + "\n"
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--db", default="sqlite:///./bench/bench.db")
+    p.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    p.add_argument("--requests", type=int, default=1000)
+    p.add_argument("--concurrency", type=int, default=64)
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--modes", default="sync,async")
+    p.add_argument("--out", help="write the results as JSON here")
+    args = p.parse_args(argv)
+
+    calls = requests_for(args.db)
+    url = f"http://127.0.0.1:{args.port}"
+    results: Dict[str, Dict[str, dict]] = {}
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        proc = serve(args.db, mode == "async", args.port)
+        try:
+            wait_ready(url, proc)
+            for name in [e.strip() for e in args.endpoints.split(",") if e.strip()]:
+                asyncio.run(drive(url, calls[name], min(20, args.requests), args.concurrency))  # warm-up
+                r = asyncio.run(drive(url, calls[name], args.requests, args.concurrency))
+                results.setdefault(mode, {})[name] = r
+                print(f"{mode} {name}: {r['throughput_rps']} req/s, p50 {r['p50_ms']} ms, p95 {r['p95_ms']} ms")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+    print(to_markdown(results))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
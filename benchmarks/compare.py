@@ -0,0 +1,29 @@
+"""Compare two benchmark reports: python -m benchmarks.compare base.json new.json"""
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "peak_rss_mb")
+
+def _delta(old, new):
+    if old in (None, 0) or new is None:
+        return ""
+    return f"{(new - old) / old * 100:+.1f}%"
+
+def compare(base: dict, new: dict) -> str:
+    lines = [f"# {base['commit']} -> {new['commit']}", "",
+             "| scenario | " + " | ".join(METRICS) + " |", "|---|" + "---:|" * len(METRICS)]
+    for name in sorted(set(base["scenarios"]) | set(new["scenarios"])):
+        a, b = base["scenarios"].get(name, {}), new["scenarios"].get(name, {})
+        cells = [f"{a.get(m)} -> {b.get(m)} ({_delta(a.get(m), b.get(m))})" for m in METRICS]
+        lines.append(f"| {name} | " + " | ".join(cells) + " |")
+    return "\n".join(lines) + "\n"
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        raise SystemExit(__doc__)
+    with open(argv[0], encoding="utf-8") as f, open(argv[1], encoding="utf-8") as g:
+        print(compare(json.load(f), json.load(g)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+from typing import Iterator, List, Tuple
+
+import numpy as np
+from sqlalchemy import insert, text
+from sqlalchemy.engine import Engine
+from app.models import Movie, Rating, User
+
+# Seeded synthetic data at production scale. Item popularity and user
+# activity follow power laws (a few blockbusters / heavy raters, long tail),
+# which is what makes CF neighbourhoods and popularity queries expensive.
+
+GENRES = ["Action", "Adventure", "Animation", "Comedy", "Crime", "Documentary", "Drama", "Family",
+          "Fantasy", "History", "Horror", "Music", "Mystery", "Romance", "Sci-Fi", "Thriller", "War", "Western"]
+_SYLLABLES = ["ka", "lo", "mi", "ra", "to", "ven", "shi", "dor", "el", "qua", "zen", "bar", "nu", "ith", "or", "pa"]
+
+def _vocabulary(size: int, rng: np.random.Generator) -> np.ndarray:
+    words = {"".join(rng.choice(_SYLLABLES, size=rng.integers(2, 4))) for _ in range(size * 3)}
+    return np.array(sorted(words)[:size])
+
+def _power_law(n: int, exponent: float) -> np.ndarray:
+    w = 1.0 / np.arange(1, n + 1) ** exponent
+    return w / w.sum()
+
+def synth_movies(n_movies: int, seed: int = 0, chunk: int = 50_000) -> Iterator[List[dict]]:
+    """Movie rows (ids 1..n_movies) in chunks; overviews draw Zipf-distributed words."""
+    rng = np.random.default_rng(seed)
+    vocab = _vocabulary(4000, rng)
+    word_p = _power_law(len(vocab), 1.1)
+    for start in range(1, n_movies + 1, chunk):
+        n = min(chunk, n_movies + 1 - start)
+        years = rng.integers(1930, 2025, size=n)
+        n_genres = rng.integers(1, 4, size=n)
+        title_words = rng.choice(vocab, size=(n, 3))
+        rows = []
+        for i in range(n):
+            genres = rng.choice(GENRES, size=n_genres[i], replace=False)
+            overview = " ".join(rng.choice(vocab, size=rng.integers(15, 40), p=word_p))
+            rows.append({"id": start + i, "title": " ".join(title_words[i, :rng.integers(1, 4)]).title(),
+                         "year": int(years[i]), "genres": "|".join(genres), "overview": overview})
+        yield rows
+
+def synth_ratings(n_users: int, n_movies: int, n_ratings: int, seed: int = 0,
+                  item_exponent: float = 0.9, user_exponent: float = 0.8) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Unique (user_id, movie_id, score) triples; ids are 1-based, popular ids are shuffled over the catalog."""
+    n_ratings = min(n_ratings, n_users * n_movies)
+    rng = np.random.default_rng(seed + 1)
+    item_p = _power_law(n_movies, item_exponent)[rng.permutation(n_movies)]
+    user_p = _power_law(n_users, user_exponent)[rng.permutation(n_users)]
+    keys = np.empty(0, dtype=np.int64)
+    while len(keys) < n_ratings:
+        # oversample with replacement and drop duplicate pairs until there are enough
+        need = int((n_ratings - len(keys)) * 1.2) + 1000
+        u = rng.choice(n_users, size=need, p=user_p)
+        m = rng.choice(n_movies, size=need, p=item_p)
+        keys = np.unique(np.concatenate([keys, u.astype(np.int64) * n_movies + m]))
+    keys = rng.permutation(keys)[:n_ratings]
+    users, movies = keys // n_movies, keys % n_movies
+    # score = 3 + user bias + item quality + noise, clipped to 1..5
+    user_bias = rng.normal(0, 0.5, n_users)
+    quality = rng.normal(0, 0.8, n_movies)
+    scores = np.clip(np.rint(3 + user_bias[users] + quality[movies] + rng.normal(0, 0.8, n_ratings)), 1, 5)
+    return (users + 1).astype(np.int32), (movies + 1).astype(np.int32), scores.astype(np.int8)
+
+def bulk_load(engine: Engine, n_movies: int, n_users: int, n_ratings: int, seed: int = 0,
+              chunk: int = 50_000, password_hash: str = "") -> dict:
+    """Create and fill the tables with Core multi-row inserts; returns row counts."""
+    from app.database import Base
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    users, movies, scores = synth_ratings(n_users, n_movies, n_ratings, seed)
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("PRAGMA synchronous=OFF"))
+        for rows in synth_movies(n_movies, seed, chunk):
+            conn.execute(insert(Movie.__table__), rows)
+            conn.commit()
+        for start in range(0, n_users, chunk):
+            ids = range(start + 1, min(start + chunk, n_users) + 1)
+            conn.execute(insert(User.__table__), [{"id": i, "email": f"bench{i}@example.com", "password_hash": password_hash}
+                                        for i in ids])
+            conn.commit()
+        for start in range(0, len(users), chunk):
+            end = start + chunk
+            conn.execute(insert(Rating.__table__), [{"user_id": int(u), "movie_id": int(m), "score": int(s)}
+                                          for u, m, s in zip(users[start:end], movies[start:end], scores[start:end])])
+            conn.commit()
+        if engine.dialect.name == "sqlite":
+            from app.config import settings
+            conn.execute(text(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}"))  # pooled connection
+    from app.database import SessionLocal
+    from app.movie_stats import rebuild_movie_stats
+    db = SessionLocal(bind=engine)
+    try:
+        rebuild_movie_stats(db)
+    finally:
+        db.close()
+    return {"movies": n_movies, "users": n_users, "ratings": int(len(users))}
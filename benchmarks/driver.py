@@ -0,0 +1,47 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from benchmarks.report import summarize
+
+# Closed-loop load driver: `concurrency` workers issue `requests` calls
+# back to back; call(i) gets the request number so scenarios can rotate
+# through users/pages deterministically.
+
+def run_load(call: Callable[[int], object], requests: int = 200, concurrency: int = 8, warmup: int = 5) -> dict:
+    for i in range(min(warmup, requests)):
+        call(i)
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        nonlocal errors
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            t0 = time.perf_counter()
+            ok = True
+            try:
+                result = call(i)
+                ok = getattr(result, "status_code", 200) < 400
+            except Exception:
+                ok = False
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt)
+                errors += not ok
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for f in [pool.submit(worker) for _ in range(concurrency)]:
+            f.result()
+    wall = time.perf_counter() - t0
+    out = summarize(latencies)
+    out.update(requests=requests, concurrency=concurrency, errors=errors,
+               throughput_rps=round(requests / wall, 2) if wall else 0.0)
+    return out
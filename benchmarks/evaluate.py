@@ -0,0 +1,341 @@
+"""Offline evaluation: ranking quality and serving cost of every recommender on a train/test split
+of the ratings table.
+
+    python -m benchmarks.evaluate --db sqlite:///./bench/bench.db --split temporal --test-fraction 0.2
+    python -m benchmarks.evaluate --methods content,cf --variant ann:CONTENT_ANN=1,ANN_MIN_MOVIES=0 \\
+        --variant tfidf2k:TFIDF_MAX_FEATURES=2000 --variant k50:k=50
+
+Each user with at least --min-ratings ratings holds out --test-fraction of them (the latest ones, or a
+seeded random sample); the rest are copied with the catalog into a training database the models are built
+from. Every variant (settings overrides, `k=` sets the CF neighbourhood size) builds its own snapshots
+and is scored over all test users by --workers processes. Reported per variant and method: precision,
+recall and NDCG at --top-n (held-out ratings >= --relevant are the relevant items), catalog coverage,
+RMSE of the predicted ratings (cf, mf), per-user latency, allocation per call, worker RSS and the first
+call's import + model load time.
+Writes eval-<commit>-<timestamp>.json/.md to --out.
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from benchmarks.report import git_commit, summarize
+
+METHODS = ("content", "cf", "item", "mf", "hybrid", "popular")
+RATING_PREDICTORS = ("cf", "mf")
+
+def split_ratings(users: np.ndarray, test_fraction: float, mode: str = "temporal", min_ratings: int = 5,
+                  seed: int = 0) -> np.ndarray:
+    """Test mask over rating rows given in (user, time) order: per user the last (temporal) or a random
+    ceil(test_fraction * n) ratings, always leaving one in train; users under min_ratings stay in train."""
+    n = len(users)
+    key = np.arange(n) if mode == "temporal" else np.random.default_rng(seed).random(n)
+    order = np.lexsort((key, users))
+    starts = np.r_[0, np.flatnonzero(np.diff(users[order])) + 1] if n else np.empty(0, dtype=np.int64)
+    counts = np.diff(np.r_[starts, n])
+    pos = np.arange(n) - np.repeat(starts, counts)
+    n_test = np.where(counts >= min_ratings, np.ceil(counts * test_fraction).astype(np.int64), 0)
+    n_test = np.minimum(n_test, counts - 1)
+    test = np.zeros(n, dtype=bool)
+    test[order] = pos >= np.repeat(counts - n_test, counts)
+    return test
+
+def ranking_metrics(recommended: Sequence[int], relevant: Set[int], k: int) -> Tuple[float, float, float]:
+    """(precision@k, recall@k, NDCG@k) with binary relevance."""
+    hits = [1.0 if m in relevant else 0.0 for m in recommended[:k]]
+    dcg = sum(h / math.log2(i + 2) for i, h in enumerate(hits))
+    idcg = sum(1.0 / math.log2(i + 2) for i in range(min(len(relevant), k)))
+    return sum(hits) / k, sum(hits) / len(relevant), dcg / idcg
+
+# -------- training database --------
+
+def prepare(source_url: str, train_path: str, args) -> Tuple[Dict[int, Dict[int, int]], dict]:
+    """Copy the catalog, users and train ratings to a fresh SQLite database; returns the held-out
+    ratings per user and the split summary."""
+    from sqlalchemy import create_engine, func, insert, select
+    from sqlalchemy.orm import Session
+    from app.database import init_db
+    from app.models import Movie, Rating, User
+    from app.movie_stats import rebuild_movie_stats
+
+    if os.path.exists(train_path):
+        os.remove(train_path)
+    src = create_engine(source_url, future=True)
+    dst = create_engine(f"sqlite:///{train_path}", future=True)
+    init_db(dst)
+    ts = func.coalesce(Rating.updated_at, Rating.created_at)
+    with src.connect() as s:
+        rows = s.execute(select(Rating.user_id, Rating.movie_id, Rating.score, Rating.created_at, Rating.updated_at)
+                         .order_by(Rating.user_id, ts, Rating.id)).all()
+        users = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        test = split_ratings(users, args.test_fraction, args.split, args.min_ratings, args.seed)
+        with dst.begin() as d:
+            for table in (Movie.__table__, User.__table__):
+                result = s.execution_options(yield_per=20_000).execute(select(table))
+                for part in result.mappings().partitions():
+                    d.execute(insert(table), [dict(r) for r in part])
+            cols = ("user_id", "movie_id", "score", "created_at", "updated_at")
+            train = [dict(zip(cols, r)) for r, t in zip(rows, test) if not t]
+            for i in range(0, len(train), 20_000):
+                d.execute(insert(Rating.__table__), train[i:i + 20_000])
+    with Session(dst) as db:
+        rebuild_movie_stats(db)
+        n_movies = db.query(func.count(Movie.id)).scalar()
+    held_out: Dict[int, Dict[int, int]] = {}
+    for r in (r for r, t in zip(rows, test) if t):
+        held_out.setdefault(int(r[0]), {})[int(r[1])] = int(r[2])
+    if args.max_users and len(held_out) > args.max_users:
+        keep = np.random.default_rng(args.seed).choice(sorted(held_out), args.max_users, replace=False)
+        held_out = {int(u): held_out[int(u)] for u in keep}
+    summary = {"split": args.split, "test_fraction": args.test_fraction, "min_ratings": args.min_ratings,
+               "ratings": len(rows), "train_ratings": len(train), "test_ratings": int(test.sum()),
+               "test_users": len(held_out), "movies": n_movies}
+    src.dispose()
+    dst.dispose()
+    return held_out, summary
+
+# -------- worker processes (spawned with the variant's environment) --------
+
+def _init(env: Dict[str, str]) -> None:
+    os.environ.update(env)  # before anything imports app.config
+
+def _build_models(methods: Sequence[str]) -> Dict[str, float]:
+    """Snapshots the variant's recommenders serve from; seconds per model."""
+    from app import item_cf, mf
+    from app.content_model import build_content_model
+    from app.database import SessionLocal
+    db = SessionLocal()
+    out = {}
+    try:
+        steps = [("content", lambda: build_content_model(db))]
+        if "item" in methods:
+            steps.append(("item", lambda: item_cf.build_snapshot(db, workers=1)))
+        if "mf" in methods:
+            steps.append(("mf", lambda: mf.build_snapshot(db)))
+        for name, step in steps:
+            t0 = time.perf_counter()
+            step()
+            out[name] = round(time.perf_counter() - t0, 3)
+    finally:
+        db.close()
+    return out
+
+def _recommend(method: str, db, user, top_n: int, k: int):
+    from app import recommenders
+    if method == "content":
+        return recommenders.content_based(db, user, top_n=top_n)
+    if method == "cf":
+        return recommenders.collaborative_filtering(db, user, k=k, top_n=top_n)
+    if method == "item":
+        return recommenders.item_based(db, user, top_n=top_n)
+    if method == "mf":
+        return recommenders.matrix_factorization(db, user, top_n=top_n)
+    if method == "hybrid":
+        return recommenders.hybrid(db, user, top_n=top_n, k=k)
+    return recommenders._popular_unrated(db, user, top_n)
+
+def _predicted(method: str, db, user_id: int, movie_ids: List[int], k: int) -> List[Optional[float]]:
+    """Predicted ratings of the held-out movies (None where the model knows nothing)."""
+    from app.mf import get_mf_model
+    from app.ratings_store import get_ratings_store
+    store = get_ratings_store(db)
+    if method == "cf":
+        M = store.matrix()
+        if user_id not in M.u_index:
+            return [None] * len(movie_ids)
+        preds = M.predict_user(M.u_index[user_id], k=k)
+        return [float(preds[M.m_index[m]]) if m in M.m_index else None for m in movie_ids]
+    model = get_mf_model()
+    vec = model.user_vector(user_id, store.user_ratings(user_id)) if model is not None else None
+    if vec is None:
+        return [None] * len(movie_ids)
+    return [float(model.V[model.i_index[m]] @ vec + model.mean) if m in model.i_index else None for m in movie_ids]
+
+def _evaluate(method: str, users: List[Tuple[int, Dict[int, int]]], top_n: int, k: int, relevant: int,
+              memory_sample: int) -> dict:
+    import tracemalloc
+    from types import SimpleNamespace
+    from app.database import SessionLocal
+    db = SessionLocal()
+    out = {"latencies": [], "alloc_mb": [], "recommended": set(), "ranked": 0, "precision": 0.0, "recall": 0.0,
+           "ndcg": 0.0, "sq_err": 0.0, "predicted": 0, "held_out": 0}
+    try:
+        t0 = time.perf_counter()
+        _recommend(method, db, SimpleNamespace(id=users[0][0]), top_n, k)  # loads the models / store
+        out["load_s"] = time.perf_counter() - t0
+        started = time.perf_counter()
+        for uid, test in users:
+            user = SimpleNamespace(id=uid)
+            t0 = time.perf_counter()
+            recs = _recommend(method, db, user, top_n, k)
+            out["latencies"].append(time.perf_counter() - t0)
+            ids = [m for m, _, _ in recs]
+            out["recommended"].update(ids)
+            liked = {m for m, s in test.items() if s >= relevant}
+            if liked:
+                p, r, n = ranking_metrics(ids, liked, top_n)
+                out["ranked"] += 1
+                out["precision"] += p
+                out["recall"] += r
+                out["ndcg"] += n
+            if method in RATING_PREDICTORS:
+                movies = list(test)
+                for m, pred in zip(movies, _predicted(method, db, uid, movies, k)):
+                    if pred is not None:
+                        out["sq_err"] += (min(max(pred, 1.0), 5.0) - test[m]) ** 2
+                        out["predicted"] += 1
+                out["held_out"] += len(movies)
+        out["busy_s"] = time.perf_counter() - started
+        # allocation per call, in a separate pass: tracing slows the timed calls down
+        tracemalloc.start()
+        for uid, _ in users[:memory_sample]:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            _recommend(method, db, SimpleNamespace(id=uid), top_n, k)
+            out["alloc_mb"].append((tracemalloc.get_traced_memory()[1] - base) / (1 << 20))
+        tracemalloc.stop()
+    finally:
+        db.close()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    out["rss_mb"] = rss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+    return out
+
+def _merge(parts: List[dict], n_movies: int, workers: int) -> dict:
+    ranked = sum(p["ranked"] for p in parts)
+    predicted = sum(p["predicted"] for p in parts)
+    held_out = sum(p["held_out"] for p in parts)
+    latencies = [x for p in parts for x in p["latencies"]]
+    alloc = [x for p in parts for x in p["alloc_mb"]]
+    lat = summarize(latencies)
+    busy = sum(p["busy_s"] for p in parts) / min(workers, len(parts))  # spawn and model loads excluded
+    return {
+        "users": len(latencies), "ranked_users": ranked,
+        "precision": round(sum(p["precision"] for p in parts) / ranked, 4) if ranked else None,
+        "recall": round(sum(p["recall"] for p in parts) / ranked, 4) if ranked else None,
+        "ndcg": round(sum(p["ndcg"] for p in parts) / ranked, 4) if ranked else None,
+        "coverage": round(len(set().union(*(p["recommended"] for p in parts))) / max(n_movies, 1), 4),
+        "rmse": round(math.sqrt(sum(p["sq_err"] for p in parts) / predicted), 4) if predicted else None,
+        "rmse_coverage": round(predicted / held_out, 4) if held_out else None,
+        "p50_ms": lat["p50_ms"], "p95_ms": lat["p95_ms"], "mean_ms": lat["mean_ms"],
+        "users_per_s": round(len(latencies) / busy, 1) if busy else None,
+        "alloc_mb_mean": round(float(np.mean(alloc)), 2) if alloc else None,
+        "alloc_mb_max": round(float(np.max(alloc)), 2) if alloc else None,
+        "load_s": round(max(p["load_s"] for p in parts), 3),
+        "worker_rss_mb": round(max(p["rss_mb"] for p in parts), 1),
+    }
+
+def parse_variant(spec: str) -> Tuple[str, Dict[str, str], Dict[str, int]]:
+    """"name:KEY=VAL,k=50" -> (name, settings overrides, recommender params)."""
+    name, _, assignments = spec.partition(":")
+    env, params = {}, {}
+    for item in filter(None, assignments.split(",")):
+        key, _, value = item.partition("=")
+        if key == "k":
+            params["k"] = int(value)
+        else:
+            env[key] = value
+    return name, env, params
+
+def evaluate_variant(name: str, env: Dict[str, str], params: Dict[str, int], held_out, summary: dict,
+                     train_url: str, work_dir: str, args) -> dict:
+    models = os.path.join(work_dir, "models", name)
+    env = {"DATABASE_URL": train_url, "CONTENT_MODEL_DIR": os.path.join(models, "content"),
+           "MF_MODEL_DIR": os.path.join(models, "mf"), "ITEM_CF_DIR": os.path.join(models, "item_cf"),
+           "POPULARITY_DIR": os.path.join(models, "popularity"), "MODEL_WORKER": "0", "RECO_CACHE_ENABLED": "0",
+           "BUILD_WORKERS": "0", "CONTENT_PROFILE_CACHE_MAX_ENTRIES": "0", **env}
+    methods = [m.strip() for m in args.methods.split(",") if m.strip()]
+    k = params.get("k", args.k)
+    ctx = get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx, initializer=_init, initargs=(env,)) as pool:
+        build = pool.submit(_build_models, methods).result()
+    print(f"[{name}] models built: {build}")
+    users = sorted(held_out.items())
+    size = max(1, math.ceil(len(users) / (args.workers * 4)))
+    chunks = [users[i:i + size] for i in range(0, len(users), size)]
+    results = {}
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=ctx, initializer=_init, initargs=(env,)) as pool:
+        for method in methods:
+            parts = list(pool.map(_evaluate, [method] * len(chunks), chunks, [args.top_n] * len(chunks),
+                                  [k] * len(chunks), [args.relevant] * len(chunks),
+                                  [max(1, args.memory_sample // len(chunks))] * len(chunks)))
+            results[method] = _merge(parts, summary["movies"], args.workers)
+            r = results[method]
+            print(f"[{name}] {method}: P@{args.top_n} {r['precision']} R@{args.top_n} {r['recall']} "
+                  f"NDCG {r['ndcg']} coverage {r['coverage']} RMSE {r['rmse']} p50 {r['p50_ms']} ms")
+    return {"env": env, "params": {"k": k}, "build_s": build, "methods": results}
+
+def to_markdown(report: dict) -> str:
+    s, n = report["split"], report["params"]["top_n"]
+    lines = [f"# Evaluation {report['commit']} ({report['timestamp']})", "",
+             f"{s['split']} split, {s['test_fraction']:.0%} held out: {s['train_ratings']:,} train / "
+             f"{s['test_ratings']:,} test ratings, {s['test_users']:,} test users, {s['movies']:,} movies", "",
+             f"| variant | method | P@{n} | R@{n} | NDCG@{n} | coverage | RMSE | p50 ms | p95 ms | users/s | "
+             f"alloc MB | worker RSS MB | load s |",
+             "|---|---|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|"]
+    for variant, v in report["variants"].items():
+        for method, r in v["methods"].items():
+            lines.append(f"| {variant} | {method} | {r['precision']} | {r['recall']} | {r['ndcg']} | {r['coverage']} | "
+                         f"{'' if r['rmse'] is None else r['rmse']} | {r['p50_ms']} | {r['p95_ms']} | "
+                         f"{r['users_per_s']} | {r['alloc_mb_mean']} | {r['worker_rss_mb']} | {r['load_s']} |")
+    return "\n".join(lines) + "\n"
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--db", default="sqlite:///./bench/bench.db", help="database whose ratings are split")
+    p.add_argument("--split", choices=("temporal", "random"), default="temporal")
+    p.add_argument("--test-fraction", type=float, default=0.2)
+    p.add_argument("--min-ratings", type=int, default=5, help="users with fewer ratings are not tested")
+    p.add_argument("--max-users", type=int, default=0, help="sample this many test users (0 = all)")
+    p.add_argument("--methods", default=",".join(METHODS))
+    p.add_argument("--variant", action="append", default=[], help="name:KEY=VAL,... (repeatable)")
+    p.add_argument("--top-n", type=int, default=10)
+    p.add_argument("--k", type=int, default=20, help="CF neighbours")
+    p.add_argument("--relevant", type=int, default=4, help="held-out scores counted as relevant")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--memory-sample", type=int, default=50, help="users whose calls are traced for allocations")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--work-dir", default="./bench/eval", help="training database and model snapshots")
+    p.add_argument("--out", default="./bench/reports")
+    return p.parse_args(argv)
+
+def main(argv=None) -> dict:
+    args = parse_args(argv)
+    work_dir = os.path.abspath(args.work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+    train_path = os.path.join(work_dir, "train.db")
+    train_url = f"sqlite:///{train_path}"
+    os.environ["DATABASE_URL"] = train_url  # settings are read at import time
+    t0 = time.perf_counter()
+    held_out, summary = prepare(args.db, train_path, args)
+    summary["prepare_s"] = round(time.perf_counter() - t0, 2)
+    print(f"split: {summary}")
+    if not held_out:
+        raise SystemExit("no test users; lower --min-ratings or load more ratings")
+    variants = {}
+    for name, env, params in [("base", {}, {})] + [parse_variant(v) for v in args.variant]:
+        variants[name] = evaluate_variant(name, env, params, held_out, summary, train_url, work_dir, args)
+    report = {"commit": git_commit(), "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S"),
+              "source": args.db, "split": summary,
+              "params": {"top_n": args.top_n, "k": args.k, "relevant": args.relevant, "workers": args.workers},
+              "variants": variants}
+    os.makedirs(args.out, exist_ok=True)
+    stem = os.path.join(args.out, f"eval-{report['commit']}-{report['timestamp'].replace(':', '')}")
+    with open(stem + ".json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(stem + ".md", "w", encoding="utf-8") as f:
+        f.write(to_markdown(report))
+    print(to_markdown(report))
+    print(f"Report: {stem}.json, {stem}.md")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import json
+import os
+import resource
+import subprocess
+import sys
+from typing import List
+
+import numpy as np
+
+def summarize(latencies: List[float]) -> dict:
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None, "max_ms": None}
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"p50_ms": round(float(p50), 3), "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3),
+            "mean_ms": round(float(ms.mean()), 3), "max_ms": round(float(ms.max()), 3)}
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS; it only ever grows
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def to_markdown(report: dict) -> str:
+    ds = report["dataset"]
+    lines = [f"# Benchmark {report['commit']} ({report['timestamp']})", "",
+             f"Dataset: {ds['movies']:,} movies, {ds['users']:,} users, {ds['ratings']:,} ratings (seed {ds['seed']})", ""]
+    if report.get("setup"):
+        lines += ["| setup step | seconds | rows/s | peak RSS MB |", "|---|---:|---:|---:|"]
+        for name, s in report["setup"].items():
+            lines.append(f"| {name} | {s['seconds']} | {s.get('rows_per_s', '')} | {s['peak_rss_mb']} |")
+        lines.append("")
+    lines += ["| scenario | requests | conc | errors | req/s | p50 ms | p95 ms | p99 ms | max ms | peak RSS MB |",
+              "|---|---:|---:|---:|---:|---:|---:|---:|---:|---:|"]
+    for name, s in report["scenarios"].items():
+        lines.append(f"| {name} | {s['requests']} | {s['concurrency']} | {s['errors']} | {s['throughput_rps']} | "
+                     f"{s['p50_ms']} | {s['p95_ms']} | {s['p99_ms']} | {s['max_ms']} | {s['peak_rss_mb']} |")
+    return "\n".join(lines) + "\n"
+
+def write(report: dict, out_dir: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, f"bench-{report['commit']}-{report['timestamp'].replace(':', '')}")
+    with open(stem + ".json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(stem + ".md", "w", encoding="utf-8") as f:
+        f.write(to_markdown(report))
+    return stem
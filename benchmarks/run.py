@@ -0,0 +1,187 @@
+"""Benchmark the recommenders and API on a seeded synthetic dataset.
+
+    python -m benchmarks.run --preset small
+    python -m benchmarks.run --movies 200000 --users 50000 --ratings 2000000 --train-mf
+    python -m benchmarks.run --preset medium --skip-load --url http://localhost:8000
+
+Writes bench-<commit>-<timestamp>.json/.md to --out; compare two runs with
+python -m benchmarks.compare old.json new.json.
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+PRESETS = {
+    "small": (10_000, 20_000, 100_000),
+    "medium": (100_000, 100_000, 1_000_000),
+    "large": (1_000_000, 500_000, 10_000_000),
+}
+SCENARIOS = ("content", "cf", "mf", "hybrid", "popular", "api_movies", "api_search", "api_content", "api_cf", "api_mf",
+             "api_hybrid")
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--preset", choices=PRESETS, default="small")
+    p.add_argument("--movies", type=int)
+    p.add_argument("--users", type=int)
+    p.add_argument("--ratings", type=int)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--db", default="sqlite:///./bench/bench.db")
+    p.add_argument("--skip-load", action="store_true", help="reuse the data already in --db")
+    p.add_argument("--train-mf", action="store_true", help="train ALS factors (enables the mf scenarios)")
+    p.add_argument("--scenarios", default=",".join(SCENARIOS))
+    p.add_argument("--requests", type=int, default=200)
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--top-n", type=int, default=20)
+    p.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    p.add_argument("--cache", action="store_true", help="keep the recommendation result cache enabled")
+    p.add_argument("--startup-runs", type=int, default=1,
+                   help="fresh processes timing import/startup/readiness of the app (0 = skip)")
+    p.add_argument("--out", default="./bench/reports")
+    return p.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    n_movies, n_users, n_ratings = PRESETS[args.preset]
+    n_movies, n_users, n_ratings = args.movies or n_movies, args.users or n_users, args.ratings or n_ratings
+    # settings are read at import time, so point the app at the benchmark database/models first
+    bench_dir = os.path.dirname(os.path.abspath(args.out))
+    os.environ["DATABASE_URL"] = args.db
+    os.environ.setdefault("CONTENT_MODEL_DIR", os.path.join(bench_dir, "models", "content"))
+    os.environ.setdefault("MF_MODEL_DIR", os.path.join(bench_dir, "models", "mf"))
+    os.environ.setdefault("ITEM_CF_DIR", os.path.join(bench_dir, "models", "item_cf"))
+    os.environ.setdefault("POPULARITY_DIR", os.path.join(bench_dir, "models", "popularity"))
+    os.environ["RECO_CACHE_ENABLED"] = "1" if args.cache else "0"
+    if args.db.startswith("sqlite:///"):
+        os.makedirs(os.path.dirname(os.path.abspath(args.db[len("sqlite:///"):])), exist_ok=True)
+
+    import numpy as np
+    from sqlalchemy import func
+    from app.auth import create_access_token, hash_password
+    from app.database import SessionLocal, engine
+    from app.models import Movie, Rating, User
+    from benchmarks.datasets import bulk_load
+    from benchmarks.driver import run_load
+    from benchmarks.report import git_commit, peak_rss_mb, write
+
+    setup = {}
+
+    def step(name, fn, rows=None):
+        t0 = time.perf_counter()
+        result = fn()
+        dt = time.perf_counter() - t0
+        setup[name] = {"seconds": round(dt, 2), "peak_rss_mb": peak_rss_mb()}
+        if rows:
+            setup[name]["rows_per_s"] = round(rows / dt) if dt else None
+        print(f"{name}: {dt:.2f}s")
+        return result
+
+    if not args.skip_load:
+        step("bulk_load", lambda: bulk_load(engine, n_movies, n_users, n_ratings, seed=args.seed,
+                                            password_hash=hash_password("password")),
+             rows=n_movies + n_users + n_ratings)
+    if args.startup_runs > 0 and not args.url:
+        # before this process warms any model: the child starts as cold as a new uvicorn worker
+        from benchmarks.startup import as_setup, measure
+        startup = measure(args.db, warmup="background", runs=args.startup_runs)
+        setup.update(as_setup(startup))
+        print(f"startup: import {startup['import_s']}s, lifespan {startup['startup_s']}s, "
+              f"ready {startup['ready_s']}s (loaded at import: {', '.join(startup['heavy_modules_at_import'])})")
+    db = SessionLocal()
+    n_movies = db.query(func.count(Movie.id)).scalar()
+    n_users = db.query(func.count(User.id)).scalar()
+    n_ratings = db.query(func.count(Rating.id)).scalar()
+    db.close()
+
+    from app.content_model import get_content_model
+    from app.ratings_store import ratings_store
+    from app import recommenders
+
+    db = SessionLocal()
+    step("ratings_store_load", lambda: ratings_store.load(db), rows=n_ratings)
+    step("cf_matrix_build", lambda: ratings_store.matrix(), rows=n_ratings)
+    step("content_model", lambda: get_content_model(db), rows=n_movies)
+    if args.train_mf:
+        from app.mf import build_snapshot
+        step("mf_train", lambda: build_snapshot(db), rows=n_ratings)
+    db.close()
+
+    rng = np.random.default_rng(args.seed)
+    user_ids = rng.integers(1, n_users + 1, size=args.requests)
+    users = {}
+    db = SessionLocal()
+    for u in db.query(User).filter(User.id.in_(set(user_ids.tolist()))):
+        db.expunge(u)
+        users[u.id] = u
+    db.close()
+    search_terms = [t.split()[0][:4] for (t,) in SessionLocal().query(Movie.title).limit(50)]
+
+    def direct(fn):
+        def call(i):
+            s = SessionLocal()
+            try:
+                return fn(s, users[int(user_ids[i])])
+            finally:
+                s.close()
+        return call
+
+    if args.url:
+        import httpx
+        client = httpx.Client(base_url=args.url, timeout=60)
+    else:
+        from fastapi.testclient import TestClient
+        from app.main import app
+        client = TestClient(app)
+    tokens = {uid: create_access_token(u.email, uid=uid) for uid, u in users.items()}
+
+    def api(path):
+        def call(i):
+            uid = int(user_ids[i])
+            return client.get(path, params={"top_n": args.top_n}, headers={"Authorization": f"Bearer {tokens[uid]}"})
+        return call
+
+    pages = max(1, n_movies // 20)
+    scenario_calls = {
+        "content": direct(lambda s, u: recommenders.content_based(s, u, top_n=args.top_n)),
+        "cf": direct(lambda s, u: recommenders.collaborative_filtering(s, u, top_n=args.top_n)),
+        "mf": direct(lambda s, u: recommenders.matrix_factorization(s, u, top_n=args.top_n)),
+        "hybrid": direct(lambda s, u: recommenders.hybrid(s, u, top_n=args.top_n)),
+        "popular": direct(lambda s, u: recommenders._popular_unrated(s, u, args.top_n)),
+        "api_movies": lambda i: client.get("/api/movies", params={"page": int(user_ids[i]) % pages + 1}),
+        "api_search": lambda i: client.get("/api/movies", params={"q": search_terms[i % len(search_terms)]}),
+        "api_content": api("/api/recommendations/content"),
+        "api_cf": api("/api/recommendations/cf"),
+        "api_mf": api("/api/recommendations/mf"),
+        "api_hybrid": api("/api/recommendations/hybrid"),
+    }
+    from app.mf import get_mf_model
+    has_mf = get_mf_model() is not None
+
+    scenarios = {}
+    for name in [s.strip() for s in args.scenarios.split(",") if s.strip()]:
+        if name not in scenario_calls:
+            raise SystemExit(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        if name.endswith("mf") and not has_mf and not args.url:
+            print(f"{name}: skipped (no MF model, use --train-mf)")
+            continue
+        result = run_load(scenario_calls[name], requests=args.requests, concurrency=args.concurrency)
+        result["peak_rss_mb"] = peak_rss_mb()
+        scenarios[name] = result
+        print(f"{name}: p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, {result['throughput_rps']} req/s")
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S"),
+        "dataset": {"movies": n_movies, "users": n_users, "ratings": n_ratings, "seed": args.seed},
+        "params": {"requests": args.requests, "concurrency": args.concurrency, "top_n": args.top_n,
+                   "cache": args.cache, "url": args.url},
+        "setup": setup,
+        "scenarios": scenarios,
+    }
+    stem = write(report, args.out)
+    print(f"Report: {stem}.json, {stem}.md")
+    return report
+
+if __name__ == "__main__":
+    main()
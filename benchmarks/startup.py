@@ -0,0 +1,61 @@
+"""Cold-start cost of the app in fresh interpreters: importing app.main, running its lifespan, and
+the time until /readyz answers 200.
+
+    python -m benchmarks.startup --db sqlite:///./bench/bench.db --warmup background --runs 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Optional
+
+# runs in the child; times are relative to the start of `import app.main`
+_PROBE = r"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+import app.main
+imported = time.perf_counter() - t0
+heavy = sorted(m for m in ("sklearn", "scipy.sparse", "numpy") if m in sys.modules)
+from fastapi.testclient import TestClient  # not part of the app's own import cost
+t1 = time.perf_counter()
+with TestClient(app.main.app) as c:
+    started = time.perf_counter() - t1
+    deadline = time.perf_counter() + 600
+    while c.get("/readyz").status_code != 200 and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    ready = imported + time.perf_counter() - t1
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+print(json.dumps({"import_s": imported, "startup_s": started, "ready_s": ready,
+                  "peak_rss_mb": round(rss, 1), "heavy_modules_at_import": heavy}))
+"""
+
+def measure(db_url: Optional[str] = None, warmup: str = "background", runs: int = 1,
+            env: Optional[Dict[str, str]] = None) -> dict:
+    """Best of `runs` child processes (the first one also pays for cold file caches)."""
+    child_env = dict(os.environ, **(env or {}))
+    child_env.update(STARTUP_WARMUP=warmup, MODEL_WORKER="0")
+    if db_url:
+        child_env["DATABASE_URL"] = db_url
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE], env=child_env, capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    best = min(results, key=lambda r: r["ready_s"])
+    return {**{k: round(v, 3) if isinstance(v, float) else v for k, v in best.items()}, "warmup": warmup, "runs": runs}
+
+def as_setup(result: dict) -> Dict[str, dict]:
+    """Rows for the setup table of a benchmarks.run report."""
+    rss = result["peak_rss_mb"]
+    return {"import_app": {"seconds": result["import_s"], "peak_rss_mb": rss},
+            f"startup_{result['warmup']}": {"seconds": result["startup_s"], "peak_rss_mb": rss},
+            f"ready_{result['warmup']}": {"seconds": result["ready_s"], "peak_rss_mb": rss}}
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--db", help="database URL (default: DATABASE_URL)")
+    p.add_argument("--warmup", choices=("blocking", "background", "off"), default="background")
+    p.add_argument("--runs", type=int, default=3)
+    a = p.parse_args()
+    print(json.dumps(measure(a.db, a.warmup, a.runs), indent=2))
@@ -0,0 +1,36 @@
+import sys
+import numpy as np
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.content_model import get_content_model
+from app.ratings_store import get_ratings_store
+from app.ann import IVFIndex, recall_report
+
+def run(n=20, num_queries=200, nlist=0):
+    db: Session = SessionLocal()
+    model = get_content_model(db)
+    if model is None:
+        print("Seed movies first."); return
+    store = get_ratings_store(db)
+    rng = np.random.default_rng(0)
+    # queries: liked-movie profiles of real users, topped up with random movies
+    queries = []
+    M = store.matrix()
+    for ui in rng.permutation(len(M.users))[:num_queries]:
+        liked = [model.id_to_idx[int(M.movies[mi])] for mi, s in zip(M.R[ui].indices, M.R[ui].data)
+                 if s > 3 and int(M.movies[mi]) in model.id_to_idx]
+        if liked:
+            queries.append(np.asarray(model.X[liked].mean(axis=0)))
+    for row in rng.choice(model.X.shape[0], max(num_queries - len(queries), 0)):
+        queries.append(model.X[row].toarray())
+    index = IVFIndex.build(model, nlist=nlist)
+    if index is None:
+        print("Catalog too small for an ANN index."); return
+    print(f"{model.X.shape[0]} movies, {len(index.centroids)} lists, {len(queries)} queries, recall@{n}")
+    print(f"{'nprobe':>6} {'recall':>8} {'ann ms':>8} {'exact ms':>9}")
+    for r in recall_report(model, queries, n=n, index=index):
+        print(f"{r['nprobe']:>6} {r['recall']:>8.3f} {r['ann_ms']:>8.2f} {r['exact_ms']:>9.2f}")
+    db.close()
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv)>1 else 20)
@@ -0,0 +1,18 @@
+import sys
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, Base, engine
+from app.content_model import build_content_model
+from app.config import settings
+
+def run(version=None):
+    Base.metadata.create_all(bind=engine)
+    db: Session = SessionLocal()
+    model = build_content_model(db, version=version)
+    if model is None:
+        print("Seed movies first.")
+    else:
+        print(f"Built content model v{model.version} ({model.X.shape[0]} movies) in {settings.CONTENT_MODEL_DIR}")
+    db.close()
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv)>1 else None)  # default: the next snapshot version
@@ -0,0 +1,24 @@
+import argparse
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, Base, engine
+from app.item_cf import build_snapshot
+from app.model_registry import build_info
+from app.config import settings
+
+def run(workers: int = settings.ITEM_CF_WORKERS, k: int = settings.ITEM_CF_NEIGHBORS):
+    Base.metadata.create_all(bind=engine)
+    db: Session = SessionLocal()
+    version = build_snapshot(db, workers=workers, k=k)
+    db.close()
+    if version is None:
+        print("Seed ratings first."); return
+    info = build_info(settings.ITEM_CF_DIR)
+    print(f"Built item-item neighbours v{version} ({info['items']} movies x {k}, "
+          f"{info['pairs']} pairs) in {settings.ITEM_CF_DIR} ({info['build_seconds']}s)")
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Precompute top-K item-item neighbour lists")
+    p.add_argument("--workers", type=int, default=settings.ITEM_CF_WORKERS)
+    p.add_argument("--neighbors", type=int, default=settings.ITEM_CF_NEIGHBORS)
+    a = p.parse_args()
+    run(workers=a.workers, k=a.neighbors)
@@ -0,0 +1,33 @@
+import argparse
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, Base, engine
+from app.ingest import ingest_file, rebuild_after_ingest
+
+def run(movies=None, ratings=None, chunk_size=50_000, resume=True, rebuild=True, train_mf=False):
+    Base.metadata.create_all(bind=engine)
+    for kind, path in (("movies", movies), ("ratings", ratings)):
+        if path:
+            r = ingest_file(engine, kind, path, chunk_size=chunk_size, resume=resume)
+            print(f"{kind}: {r['written']} rows from {r['read']} records ({r['skipped']} skipped) in {r['seconds']}s")
+    if rebuild:
+        db: Session = SessionLocal()
+        try:
+            rebuild_after_ingest(db, movies=bool(movies), ratings=bool(ratings))
+        finally:
+            db.close()
+        if train_mf and (movies or ratings):
+            from scripts import train_mf as train
+            train.run()
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Bulk-load movies and/or ratings from CSV or JSON lines (optionally .gz)")
+    p.add_argument("--movies", help="movies file: id/movieId, title, year, genres, overview")
+    p.add_argument("--ratings", help="ratings file: user_id/userId, movie_id/movieId, score/rating, timestamp")
+    p.add_argument("--chunk-size", type=int, default=50_000)
+    p.add_argument("--no-resume", action="store_true", help="ignore a checkpoint left by an interrupted run")
+    p.add_argument("--no-rebuild", action="store_true", help="skip genre/TF-IDF/movie_stats rebuilds")
+    p.add_argument("--train-mf", action="store_true", help="retrain the ALS model afterwards")
+    a = p.parse_args()
+    if not (a.movies or a.ratings):
+        p.error("nothing to load: pass --movies and/or --ratings")
+    run(a.movies, a.ratings, a.chunk_size, not a.no_resume, not a.no_rebuild, a.train_mf)
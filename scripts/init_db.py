@@ -0,0 +1,9 @@
+from app.database import engine, init_db
+
+def run():
+    # schema step for deployments that start the app with DB_CREATE_SCHEMA=0
+    init_db()
+    print(f"Schema ready on {engine.url.render_as_string(hide_password=True)}")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,17 @@
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, Base, engine
+from app.genres import migrate_genres
+from app.models import Genre
+
+def run():
+    # creates genres/movie_genres if needed and (re)links every movie from Movie.genres
+    Base.metadata.create_all(bind=engine)
+    db: Session = SessionLocal()
+    try:
+        links = migrate_genres(db)
+        print(f"Linked {links} movie genres across {db.query(Genre).count()} genres.")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,32 @@
+import argparse
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, Base, engine
+from app.movie_stats import check_movie_stats, rebuild_movie_stats
+
+def run(command="check", fix=False, show=20):
+    Base.metadata.create_all(bind=engine)
+    db: Session = SessionLocal()
+    try:
+        if command == "rebuild":
+            print(f"Rebuilt movie_stats for {rebuild_movie_stats(db)} movies.")
+            return 0
+        bad = check_movie_stats(db)
+        if not bad:
+            print("movie_stats is consistent with ratings.")
+            return 0
+        print(f"{len(bad)} movies out of sync (movie_id: expected sum/count/score vs stored):")
+        for mid, expected, stored in bad[:show]:
+            print(f"  {mid}: {expected} vs {stored}")
+        if fix:
+            print(f"Rebuilt movie_stats for {rebuild_movie_stats(db)} movies.")
+            return 0
+        return 1
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Rebuild or verify the movie_stats rating aggregates")
+    p.add_argument("command", choices=["check", "rebuild"], nargs="?", default="check")
+    p.add_argument("--fix", action="store_true", help="rebuild when check finds differences")
+    args = p.parse_args()
+    raise SystemExit(run(args.command, fix=args.fix))
@@ -0,0 +1,24 @@
+import argparse
+import time
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, Base, engine
+from app.batch import METHODS, precompute_all
+
+def run(methods=METHODS, top_n=20, k=20, workers=1, chunk_size=2000):
+    Base.metadata.create_all(bind=engine)
+    db: Session = SessionLocal()
+    for method in methods:
+        t0 = time.perf_counter()
+        n = precompute_all(db, method=method, top_n=top_n, k=k, workers=workers, chunk_size=chunk_size)
+        print(f"{method}: precomputed {n} users in {time.perf_counter() - t0:.1f}s")
+    db.close()
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="Precompute recommendations for all users")
+    p.add_argument("methods", nargs="*", choices=METHODS, default=list(METHODS))
+    p.add_argument("--top-n", type=int, default=20)
+    p.add_argument("-k", type=int, default=20)
+    p.add_argument("--workers", type=int, default=1)
+    p.add_argument("--chunk-size", type=int, default=2000)
+    a = p.parse_args()
+    run(a.methods, a.top_n, a.k, a.workers, a.chunk_size)
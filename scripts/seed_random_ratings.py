@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from app.database import SessionLocal, Base, engine
 from app.models import User, Movie, Rating
 from app.auth import hash_password
+from app.movie_stats import rebuild_movie_stats
 
 def run(num_users=5, ratings_per_user=(3,7)):
     Base.metadata.create_all(bind=engine)
@@ -24,6 +25,7 @@ def run(num_users=5, ratings_per_user=(3,7)):
             r = Rating(user_id=u.id, movie_id=m.id, score=random.randint(2,5))
             db.add(r)
     db.commit()
+    rebuild_movie_stats(db)
     print("Inserted random ratings.")
     db.close()
 
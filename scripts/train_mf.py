@@ -0,0 +1,19 @@
+from sqlalchemy.orm import Session
+from app.database import SessionLocal, Base, engine
+from app.mf import build_snapshot
+from app.model_registry import build_info
+from app.config import settings
+
+def run():
+    Base.metadata.create_all(bind=engine)
+    db: Session = SessionLocal()
+    version = build_snapshot(db)
+    db.close()
+    if version is None:
+        print("Seed ratings first."); return
+    info = build_info(settings.MF_MODEL_DIR)
+    print(f"Trained MF model v{version} ({info['users']} users x {info['items']} movies, "
+          f"{settings.MF_FACTORS} factors) in {settings.MF_MODEL_DIR} ({info['build_seconds']}s)")
+
+if __name__ == "__main__":
+    run()
@@ -1,10 +1,11 @@
 import os
+os.environ.setdefault("BCRYPT_ROUNDS", "4")  # fast hashing; read when app.config is imported
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.main import app
-from app.database import Base, get_db
+from app.database import Base, get_db, get_read_db
 
 TEST_DB = "sqlite:///./test.db"
 
@@ -20,6 +21,7 @@ def override_get_db():
         db.close()
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 
 @pytest.fixture(scope="session")
 def client():
@@ -1,3 +1,6 @@
+import uuid
+from app.auth import decode_identity
+
 def signup_login(client):
     r = client.post("/api/auth/signup", json={"email":"t@example.com","password":"secret12"})
     assert r.status_code == 200
@@ -46,3 +49,35 @@ def test_recommenders_exclude_rated(client):
     if rf.status_code == 200:
         recs = rf.json()
         assert all(x["movie_id"] != mid for x in recs)
+
+def test_batch_only_serves_own_user_without_api_key(client, monkeypatch):
+    from app.config import settings
+    tokens = []
+    for _ in range(2):
+        r = client.post("/api/auth/signup", json={"email": f"batch-{uuid.uuid4().hex[:8]}@example.com",
+                                                   "password": "secret12"})
+        tokens.append(r.json()["access_token"])
+    own = decode_identity(tokens[0])[1]
+    other = decode_identity(tokens[1])[1]
+    headers = {"Authorization": "Bearer " + tokens[0]}
+    r = client.post("/api/recommendations/batch", headers=headers, json={"user_ids": [own, other]})
+    assert r.status_code == 403
+    assert client.post("/api/recommendations/batch", headers=headers, json={"user_ids": [own]}).status_code == 200
+    monkeypatch.setattr(settings, "BATCH_API_KEY", "svc-key")
+    r = client.post("/api/recommendations/batch", headers={**headers, "X-API-Key": "wrong"}, json={"user_ids": [other]})
+    assert r.status_code == 403
+    r = client.post("/api/recommendations/batch", headers={**headers, "X-API-Key": "svc-key"}, json={"user_ids": [other]})
+    assert r.status_code == 200
+
+def test_health_probes(client, monkeypatch):
+    from app.warmup import Warmup, warmup
+    from tests.conftest import TestingSessionLocal
+    assert client.get("/healthz").json() == {"status": "ok"}
+    monkeypatch.setattr(warmup, "state", "pending")  # lifespan not run (or warm-up still going)
+    r = client.get("/readyz")
+    assert r.status_code == 503 and r.json()["database"] == "ok"
+    monkeypatch.setattr(warmup, "state", "skipped")  # STARTUP_WARMUP=off
+    assert client.get("/readyz").json()["status"] == "ready"
+    w = Warmup()
+    w.start("blocking", TestingSessionLocal)
+    assert w.ready and {"ratings_store", "content_model", "item_cf"} <= set(w.steps) and not w.errors
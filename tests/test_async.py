@@ -0,0 +1,64 @@
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from app.database import Base, get_async_db, get_async_read_db, get_db, get_read_db, make_async_engine, make_engine
+from app.models import Movie
+from app.routers.aio import auth, metrics, movies, ratings, recommendations
+
+def make_app(tmp_path):
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    engine = make_engine(url)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False, future=True)
+    with Session() as db:
+        db.add_all([Movie(title="Alien", year=1979, genres="Horror|Sci-Fi", overview="space horror"),
+                    Movie(title="Heat", year=1995, genres="Crime", overview="heist")])
+        db.commit()
+    aengine = make_async_engine(url)
+    ASession = async_sessionmaker(aengine, autoflush=False, expire_on_commit=False)
+
+    async def override_async():
+        async with ASession() as db:
+            yield db
+
+    def override_sync():
+        with Session() as db:
+            yield db
+
+    app = FastAPI()
+    for r in (auth, movies, ratings, recommendations, metrics):
+        app.include_router(r.router)
+    app.dependency_overrides.update({get_async_db: override_async, get_async_read_db: override_async,
+                                     get_db: override_sync, get_read_db: override_sync})
+    return app, aengine
+
+def test_async_routes(tmp_path):
+    app, aengine = make_app(tmp_path)
+    with TestClient(app) as c:
+        tok = c.post("/api/auth/signup", json={"email": "a@example.com", "password": "secret1"}).json()["access_token"]
+        assert c.post("/api/auth/signup", json={"email": "a@example.com", "password": "secret1"}).status_code == 400
+        assert c.post("/api/auth/login", json={"email": "a@example.com", "password": "nope"}).status_code == 401
+        h = {"Authorization": f"Bearer {tok}"}
+
+        listed = c.get("/api/movies", params={"size": 1})
+        assert [m["title"] for m in listed.json()] == ["Alien"] and listed.headers["X-Next-Cursor"]
+        assert [m["title"] for m in c.get("/api/movies", params={"genre": "crime"}).json()] == ["Heat"]
+
+        r = c.post("/api/ratings", headers=h, json={"movie_id": 1, "score": 5})
+        assert r.status_code == 200 and r.json()["title"] == "Alien"
+        c.post("/api/ratings", headers=h, json={"movie_id": 1, "score": 4})
+        assert [(x["movie_id"], x["score"]) for x in c.get("/api/ratings/me", headers=h).json()] == [(1, 4)]
+        movie = c.get("/api/movies", params={"q": "alien"}).json()[0]
+        assert movie["avg_rating"] == 4.0 and movie["rating_count"] == 1
+
+        overview = c.get("/api/metrics/overview").json()
+        assert overview["total_users"] == 1 and overview["total_ratings"] == 1
+        assert c.get("/api/metrics/cache").status_code == 200
+        assert c.get("/api/recommendations/popular", headers=h).status_code == 200
+        batch = {"user_ids": [1, 2], "method": "content"}
+        assert c.post("/api/recommendations/batch", headers=h, json=batch).status_code == 403
+        assert c.delete("/api/ratings/1", headers=h).json() == {"ok": True}
+        assert c.get("/api/ratings/me", headers=h).json() == []
+    asyncio.run(aengine.dispose())
@@ -0,0 +1,47 @@
+from sqlalchemy import event
+from app.auth import AuthUser, UserCache, create_access_token, decode_identity, hash_password, user_cache
+from app.models import User
+from tests.conftest import TestingSessionLocal, engine
+
+def test_token_carries_user_id_and_rounds_are_configurable():
+    email, uid = decode_identity(create_access_token("a@example.com", uid=7))
+    assert (email, uid) == ("a@example.com", 7)
+    assert decode_identity(create_access_token("a@example.com"))[1] is None  # older tokens
+    assert hash_password("secret12").startswith("$2b$04$")  # BCRYPT_ROUNDS=4 in conftest
+
+def test_user_cache_ttl_and_eviction():
+    cache = UserCache(max_entries=2, ttl=60)
+    cache.put(AuthUser(1, "a@x.com"))
+    cache.put(AuthUser(2, "b@x.com"))
+    assert cache.get(1, "a@x.com") == AuthUser(1, "a@x.com")
+    assert cache.get(1, "other@x.com") is None  # email no longer matches the token
+    cache.put(AuthUser(3, "c@x.com"))  # evicts 2, the least recently used
+    assert cache.get(2, "b@x.com") is None and cache.get(3, "c@x.com") is not None
+    expired = UserCache(ttl=-1)
+    expired.put(AuthUser(1, "a@x.com"))
+    assert expired.get(1, "a@x.com") is None
+
+def test_authenticated_requests_skip_user_queries(client):
+    token = client.post("/api/auth/signup", json={"email": "cached@example.com", "password": "secret12"}).json()["access_token"]
+    h = {"Authorization": f"Bearer {token}"}
+    statements = []
+    listener = lambda conn, cursor, stmt, *a: statements.append(stmt)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert client.get("/api/ratings/me", headers=h).status_code == 200
+        statements.clear()
+        for _ in range(3):
+            assert client.get("/api/ratings/me", headers=h).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert statements and not any("FROM users" in s for s in statements)
+
+    # an ORM change to the user drops the cache entry; the old token no longer resolves
+    db = TestingSessionLocal()
+    user = db.query(User).filter(User.email == "cached@example.com").one()
+    uid = user.id
+    user.email = "renamed@example.com"
+    db.commit()
+    db.close()
+    assert user_cache.get(uid, "cached@example.com") is None
+    assert client.get("/api/ratings/me", headers=h).status_code == 401
@@ -0,0 +1,41 @@
+import numpy as np
+from benchmarks.datasets import synth_movies, synth_ratings
+from benchmarks.driver import run_load
+from benchmarks.evaluate import parse_variant, ranking_metrics, split_ratings
+from benchmarks.report import to_markdown
+
+def test_synthetic_ratings_are_seeded_unique_and_skewed():
+    u, m, s = synth_ratings(500, 2000, 20000, seed=3)
+    u2, m2, s2 = synth_ratings(500, 2000, 20000, seed=3)
+    assert np.array_equal(u, u2) and np.array_equal(m, m2) and np.array_equal(s, s2)
+    assert len(set(zip(u.tolist(), m.tolist()))) == 20000
+    assert u.min() >= 1 and m.max() <= 2000 and s.min() >= 1 and s.max() <= 5
+    counts = np.sort(np.bincount(m))[::-1]
+    assert counts[:20].sum() > 10 * counts[-20:].sum()  # power-law popularity
+
+def test_synthetic_movies_chunks():
+    chunks = list(synth_movies(120, seed=1, chunk=50))
+    assert [len(c) for c in chunks] == [50, 50, 20]
+    assert chunks[-1][-1]["id"] == 120 and chunks[0][0]["genres"]
+
+def test_load_driver_report():
+    result = run_load(lambda i: None if i % 10 else 1 / 0, requests=50, concurrency=4, warmup=0)
+    assert result["requests"] == 50 and result["errors"] == 5 and result["p50_ms"] is not None
+    result["peak_rss_mb"] = 1.0
+    md = to_markdown({"commit": "abc", "timestamp": "t", "setup": {},
+                      "dataset": {"movies": 1, "users": 1, "ratings": 1, "seed": 0},
+                      "scenarios": {"cf": result}})
+    assert "| cf | 50 | 4 | 5 |" in md
+
+def test_evaluation_split_and_metrics():
+    users = np.array([1] * 10 + [2] * 3 + [3] * 5)  # rows in (user, time) order
+    test = split_ratings(users, 0.2, "temporal", min_ratings=5)
+    assert test.tolist() == [False] * 8 + [True] * 2 + [False] * 3 + [False] * 4 + [True]
+    rnd = split_ratings(users, 0.5, "random", min_ratings=5, seed=1)
+    assert rnd[:10].sum() == 5 and not rnd[10:13].any() and rnd[13:].sum() == 3
+    assert np.array_equal(rnd, split_ratings(users, 0.5, "random", min_ratings=5, seed=1))
+
+    p, r, ndcg = ranking_metrics([5, 1, 7, 2], {1, 2, 9}, k=4)
+    assert (p, r) == (0.5, 2 / 3) and 0 < ndcg < 1
+    assert ranking_metrics([1, 2], {1, 2}, k=2) == (1.0, 1.0, 1.0)
+    assert parse_variant("ann:CONTENT_ANN=1,k=50") == ("ann", {"CONTENT_ANN": "1"}, {"k": 50})
@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+import numpy as np
+from app.content_model import ContentModel
+
+MOVIES = [
+    SimpleNamespace(id=1, genres="Action|Sci-Fi", overview="A hacker learns the true nature of reality."),
+    SimpleNamespace(id=2, genres="Action|Sci-Fi|Thriller", overview="A thief steals secrets through dream-sharing technology."),
+    SimpleNamespace(id=3, genres="Drama|Romance", overview="Two lovers meet on a sinking ship."),
+]
+
+def test_save_load_roundtrip(tmp_path):
+    model = ContentModel.fit(MOVIES, version=3)
+    model.save(str(tmp_path))
+    loaded = ContentModel.load(str(tmp_path))
+    assert loaded.version == 3
+    assert list(loaded.ids) == [1, 2, 3]
+    assert (loaded.X != model.X).nnz == 0
+    doc = ["Sci-Fi hacker dream"]
+    assert np.allclose(loaded.vectorizer.transform(doc).toarray(), model.vectorizer.transform(doc).toarray())
+
+def test_fold_in_appends_rows():
+    model = ContentModel.fit(MOVIES)
+    new = SimpleNamespace(id=7, genres="Drama", overview="Lovers on a ship.")
+    folded = model.fold_in([new])
+    assert list(folded.ids) == [1, 2, 3, 7]
+    assert folded.folded == 1 and model.folded == 0
+    assert np.allclose(folded.X[3].toarray(), model.vectorizer.transform(["Drama Lovers on a ship."]).toarray())
+    assert np.allclose(folded.X[0].toarray(), model.X[0].toarray())
+    assert folded.id_to_idx[7] == 3 and folded.max_id == 7
+
+def test_ann_recall_against_exact_scan():
+    from app.ann import IVFIndex, recall_report
+    rng = np.random.default_rng(0)
+    topics = [rng.choice(400, 30, replace=False) for _ in range(10)]
+    movies = [SimpleNamespace(id=i + 1, genres="Drama",
+                              overview=" ".join(f"w{w}" for w in rng.choice(topics[i % 10], 12)))
+              for i in range(300)]
+    model = ContentModel.fit(movies)
+    index = IVFIndex.build(model, dim=16, nlist=8)
+    queries = [model.X[r].toarray() for r in range(0, 300, 15)]
+    report = recall_report(model, queries, n=5, nprobes=[1, 8], index=index)
+    assert [r["nprobe"] for r in report] == [1, 8]
+    assert report[-1]["recall"] >= 0.9
+    assert report[0]["recall"] <= report[-1]["recall"]
+
+def test_profile_incremental_updates_match_rebuild(monkeypatch):
+    from app.config import settings
+    from app.content_profile import ProfileCache, build_profile
+    monkeypatch.setattr(settings, "CONTENT_DISLIKE_WEIGHT", 0.5)
+    model = ContentModel.fit(MOVIES)
+    cache = ProfileCache(max_entries=10)
+    X = model.X.toarray()
+
+    vec = cache.get(None, model, 1, {1: 5, 3: 1})
+    # one sparse product: 2 * row(1) - 0.5 * 2 * row(3)
+    assert np.allclose(vec.toarray()[0], 2 * X[0] - 1.0 * X[2])
+    assert cache.get(None, model, 1, {3: 1}) is None  # dislikes only: no profile
+
+    for ratings in ({3: 1, 2: 4}, {2: 5, 1: 2}, {2: 5}):
+        vec = cache.get(None, model, 1, ratings)
+        assert np.allclose(vec.toarray(), build_profile(None, model, 1, ratings).vec.toarray())
+    assert cache.stats()["builds"] == 1 and cache.stats()["incremental_updates"] == 4
+
+def test_profile_time_decay(monkeypatch):
+    import time
+    from app.config import settings
+    from app.content_profile import update_profile, build_profile
+    monkeypatch.setattr(settings, "CONTENT_DECAY_HALF_LIFE_DAYS", 1.0)
+    model = ContentModel.fit(MOVIES)
+    profile = build_profile(None, model, 1, {1: 5})
+    profile.built_at = time.time() - 86400  # built a day (one half-life) ago
+    # a rating made now weighs twice as much as one of the same score a day older
+    updated = update_profile(profile, model, {1: 5, 3: 5})
+    assert np.isclose(updated.coef[3] / updated.coef[1], 2.0, rtol=1e-3)
@@ -0,0 +1,36 @@
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from app.database import make_engine
+from benchmarks.db_load import run_mixed
+
+def test_sqlite_connections_get_pragmas(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'p.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -65536
+    engine.dispose()
+
+def test_read_only_engine_rejects_writes(tmp_path):
+    url = f"sqlite:///{tmp_path / 'r.db'}"
+    writer, reader = make_engine(url), make_engine(url, read_only=True)
+    with writer.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+    with reader.connect() as conn:
+        assert conn.execute(text("SELECT x FROM t")).scalar() == 1
+        try:
+            conn.execute(text("INSERT INTO t VALUES (2)"))
+            assert False, "replica session wrote"
+        except OperationalError:
+            pass
+    writer.dispose()
+    reader.dispose()
+
+def test_concurrent_reads_and_writes_without_lock_errors(tmp_path):
+    result = run_mixed(f"sqlite:///{tmp_path / 'load.db'}", readers=4, writers=2, seconds=1.0,
+                       movies=200, users=100, ratings=2000)
+    assert result["journal_mode"] == "wal"
+    assert result["read"]["errors"] == 0 and result["write"]["errors"] == 0
+    assert result["read"]["ops"] > 0 and result["write"]["ops"] > 0
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+import pytest
+from fastapi import HTTPException
+from app import executor
+
+def test_identical_requests_coalesce_and_queue_overflow_is_rejected():
+    calls = []
+    gate = threading.Event()
+
+    def slow():
+        calls.append(1)
+        gate.wait(5)
+        return len(calls)
+
+    async def scenario():
+        executor._limiters["t"] = executor.EndpointLimiter("t", max_concurrent=1, max_queue=1)
+        shared = [asyncio.create_task(executor.run_scoring("t", "same", slow)) for _ in range(3)]
+        other = asyncio.create_task(executor.run_scoring("t", "other", slow))  # queued behind "same"
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as exc:
+            await executor.run_scoring("t", "third", slow)
+        gate.set()
+        return await asyncio.gather(*shared), await other, exc.value.status_code
+
+    shared, other, code = asyncio.run(scenario())
+    assert shared == [1, 1, 1]  # one computation for three identical requests
+    assert other == 2
+    assert code == 503
+    assert executor.stats()["t"]["rejected"] == 1
+
+def test_sync_hash_calls_share_the_auth_queue_bound(monkeypatch):
+    lim = executor.EndpointLimiter("auth", max_concurrent=1, max_queue=1)
+    monkeypatch.setitem(executor._limiters, "auth", lim)
+    gate, started = threading.Event(), threading.Event()
+
+    def slow_hash(pw):
+        started.set()
+        gate.wait(5)
+        return pw.upper()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(executor.run_hash_sync(slow_hash, "pw")))
+               for _ in range(2)]  # one hashing, one queued
+    for t in threads:
+        t.start()
+    started.wait(5)
+    while lim.pending < 2:
+        time.sleep(0.01)
+    with pytest.raises(HTTPException) as exc:
+        executor.run_hash_sync(slow_hash, "pw")
+    gate.set()
+    for t in threads:
+        t.join(5)
+    assert exc.value.status_code == 503 and results == ["PW", "PW"] and lim.pending == 0 and lim.rejected == 1
+
+def test_async_and_sync_entries_share_the_count():
+    lim = executor.EndpointLimiter("auth", max_concurrent=1, max_queue=0)
+
+    async def main():
+        with lim:  # a sync route holds the only slot
+            with pytest.raises(HTTPException):
+                async with lim:
+                    pass
+        async with lim:
+            assert lim.pending == 1
+            with pytest.raises(HTTPException):
+                with lim:
+                    pass
+
+    asyncio.run(main())
+    assert lim.pending == 0 and lim.rejected == 2
+
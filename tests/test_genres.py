@@ -0,0 +1,43 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.genres import GenreIndex, link_movies, link_new_movies, migrate_genres, parse_genre_filter
+from app.models import Genre, Movie, MovieGenre
+
+def test_migration_and_bitmap_filters():
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, future=True)()
+    db.add_all([Movie(id=1, title="a", genres="Action|Sci-Fi"), Movie(id=2, title="b", genres="Action-Adventure"),
+                Movie(id=3, title="c", genres="Drama| action"), Movie(id=4, title="d", genres=None)])
+    db.commit()
+    assert migrate_genres(db) == 5
+    assert sorted(n for (n,) in db.query(Genre.name)) == ["Action", "Action-Adventure", "Drama", "Sci-Fi"]
+
+    index = GenreIndex.from_db(db)
+    assert index.movie_ids(["action"]).tolist() == [1, 3]  # no substring match on Action-Adventure
+    assert index.movie_ids(["Action", "Sci-Fi"], "and").tolist() == [1]
+    assert index.movie_ids(["Sci-Fi", "Drama"], "or").tolist() == [1, 3]
+    assert index.movie_ids(["Action", "Western"], "and").tolist() == []
+    assert index.mask(["Drama"], size=8).tolist() == [False, False, False, True] + [False] * 4
+
+    # a movie not linked yet is indexed from Movie.genres without writing anything
+    db.add(Movie(id=5, title="e", genres="Drama|Western"))
+    db.commit()
+    index = GenreIndex.from_db(db)
+    assert index.movie_ids(["drama"]).tolist() == [3, 5] and index.movie_ids(["western"]).tolist() == [5]
+    assert db.query(MovieGenre).count() == 5 and db.query(Genre).count() == 4
+
+    # new movies are linked incrementally by the write side; relinking is idempotent
+    assert link_new_movies(db) == 2
+    assert link_movies(db, after_id=4) == 2
+    assert link_movies(db, after_id=3) == 2
+    assert db.query(MovieGenre).count() == 7
+    assert GenreIndex.from_db(db).movie_ids(["western"]).tolist() == [5]
+    assert parse_genre_filter(["Action,Drama", " Sci-Fi "]) == ["Action", "Drama", "Sci-Fi"]
+
+def test_movies_endpoint_genre_filter(client):
+    r = client.get("/api/movies", params=[("genre", "Action"), ("genre", "Drama"), ("genre_mode", "or")])
+    assert r.status_code == 200
+    for m in r.json():
+        assert {"action", "drama"} & {g.strip().lower() for g in (m["genres"] or "").split("|")}
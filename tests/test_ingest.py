@@ -0,0 +1,68 @@
+import json
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import ingest
+from app.database import Base
+from app.models import Movie, Rating, User
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ingest.db'}", future=True)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+def test_movielens_csv_upsert_and_dedupe(tmp_path):
+    engine = _engine(tmp_path)
+    movies = tmp_path / "movies.csv"
+    movies.write_text('movieId,title,genres\n1,"Heat (1995)",Action|Crime\n2,Nixon (1995),(no genres listed)\n'
+                      '1,"Heat, Director\'s Cut (1995)",Action|Crime|Drama\n', encoding="utf-8")
+    ratings = tmp_path / "ratings.jsonl"
+    ratings.write_text("\n".join(json.dumps(r) for r in [
+        {"userId": 7, "movieId": 1, "rating": 4.5, "timestamp": 964982703},
+        {"userId": 7, "movieId": 1, "rating": 2.0, "timestamp": 964982800},  # later duplicate wins
+        {"userId": 8, "movieId": 2, "rating": 0.5},
+        {"userId": 8, "rating": 3},  # no movie: skipped
+    ]) + "\n", encoding="utf-8")
+    assert ingest.ingest_file(engine, "movies", str(movies))["written"] == 2
+    r = ingest.ingest_file(engine, "ratings", str(ratings))
+    assert (r["read"], r["skipped"], r["written"]) == (4, 1, 2)
+    ingest.ingest_file(engine, "ratings", str(ratings))  # re-run: upsert, no duplicates
+
+    db = sessionmaker(bind=engine, future=True)()
+    heat = db.get(Movie, 1)
+    assert (heat.title, heat.year, heat.genres) == ("Heat, Director's Cut", 1995, "Action|Crime|Drama")
+    assert db.get(Movie, 2).genres is None
+    assert sorted((r.user_id, r.movie_id, r.score) for r in db.query(Rating)) == [(7, 1, 2), (8, 2, 1)]
+    assert db.query(User).count() == 2
+
+    # a placeholder email already taken by another id is skipped, not a unique violation
+    db.add(User(id=50, email="user9@import.invalid", password_hash="x"))
+    db.commit()
+    (tmp_path / "more.csv").write_text("user_id,movie_id,score\n9,1,4\n10,2,5\n", encoding="utf-8")
+    assert ingest.ingest_file(engine, "ratings", str(tmp_path / "more.csv"))["written"] == 2
+    assert sorted(u.id for u in db.query(User)) == [7, 8, 10, 50]
+
+def test_resume_after_interruption(tmp_path, monkeypatch):
+    engine = _engine(tmp_path)
+    path = tmp_path / "ratings.csv"
+    path.write_text("user_id,movie_id,score\n" + "".join(f"{u},{m},3\n" for u in range(1, 11) for m in range(1, 11)))
+    write = ingest.WRITERS["ratings"][1]
+    calls = []
+
+    def flaky(conn, rows):
+        calls.append(len(rows))
+        if len(calls) == 3:
+            raise KeyboardInterrupt
+        return write(conn, rows)
+
+    monkeypatch.setitem(ingest.WRITERS, "ratings", (ingest.rating_row, flaky))
+    with pytest.raises(KeyboardInterrupt):
+        ingest.ingest_file(engine, "ratings", str(path), chunk_size=30)
+    assert json.loads((tmp_path / "ratings.csv.ingest.json").read_text())["rows"] == 60
+
+    monkeypatch.setitem(ingest.WRITERS, "ratings", (ingest.rating_row, write))
+    r = ingest.ingest_file(engine, "ratings", str(path), chunk_size=30)
+    assert (r["read"], r["written"]) == (40, 100)  # resumed after the 60 committed rows
+    assert not (tmp_path / "ratings.csv.ingest.json").exists()
+    db = sessionmaker(bind=engine, future=True)()
+    assert db.query(Rating).count() == 100
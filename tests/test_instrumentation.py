@@ -0,0 +1,32 @@
+from app import instrumentation
+from app.instrumentation import Histogram, phase, track_function
+
+def test_histogram_quantiles_and_prometheus():
+    h = Histogram("t_seconds", "test", ("name",))
+    for v in range(1, 101):
+        h.observe(v / 1000, "f")
+    h.observe(0.2, "f", error=True)
+    row = h.snapshot()[0]
+    assert row["count"] == 101 and row["errors"] == 1
+    assert 0.049 < row["p50"] < 0.052 and row["p99"] >= 0.099
+    text = "\n".join(h.prometheus())
+    assert 't_seconds_bucket{name="f",le="+Inf"} 101' in text
+    assert 't_seconds_errors_total{name="f"} 1' in text
+
+def test_phases_are_labelled_with_enclosing_function():
+    with track_function("unit_fn"):
+        with phase("top_n"):
+            pass
+    rows = [r for r in instrumentation.phase_latency.snapshot() if r["recommender"] == "unit_fn"]
+    assert rows and rows[0]["phase"] == "top_n" and rows[0]["count"] >= 1
+
+def test_request_metrics_and_prometheus_endpoint(client):
+    client.get("/api/movies")
+    snap = client.get("/api/metrics/latency").json()
+    routes = {r["route"] for r in snap["app_http_request_duration_seconds"]}
+    assert "/api/movies" in routes
+    sql = [r for r in snap["app_http_request_sql_statements"] if r["route"] == "/api/movies"]
+    assert sql and sql[0]["p50"] >= 1
+    r = client.get("/api/metrics/prometheus")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    assert "app_http_request_duration_seconds_bucket" in r.text
@@ -0,0 +1,70 @@
+import json
+import os
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import item_cf, model_registry, popularity
+from app.config import settings
+from app.database import Base
+from app.models import Movie, Rating, User
+
+def _write(value):
+    def save(path):
+        with open(os.path.join(path, "value.txt"), "w") as f:
+            f.write(value)
+    return save
+
+def test_publish_switches_current_and_prunes(tmp_path):
+    root = str(tmp_path / "kind")
+    assert model_registry.current_path(root) is None and model_registry.next_version(root) == 1
+    for v in range(1, 6):
+        model_registry.publish(root, v, _write(f"v{v}"), time.time(), rows=v)
+    path = model_registry.current_path(root)
+    assert os.path.basename(path) == "v000005" and open(os.path.join(path, "value.txt")).read() == "v5"
+    assert model_registry.build_info(root)["rows"] == 5 and model_registry.next_version(root) == 6
+    # older snapshots pruned down to MODEL_KEEP_SNAPSHOTS, no partial directories left behind
+    assert sorted(os.listdir(root)) == ["CURRENT", "v000003", "v000004", "v000005"]
+
+    # a model directory written before snapshots is served as is
+    flat = tmp_path / "flat"
+    flat.mkdir()
+    (flat / "meta.json").write_text(json.dumps({"version": 7}))
+    assert model_registry.current_path(str(flat)) == str(flat)
+    assert model_registry.next_version(str(flat)) == 8
+
+def test_worker_rebuilds_after_new_ratings_and_swaps(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'reg.db'}", future=True)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, future=True)()
+    db.add_all([Movie(id=m, title=f"m{m}", genres="Drama" if m % 2 else "Comedy") for m in range(1, 13)])
+    db.add_all([User(id=u, email=f"u{u}@x.io", password_hash="x") for u in range(1, 9)])
+    db.add_all([Rating(user_id=u, movie_id=m, score=1 + (u * m) % 5)
+                for u in range(1, 8) for m in range(1, 13) if (u + m) % 3])
+    db.commit()
+    for name in ("POPULARITY_DIR", "ITEM_CF_DIR", "CONTENT_MODEL_DIR", "MF_MODEL_DIR"):
+        monkeypatch.setattr(settings, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(settings, "MODEL_KINDS", "popularity,item")
+    monkeypatch.setattr(settings, "MODEL_REBUILD_AFTER_RATINGS", 5)
+    monkeypatch.setattr(settings, "POPULARITY_REFRESH_SECONDS", 3600)
+    for module in (item_cf, popularity):  # served models are restored for the other tests
+        for attr in ("_model", "_path") if module is item_cf else ("_ranking", "_path"):
+            monkeypatch.setattr(module, attr, getattr(module, attr))
+
+    worker = model_registry.ModelWorker()
+    worker.check(db)
+    first = item_cf.get_item_cf()
+    assert worker.builds == 2 and first.version == 1 and popularity.load_current().source
+    worker.check(db)  # nothing new: no rebuild
+    assert worker.builds == 2
+
+    db.add_all([Rating(user_id=8, movie_id=m, score=5) for m in range(1, 6)])
+    db.commit()
+    worker.check(db)
+    second = item_cf.get_item_cf()
+    assert worker.builds == 4 and second.version == 2 and second is not first
+    assert first.row(1)[0].size  # requests holding the old snapshot keep working
+    status = model_registry.status()["models"]
+    assert status["item"]["version"] == status["item"]["served_version"] == 2
+    assert status["popularity"]["build_seconds"] is not None and status["mf"]["version"] is None
+    assert not worker.request("item")  # no worker thread: callers build themselves
+    db.close()
@@ -0,0 +1,35 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Movie, MovieStats, Rating
+from app.movie_stats import apply_rating_delta, bayes_score, check_movie_stats, rebuild_movie_stats
+
+def test_deltas_match_rebuild_and_check():
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, future=True)()
+    db.add_all([Movie(id=i, title=f"m{i}") for i in (1, 2, 3)])
+    db.add_all([Rating(user_id=1, movie_id=1, score=5), Rating(user_id=2, movie_id=1, score=3),
+                Rating(user_id=1, movie_id=2, score=2)])
+    db.commit()
+    assert rebuild_movie_stats(db) == 2
+    assert check_movie_stats(db) == []
+    s = db.get(MovieStats, 1)
+    assert (s.rating_sum, s.rating_count, s.avg_rating) == (8, 2, 4.0)
+    assert abs(s.bayes_score - bayes_score(8, 2)) < 1e-9
+
+    # write paths: new rating on 3, 5 -> 4 change on 1, delete the only rating of 2
+    db.add(Rating(user_id=2, movie_id=3, score=4)); apply_rating_delta(db, 3, 4, 1)
+    db.add(Rating(user_id=3, movie_id=3, score=2)); apply_rating_delta(db, 3, 2, 1)  # upsert onto the new row
+    db.query(Rating).filter_by(user_id=1, movie_id=1).update({"score": 4}); apply_rating_delta(db, 1, -1, 0)
+    db.query(Rating).filter_by(user_id=1, movie_id=2).delete(); apply_rating_delta(db, 2, -2, -1)
+    db.commit()
+    db.expire_all()
+    assert check_movie_stats(db) == []
+    assert db.get(MovieStats, 2) is None
+    assert db.get(MovieStats, 1).avg_rating == 3.5
+    assert (db.get(MovieStats, 3).rating_sum, db.get(MovieStats, 3).rating_count) == (6, 2)
+
+    db.query(MovieStats).filter_by(movie_id=3).update({"rating_count": 7})
+    db.commit()
+    assert [mid for mid, _, _ in check_movie_stats(db)] == [3]
@@ -0,0 +1,24 @@
+import numpy as np
+from app.popularity import PopularityRanking
+
+def _ranking():
+    # ids ranked 10, 11, ..., 29; even ids are Drama, years spread over 1990-2009
+    ids = np.arange(10, 30)
+    genres = ["Drama|Comedy" if i % 2 == 0 else "Comedy" for i in ids]
+    years = np.array([1990 + (i - 10) for i in ids])
+    return PopularityRanking(ids, [f"m{i}" for i in ids], np.linspace(5, 1, len(ids)), genres, years)
+
+def test_full_page_after_skipping_rated():
+    r = _ranking()
+    rated = {10: 5, 11: 4, 12: 3, 13: 5, 99: 2}  # top 4 rated, plus an unknown id
+    top = r.top_unrated(rated, 5)
+    assert [m for m, _, _ in top] == [14, 15, 16, 17, 18]
+    assert top[0][1] == "m14"
+    assert len(r.top_unrated(set(range(10, 27)), 5)) == 3  # only 3 unrated movies left
+
+def test_genre_and_year_rankings():
+    r = _ranking()
+    assert [m for m, _, _ in r.top_unrated({10: 5}, 3, genre="drama")] == [12, 14, 16]
+    assert [m for m, _, _ in r.top_unrated({}, 20, year=2003)] == list(range(20, 30))
+    assert [m for m, _, _ in r.top_unrated({20: 1}, 2, genre="Drama", year=2001)] == [22, 24]
+    assert r.top_unrated({}, 5, genre="Western") == []
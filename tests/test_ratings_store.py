@@ -0,0 +1,94 @@
+import threading
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Rating
+from app import ratings_store
+from app.ratings_store import RatingsStore
+
+def test_store_write_through_and_resync():
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, future=True)()
+    db.add_all([Rating(user_id=1, movie_id=10, score=5), Rating(user_id=1, movie_id=11, score=2),
+                Rating(user_id=2, movie_id=10, score=4)])
+    db.commit()
+
+    store = RatingsStore()
+    store.load(db)
+    assert store.user_ratings(1) == {10: 5, 11: 2}
+    gen = store.generation
+    M = store.matrix()
+    assert store.matrix() is M
+
+    store.upsert(2, 12, 3)
+    store.upsert(1, 10, 1)
+    store.remove(1, 11)
+    assert store.generation == gen + 3
+    assert store.user_ratings(1) == {10: 1}
+    assert store.user_ratings(2) == {10: 4, 12: 3}
+    assert store.matrix() is not M and len(store.matrix()) == 3
+
+    # the database never saw those writes
+    assert not store.check(db)
+    store.load(db)
+    assert store.check(db)
+    assert store.user_ratings(1) == {10: 5, 11: 2}
+
+def test_matrix_builds_outside_the_store_lock(monkeypatch):
+    store = RatingsStore()
+    store.source = "test"
+    store.upsert(1, 10, 5)
+    store.upsert(2, 10, 3)
+    build = ratings_store.RatingsMatrix
+    seen = []
+
+    def slow_build(*cols):
+        # a writer on another thread gets through while the matrix is being built
+        t = threading.Thread(target=lambda: (store.upsert(3, 11, 4), seen.append(store.user_ratings(3))))
+        t.start()
+        t.join(5)
+        return build(*cols)
+
+    monkeypatch.setattr(ratings_store, "RatingsMatrix", slow_build)
+    M = store.matrix()
+    assert seen == [{11: 4}] and len(M) == 2  # built from the snapshot taken before the write
+    monkeypatch.setattr(ratings_store, "RatingsMatrix", build)
+    assert len(store.matrix()) == 3 and store.matrix() is store.matrix()
+
+def test_load_reads_outside_the_store_lock_and_replays_writes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ratings.db'}", future=True,
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, future=True)
+    db = Session()
+    db.add_all([Rating(user_id=1, movie_id=10, score=5), Rating(user_id=2, movie_id=10, score=4)])
+    db.commit()
+
+    store = RatingsStore()
+    store.load(db)
+    query = db.query
+    seen = []
+
+    def rate_meanwhile():
+        # a request on another thread commits and writes through while the reload is reading
+        other = Session()
+        other.add(Rating(user_id=3, movie_id=11, score=2))
+        other.commit()
+        other.close()
+        store.upsert(3, 11, 2)
+        seen.append(store.user_ratings(1))
+
+    def slow_query(*cols):
+        rows = query(*cols).all()
+        t = threading.Thread(target=rate_meanwhile)
+        t.start()
+        t.join(5)
+        return type("Rows", (), {"all": lambda self: rows})()
+
+    db.query = slow_query
+    store.load(db)
+    del db.query
+    assert seen == [{10: 5}]  # the reader wasn't blocked by the reload
+    assert store.user_ratings(3) == {11: 2}  # the write the query missed was replayed
+    assert store.check(db)
@@ -0,0 +1,42 @@
+import time
+from app import reco_cache
+from app.config import settings
+from app.reco_cache import ResultCache, cached
+
+def test_lru_ttl_and_user_invalidation():
+    cache = ResultCache(max_entries=3, ttl=60)
+    rows = [(1, "A", 1.0)]
+    for uid in (1, 2, 3):
+        cache.set((uid, "cf", 20, 20, (1,)), rows)
+    assert cache.get((1, "cf", 20, 20, (1,))) == rows  # 1 becomes most recent
+    cache.set((4, "cf", 20, 20, (1,)), rows)  # evicts 2
+    assert cache.get((2, "cf", 20, 20, (1,))) is None
+    assert cache.get((1, "cf", 20, 20, (2,))) is None  # new model version: miss
+
+    cache.set((1, "content", 0, 20, (1,)), rows)
+    cache.invalidate_user(1)
+    assert cache.get((1, "cf", 20, 20, (1,))) is None
+    assert cache.get((1, "content", 0, 20, (1,))) is None
+    assert cache.get((4, "cf", 20, 20, (1,))) == rows
+
+    cache.ttl = 0.01
+    cache.set((5, "mf", 0, 20, (1,)), rows)
+    time.sleep(0.02)
+    assert cache.get((5, "mf", 0, 20, (1,))) is None
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 5 and stats["evictions"] >= 1
+
+def test_result_computed_before_invalidation_is_not_stored(monkeypatch):
+    cache = ResultCache(max_entries=10, ttl=60)
+    monkeypatch.setattr(reco_cache, "reco_cache", cache)
+    monkeypatch.setattr(settings, "RECO_CACHE_ENABLED", True)
+
+    def compute_while_user_rates():
+        cache.invalidate_user(1)  # rating committed while the old ratings were being scored
+        return [(1, "old", 1.0)]
+
+    assert cached(1, "cf", 20, 20, (1,), compute_while_user_rates) == [(1, "old", 1.0)]
+    assert cache.get((1, "cf", 20, 20, (1,))) is None
+    assert cached(1, "cf", 20, 20, (1,), lambda: [(2, "new", 1.0)]) == [(2, "new", 1.0)]
+    assert cache.get((1, "cf", 20, 20, (1,))) == [(2, "new", 1.0)]
+
@@ -1,3 +1,7 @@
+import numpy as np
+from app.cf_engine import RatingsMatrix
+from app.mf import MFModel, _solve_rows, train_als, user_checksums
+
 def test_cf_score_nonnegative_when_fallback(client):
     token = client.post("/api/auth/signup", json={"email":"c@example.com","password":"secret12"}).json()["access_token"]
     # If there is insufficient data, CF should fallback or return empty safely
@@ -6,3 +10,130 @@ def test_cf_score_nonnegative_when_fallback(client):
     if r.status_code == 200:
         for x in r.json():
             assert isinstance(x["score"], float)
+
+def _dense_user_knn(ratings, user_id, k):
+    # reference: the original dense user-user KNN
+    users = sorted({u for u, _, _ in ratings})
+    movies = sorted({m for _, m, _ in ratings})
+    u_index = {u: i for i, u in enumerate(users)}
+    m_index = {m: i for i, m in enumerate(movies)}
+    R = np.zeros((len(users), len(movies)))
+    mask = np.zeros_like(R, dtype=bool)
+    for u, m, s in ratings:
+        R[u_index[u], m_index[m]] = s
+        mask[u_index[u], m_index[m]] = True
+    ui = u_index[user_id]
+    means = np.sum(R, axis=1) / np.maximum(mask.sum(axis=1), 1)
+    Rc = R - means[:, None]
+    Rc[~mask] = 0.0
+    A = Rc / (np.linalg.norm(Rc, axis=1, keepdims=True) + 1e-9)
+    sims = (A @ A.T)[ui].copy()
+    sims[ui] = 0.0
+    nn_idx = np.argsort(-sims)[:k]
+    nn_sims = sims[nn_idx].reshape(-1, 1)
+    denom = np.sum(np.abs(nn_sims), axis=0)[0] + 1e-9
+    preds = np.zeros(len(movies))
+    for mi in range(len(movies)):
+        if mask[ui, mi]:
+            preds[mi] = -1
+            continue
+        preds[mi] = means[ui] + float(np.sum(nn_sims * Rc[nn_idx, mi].reshape(-1, 1))) / denom
+    return movies, preds
+
+def test_sparse_cf_matches_dense_reference():
+    rng = np.random.default_rng(7)
+    ratings = []
+    for u in range(1, 41):
+        for m in rng.choice(np.arange(100, 160), size=rng.integers(3, 15), replace=False):
+            ratings.append((u, int(m), int(rng.integers(1, 6))))
+    M = RatingsMatrix(*zip(*ratings))
+    for user_id in (1, 17, 40):
+        for k in (3, 20, 100):
+            movies, expected = _dense_user_knn(ratings, user_id, k)
+            preds = M.predict_user(M.u_index[user_id], k=k)
+            assert list(M.movies) == movies
+            assert np.allclose(preds, expected)
+
+def test_als_fits_low_rank_ratings_and_folds_in_users(tmp_path):
+    rng = np.random.default_rng(0)
+    Ut, Vt = rng.normal(size=(200, 3)), rng.normal(size=(80, 3))
+    pairs = rng.choice(200 * 80, 4000, replace=False)
+    u, m = pairs // 80, pairs % 80
+    M = RatingsMatrix(u + 1, m + 1, np.clip(np.round(3 + 0.6 * (Ut[u] * Vt[m]).sum(1)), 1, 5))
+    U, V, mean = train_als(M.R, factors=6, reg=0.02, iterations=10)
+    rows = np.repeat(np.arange(M.R.shape[0]), np.diff(M.R.indptr))
+    pred = np.einsum("ij,ij->i", U[rows], V[M.R.indices]) + mean
+    assert np.sqrt(np.mean((pred - M.R.data) ** 2)) < 0.4
+
+    MFModel(M.users, M.movies, U, V, np.diff(M.R.indptr), mean=mean, reg=0.02,
+            user_checksums=user_checksums(M)).save(str(tmp_path))
+    model = MFModel.load(str(tmp_path))
+    ratings = {int(M.movies[i]): int(s) for i, s in zip(M.R[0].indices, M.R[0].data)}
+    # unchanged user: stored factors; new ratings: one least-squares solve against V
+    assert np.allclose(model.user_vector(int(M.users[0]), ratings), U[0])
+    first = next(iter(ratings))
+    rerated = {**ratings, first: 6 - ratings[first] if ratings[first] != 3 else 4}  # same count, new score
+    assert not np.allclose(model.user_vector(int(M.users[0]), rerated), U[0])
+    ratings[int(M.movies[-1])] = 5
+    idx = [model.i_index[mid] for mid in ratings]
+    r = np.array(list(ratings.values()), dtype=float) - mean
+    expected = np.linalg.solve(V[idx].T @ V[idx] + 0.02 * len(idx) * np.eye(6), V[idx].T @ r)
+    assert np.allclose(model.user_vector(int(M.users[0]), ratings), expected)
+
+    # implicit fold-in reuses the model's V.T @ V
+    implicit = MFModel(M.users, M.movies, U, V, np.diff(M.R.indptr), reg=0.02, implicit=True, alpha=2.0)
+    direct = _solve_rows(M.R[:1], V, 0.02, True, 2.0, 0.0)[0]
+    assert np.allclose(implicit.fold_in(dict(zip(M.movies[M.R[0].indices].tolist(), M.R[0].data))), direct)
+    assert implicit.YtY is implicit.YtY
+
+def test_batch_cf_block_matches_single_user_predictions():
+    from app.batch import _cf_block
+    rng = np.random.default_rng(3)
+    pairs = rng.choice(30 * 50, 400, replace=False)
+    M = RatingsMatrix(pairs // 50 + 1, pairs % 50 + 1, rng.integers(1, 6, 400))
+    rows = np.array([0, 4, 9, 29])
+    block = _cf_block(M, rows, k=5)
+    for ui, preds in zip(rows, block):
+        assert np.allclose(preds, M.predict_user(ui, k=5))
+
+def test_mmr_trades_relevance_for_diversity():
+    from app.recommenders import mmr
+    # rows 0 and 1 are the same item; row 2 is different and slightly less relevant
+    X = np.array([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+    rel = np.array([1.0, 0.99, 0.9])
+    assert list(mmr(X, rel, 3, 1.0)) == [0, 1, 2]
+    assert list(mmr(X, rel, 3, 0.7)) == [0, 2, 1]
+
+def test_hybrid_endpoint_blends_and_excludes_rated(client):
+    token = client.post("/api/auth/signup", json={"email": "hybrid@example.com", "password": "secret12"}).json()["access_token"]
+    h = {"Authorization": "Bearer " + token}
+    movies = client.get("/api/movies", params={"size": 2}).json()
+    for m in movies:
+        client.post("/api/ratings", json={"movie_id": m["id"], "score": 5}, headers=h)
+    r = client.get("/api/recommendations/hybrid", params={"top_n": 5, "diversity": 0.5}, headers=h)
+    assert r.status_code == 200
+    assert not {x["movie_id"] for x in r.json()} & {m["id"] for m in movies}
+    r = client.get("/api/recommendations/hybrid", params={"w_content": 0, "w_cf": 0}, headers=h)
+    assert r.status_code == 400
+
+def test_select_top_pages_match_full_sort():
+    from app.recommenders import select_top
+    rng = np.random.default_rng(11)
+    scores = rng.normal(size=500)
+    scores[rng.choice(500, 50, replace=False)] = -np.inf
+    exclude = np.array([int(np.argmax(scores))])
+    ranked = [i for i in np.argsort(-scores, kind="stable") if i not in exclude and np.isfinite(scores[i])]
+    pages = [select_top(scores.copy(), 20, offset, exclude=exclude) for offset in (0, 20, 440)]
+    assert [list(p) for p in pages] == [ranked[:20], ranked[20:40], ranked[440:460]]
+    assert all(scores[i] > 0 for i in select_top(scores.copy(), 500, floor=0.0))
+
+def test_catalog_titles_and_offset_pages(client):
+    from app.catalog import CatalogIndex
+    catalog = CatalogIndex(np.array([3, 7, 42]), ["a", "b", "c"])
+    assert catalog.titles_of([42, 5, 3, 10_000]) == {42: "c", 3: "a"}
+
+    token = client.post("/api/auth/signup", json={"email": "pages@example.com", "password": "secret12"}).json()["access_token"]
+    h = {"Authorization": "Bearer " + token}
+    full = client.get("/api/recommendations/popular", params={"top_n": 6}, headers=h).json()
+    page = client.get("/api/recommendations/popular", params={"top_n": 3, "offset": 3}, headers=h).json()
+    assert page == full[3:6]
@@ -0,0 +1,53 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Movie
+from app.search import search_movie_ids
+
+def _db():
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, future=True)()
+    db.add_all([
+        Movie(id=1, title="Interstellar", year=2014, genres="Sci-Fi", overview="Explorers travel through a wormhole."),
+        Movie(id=2, title="The Matrix", year=1999, genres="Action|Sci-Fi", overview="A hacker learns about reality."),
+        Movie(id=3, title="Space Odyssey", year=1968, genres="Sci-Fi", overview="An interstellar voyage to Jupiter."),
+    ])
+    db.commit()
+    return db
+
+def test_fts_ranking_prefix_typo_and_sync():
+    db = _db()  # movies exist before the index: built lazily on first search
+    ids, _ = search_movie_ids(db, "interstellar", 10)
+    assert ids == [1, 3]  # title match ranks above overview match
+    assert search_movie_ids(db, "matr", 10)[0] == [2]
+    assert search_movie_ids(db, "wormhoel", 10)[0] == [1]  # typo
+    assert search_movie_ids(db, "interstellar", 10, keep=lambda mid: mid != 1)[0] == [3]
+    assert search_movie_ids(db, "hacker", 10, year=2014)[0] == []
+
+    db.add(Movie(id=4, title="Wormhole Diaries", year=2020, genres="Drama", overview=""))
+    db.query(Movie).filter_by(id=2).update({"title": "Reality Hackers"})
+    db.commit()
+    assert search_movie_ids(db, "wormhole", 10)[0] == [4, 1]
+    assert search_movie_ids(db, "matrix", 10)[0] == []
+
+def test_cursor_pages_cover_all_results():
+    db = _db()
+    db.add_all([Movie(id=10 + i, title=f"Voyage {i}", overview="voyage " * (i % 3)) for i in range(7)])
+    db.commit()
+    seen, cursor = [], None
+    while True:
+        ids, cursor = search_movie_ids(db, "voyage", 3, cursor=cursor)
+        seen += ids
+        if cursor is None:
+            break
+    assert sorted(seen) == [3] + list(range(10, 17)) and len(seen) == len(set(seen))
+    assert seen == search_movie_ids(db, "voyage", 20)[0]
+
+def test_movies_endpoint_keyset(client):
+    r = client.get("/api/movies", params={"size": 1})
+    assert r.status_code == 200
+    if len(r.json()) == 1:
+        nxt = client.get("/api/movies", params={"size": 1, "cursor": r.headers["X-Next-Cursor"]})
+        assert nxt.status_code == 200 and all(m["id"] != r.json()[0]["id"] for m in nxt.json())
+    assert client.get("/api/movies", params={"cursor": "garbage"}).status_code == 400